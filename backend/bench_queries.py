@@ -0,0 +1,98 @@
+"""
+Micro-benchmark: per-call cost of the hot read queries.
+
+Runs each query in queries.py three ways against a seeded temporary SQLite
+database: through the ORM Query API (how they were written before), as a
+select() built on every call, and as the prebuilt statement. The gap is
+Python-side statement construction and cache-key generation.
+
+Usage: python bench_queries.py [--repeat 5000] [--users 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, or_, select
+from sqlalchemy.orm import sessionmaker
+import models
+import queries
+from database import Base
+
+User, Progress, Recommendation = models.User, models.SubtopicProgress, models.Recommendation
+SUBTOPIC_IDS = list(range(1, 8))
+
+def seed(engine, users: int, rng: random.Random):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"email": f"user{i}@example.com", "name": f"User {i}", "hashed_password": "x"} for i in range(1, users + 1)])
+        conn.execute(insert(Progress), [
+            {"user_id": u, "subtopic_id": s, "completed": rng.random() < 0.7, "completed_at": now}
+            for u in range(1, users + 1) for s in range(1, 52) if rng.random() < 0.3
+        ])
+        conn.execute(insert(Recommendation), [
+            {"user_id": u, "type": "question", "title": "Practice", "priority": rng.randint(1, 5),
+             "is_completed": rng.random() < 0.2, "expires_at": now + timedelta(days=rng.choice((-1, 7)))}
+            for u in range(1, users + 1) for _ in range(8)
+        ])
+
+def cases():
+    """(name, ORM Query API, select() per call, prebuilt statement), each taking (db, user_id)"""
+    email = lambda uid: f"user{uid}@example.com"
+    return [
+        ("user by email",
+         lambda db, uid: db.query(User).filter(User.email == email(uid)).first(),
+         lambda db, uid: db.execute(select(User).where(User.email == email(uid)).limit(1)).scalars().first(),
+         lambda db, uid: db.execute(queries.USER_BY_EMAIL, {"email": email(uid)}).scalars().first()),
+        ("progress by user+ids",
+         lambda db, uid: {r.subtopic_id for r in db.query(Progress).filter(
+             Progress.user_id == uid, Progress.subtopic_id.in_(SUBTOPIC_IDS), Progress.completed == True).all()},
+         lambda db, uid: set(db.execute(select(Progress.subtopic_id).where(
+             Progress.user_id == uid, Progress.subtopic_id.in_(SUBTOPIC_IDS), Progress.completed == True)).scalars()),
+         lambda db, uid: set(db.execute(queries.COMPLETED_SUBTOPIC_IDS_IN, {"user_id": uid, "subtopic_ids": SUBTOPIC_IDS}).scalars())),
+        ("active recommendations",
+         lambda db, uid: db.query(Recommendation).filter(
+             Recommendation.user_id == uid, Recommendation.is_completed == False,
+             or_(Recommendation.expires_at.is_(None), Recommendation.expires_at > datetime.utcnow())
+         ).order_by(Recommendation.priority.desc()).limit(6).all(),
+         lambda db, uid: db.execute(select(Recommendation).where(
+             Recommendation.user_id == uid, Recommendation.is_completed == False,
+             or_(Recommendation.expires_at.is_(None), Recommendation.expires_at > datetime.utcnow())
+         ).order_by(Recommendation.priority.desc()).limit(6)).scalars().all(),
+         lambda db, uid: db.execute(queries.ACTIVE_RECOMMENDATIONS, {"user_id": uid, "now": datetime.utcnow(), "limit": 6}).scalars().all()),
+    ]
+
+def time_calls(db, func, user_ids) -> float:
+    for uid in user_ids[:200]:
+        func(db, uid)  # warm SQLAlchemy's compiled cache and SQLite's page cache
+    db.expunge_all()
+    start = time.perf_counter()
+    for uid in user_ids:
+        func(db, uid)
+        db.expunge_all()  # keep the identity map from growing across calls
+    return (time.perf_counter() - start) / len(user_ids)
+
+def main(repeat: int, users: int):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        seed(engine, users, rng)
+        db = sessionmaker(bind=engine)()
+        user_ids = [rng.randint(1, users) for _ in range(repeat)]
+        print(f"{repeat} calls each, {users} users, per-call time in microseconds")
+        print(f"{'query':<24}{'ORM query':>11}{'select()':>11}{'prebuilt':>11}{'saved':>9}")
+        for name, orm, built, prebuilt in cases():
+            results = [time_calls(db, func, user_ids) * 1e6 for func in (orm, built, prebuilt)]
+            saved = 1 - results[2] / results[0]
+            print(f"{name:<24}{results[0]:>11.1f}{results[1]:>11.1f}{results[2]:>11.1f}{saved:>9.0%}")
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.repeat, args.users)
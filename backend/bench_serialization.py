@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: serialization cost of the assessment report payloads.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps), the
+response_model path (pydantic validate + dump + json.dumps) and
+FastJSONResponse on realistic 40- and 200-question reports.
+
+Usage: python bench_serialization.py [--repeat 200]
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from question_bank import QUESTION_BANK
+from routers.assessment import grade_submission, SubmitResponse
+from serialization import FastJSONResponse
+
+def build_report(n_questions: int, seed: int = 42) -> dict:
+    """Grade a synthetic submission the same way submit_assessment does"""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(n_questions):
+        q = dict(QUESTION_BANK[i % len(QUESTION_BANK)])
+        q["id"] = i + 1  # Keep ids unique beyond the 120-question bank
+        questions.append(q)
+    answers, skipped = {}, set()
+    for q in questions:
+        roll = rng.random()
+        if roll < 0.1:
+            skipped.add(q["id"])
+        else:
+            answers[str(q["id"])] = q["correct"] if roll < 0.65 else rng.randrange(len(q["options"]))
+    graded = grade_submission(questions, answers, skipped)
+    return {
+        "attemptId": 1,
+        "overallScore": graded["overall"],
+        "topicMastery": graded["topic_mastery"],
+        "totalQuestions": len(questions),
+        "answered": graded["total_answered"],
+        "skipped": graded["skipped_count"],
+        "correctCount": graded["total_correct"],
+        "incorrectCount": graded["total_answered"] - graded["total_correct"],
+        "incorrectQuestions": graded["incorrect_questions"],
+        "skippedQuestions": graded["skipped_questions"],
+        "detailedReport": graded["detailed_report"],
+    }
+
+def default_path(report):
+    return json.dumps(jsonable_encoder(report), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def response_model_path(report):
+    model = SubmitResponse.model_validate(report)
+    return json.dumps(model.model_dump(mode="json"), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def fast_path(report):
+    return FastJSONResponse(report).body
+
+STRATEGIES = [
+    ("jsonable_encoder", default_path),
+    ("response_model", response_model_path),
+    ("FastJSONResponse", fast_path),
+]
+
+def measure(fn, report, repeat):
+    fn(report)  # Warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(report)
+    per_call_us = (time.perf_counter() - start) / repeat * 1e6
+
+    # Peak bytes allocated while producing one response body
+    tracemalloc.start()
+    fn(report)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call_us, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"Serialization benchmark ({datetime.now():%Y-%m-%d %H:%M}, {args.repeat} calls each)")
+    for n in (40, 200):
+        report = build_report(n)
+        size = len(fast_path(report))
+        print(f"\n{n}-question report ({size / 1024:.1f} KiB)")
+        print(f"{'strategy':<20}{'us/call':>12}{'peak KiB':>12}")
+        baseline = None
+        for name, fn in STRATEGIES:
+            us, peak = measure(fn, report, args.repeat)
+            baseline = baseline or us
+            print(f"{name:<20}{us:>12.1f}{peak / 1024:>12.1f}  ({baseline / us:.1f}x)")
+
+if __name__ == "__main__":
+    main()
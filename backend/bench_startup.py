@@ -0,0 +1,91 @@
+"""
+Startup benchmark: how long a fresh worker takes to import the app and
+answer its first request, plus an import-time profile showing where that
+time goes.
+
+Each run is a new interpreter, as when an autoscaler starts a worker.
+The profile comes from `python -X importtime`, grouped by top-level
+package and listing the slowest individual modules.
+
+Usage: python bench_startup.py [--runs 5] [--profile] [--top 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    client.get("/")
+    answered = time.perf_counter()
+print(json.dumps({"import": imported - started, "startup": ready - imported, "first_request": answered - ready}))
+"""
+
+# Imports deferred to first use; seeing one here means something pulls it in at startup again
+DEFERRED = ("google.generativeai",)
+
+def _env() -> dict:
+    return {**os.environ, "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")}
+
+def cold_start() -> dict:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD], capture_output=True, text=True, env=_env(), check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+def benchmark(runs: int):
+    cold_start()  # let the OS page cache settle so every run sees the same disk state
+    samples = [cold_start() for _ in range(runs)]
+    print(f"Cold start over {runs} runs (median / max, ms):")
+    for key in ("import", "startup", "first_request", "process"):
+        values = [s[key] * 1000 for s in samples]
+        print(f"  {key:<14} {statistics.median(values):8.1f} {max(values):8.1f}")
+
+def import_profile(top: int):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            capture_output=True, text=True, env=_env(), check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+    total = sum(packages.values())
+    print(f"Import time by top-level package (total {total / 1000:.0f} ms):")
+    for package, self_us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print(f"  {package:<28} {self_us / 1000:8.1f} ms {100 * self_us / total:5.1f}%")
+
+    print("\nSlowest modules by self time:")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[1])[:top]:
+        print(f"  {name:<40} {self_us / 1000:8.1f} ms (incl. imports {cumulative_us / 1000:.1f} ms)")
+
+    names = {name for name, _, _ in modules}
+    leaked = [name for name in DEFERRED if name in names]
+    if leaked:
+        print(f"\nWARNING: imported at startup but meant to load lazily: {', '.join(leaked)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile", action="store_true", help="also print the import-time profile")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.runs)
+    if args.profile:
+        print()
+        import_profile(args.top)
@@ -0,0 +1,241 @@
+"""
+Per-process caches with cross-worker invalidation.
+
+Values always live in the worker's own memory; only invalidation messages
+travel between workers, over a pluggable bus:
+
+- "local":  single process, invalidations apply immediately (default)
+- "sqlite": a shared SQLite file polled by every worker, for multi-worker
+            deployments on one host without extra infrastructure
+- "redis":  Redis pub/sub, when the redis package and a server are available
+
+All buses expose the Redis-style publish(channel, message) / subscribe(channel, callback) pair.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache-invalidate"
+DEFAULT_BUS_PATH = os.path.join(".", "cache_bus.db")
+_MISSING = object()
+
+class LocalBus:
+    """In-process bus: subscribers are called synchronously on publish"""
+    def __init__(self):
+        self._subscribers: Dict[str, list] = {}
+
+    def publish(self, channel: str, message: str):
+        for callback in self._subscribers.get(channel, []):
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+class SQLiteBus:
+    """
+    Pub/sub stand-in backed by an append-only SQLite table.
+    Each worker polls for rows newer than the last one it has seen; rows older
+    than `retention` seconds are pruned by whichever worker publishes.
+    """
+    def __init__(self, path: str, poll_interval: float = 0.25, retention: float = 300):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._subscribers: Dict[str, list] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bus_messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                "message TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bus_messages").fetchone()
+        # Only messages published after this worker started are relevant
+        self._last_id = row[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, channel: str, message: str):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("INSERT INTO bus_messages (channel, message, created_at) VALUES (?, ?, ?)", (channel, message, now))
+        conn.execute("DELETE FROM bus_messages WHERE created_at < ?", (now - self.retention,))
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def poll(self):
+        """Deliver messages published since the last poll"""
+        rows = self._connect().execute(
+            "SELECT id, channel, message FROM bus_messages WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for row_id, channel, message in rows:
+            self._last_id = row_id
+            for callback in self._subscribers.get(channel, []):
+                try:
+                    callback(message)
+                except Exception:
+                    logger.exception("Bus subscriber failed for %s", channel)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                logger.warning("Cache bus poll failed: %s", e)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-bus", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+class RedisBus:
+    """Redis pub/sub. Requires the optional `redis` package."""
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._thread = None
+
+    def publish(self, channel: str, message: str):
+        self._client.publish(channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        self._pubsub.subscribe(**{channel: lambda msg: callback(msg["data"].decode())})
+
+    def start(self):
+        if self._thread is None:
+            self._thread = self._pubsub.run_in_thread(sleep_time=0.1, daemon=True)
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        self._pubsub.close()
+
+class SharedCache:
+    """
+    Namespaced TTL/LRU cache whose invalidations are broadcast to every worker.
+    get/set only touch local memory; invalidate() also publishes on the bus.
+    """
+    def __init__(self, bus, ttl: float = 300, max_entries: int = 10_000):
+        self.bus = bus
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._origin = uuid.uuid4().hex[:12]
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # namespace -> str(key) -> keys, so invalidations touch only the entries they name
+        self._keys: Dict[str, Dict[str, set]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        bus.subscribe(INVALIDATION_CHANNEL, self._on_message)
+
+    def get(self, namespace: str, key: Hashable, default=None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key), _MISSING)
+            if entry is _MISSING or entry[1] < now:
+                if entry is not _MISSING:
+                    self._remove((namespace, key))
+                self.misses += 1
+                return default
+            self._entries.move_to_end((namespace, key))
+            self.hits += 1
+            return entry[0]
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if (namespace, key) not in self._entries:
+                self._keys.setdefault(namespace, {}).setdefault(str(key), set()).add(key)
+            self._entries[(namespace, key)] = (value, expires)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, namespace: str, key: Hashable = None):
+        """Drop one key (or a whole namespace) here and in every other worker"""
+        self._drop(namespace, key)
+        key_text = "" if key is None else str(key)
+        self.bus.publish(INVALIDATION_CHANNEL, f"{self._origin}|{namespace}|{key_text}")
+
+    def _remove(self, cache_key: tuple):
+        """Delete an entry and its index record; the caller holds the lock"""
+        if self._entries.pop(cache_key, _MISSING) is _MISSING:
+            return
+        namespace, key = cache_key
+        by_text = self._keys[namespace]
+        keys = by_text[str(key)]
+        keys.discard(key)
+        if not keys:
+            del by_text[str(key)]
+            if not by_text:
+                del self._keys[namespace]
+
+    def _drop(self, namespace: str, key: Hashable = None):
+        with self._lock:
+            if key is not None:
+                self._remove((namespace, key))
+                return
+            for keys in self._keys.pop(namespace, {}).values():
+                for k in keys:
+                    self._entries.pop((namespace, k), None)
+
+    def _on_message(self, message: str):
+        origin, namespace, key_text = message.split("|", 2)
+        if origin == self._origin:
+            return
+        if not key_text:
+            self._drop(namespace)
+            return
+        # Keys travel as text, so match on their string form
+        with self._lock:
+            for key in list(self._keys.get(namespace, {}).get(key_text, ())):
+                self._remove((namespace, key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+
+def build_bus(backend: str, url: str):
+    if backend == "local":
+        return LocalBus()
+    if backend == "sqlite":
+        return SQLiteBus(url or DEFAULT_BUS_PATH)
+    if backend == "redis":
+        return RedisBus(url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+settings = get_settings()
+cache = SharedCache(build_bus(settings.cache_backend, settings.cache_bus_url), ttl=settings.cache_ttl_seconds)
@@ -1,13 +1,50 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import get_settings
+from metrics import instrument_engine
 
 settings = get_settings()
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
+
+def engine_options(settings) -> dict:
+    """create_engine keyword arguments for the configured database"""
+    backend = make_url(settings.database_url).get_backend_name()
+    if backend == "sqlite":
+        # SQLite connections are files opened per thread; the default pool suits them
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if backend == "postgresql" and settings.db_statement_timeout_ms:
+        # Set per session at connect time, so a runaway query can't hold a pooled connection
+        options["connect_args"] = {"options": f"-c statement_timeout={int(settings.db_statement_timeout_ms)}"}
+    return options
+
+engine = create_engine(settings.database_url, **engine_options(settings))
+instrument_engine(engine)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers proceed during writes and busy_timeout makes writers from
+        # other worker processes wait instead of failing with "database is locked"
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def without_statement_timeout(conn):
+    """Lift the statement timeout for the rest of this transaction, for batch jobs with long-running reads"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,326 @@
+"""
+Streaming export of attempt history to Parquet or Arrow IPC for analysis.
+
+Rows are read through a streaming cursor in chunks and each chunk is
+written straight out as a row group/record batch, so memory stays flat
+however large the tables are. JSON columns are flattened into their own
+tables (one row per topic result and per answered question), ready for
+pandas/DuckDB/Spark without any JSON parsing.
+
+Append-only tables are exported incrementally: each run writes a new part
+file holding only rows it hasn't exported before, tracked in
+<out>/_watermarks.json as the highest id exported plus the gaps below it.
+Ids are assigned at INSERT but become visible at COMMIT, and on PostgreSQL
+transactions can commit out of id order, so an id missing below the
+watermark may belong to a transaction still in flight. Gaps are re-read on
+every run until their rows appear or GAP_RETENTION_SECONDS passes (ids of
+rolled-back inserts never appear). subtopic_progress is updated in place, so
+it is re-exported as a full snapshot every time. --full starts over.
+
+Requires pyarrow (pip install pyarrow).
+
+Usage: python export_history.py [--out ./export] [--format parquet|arrow] [--chunk-size 5000] [--full]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from typing import Dict, Iterator, Optional
+from sqlalchemy import or_, select
+import models
+from database import engine, without_statement_timeout
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional, only needed for exports
+    pa = None
+
+WATERMARK_FILE = "_watermarks.json"
+GAP_RETENTION_SECONDS = 24 * 3600
+
+class IdWatermark:
+    """
+    Export progress for an append-only table: the highest id exported and the
+    ranges of lower ids not seen yet, as [first, last, first_seen_epoch].
+    """
+    def __init__(self, last_id: int = 0, gaps=()):
+        self.last_id = last_id
+        self.gaps = [list(gap) for gap in gaps]
+        self._filled = set()
+        self._new_gaps = []
+        self._max = last_id
+
+    @classmethod
+    def from_state(cls, state) -> "IdWatermark":
+        if isinstance(state, int):  # written before gaps were tracked
+            return cls(state)
+        return cls(state.get("last_id", 0), state.get("gaps", ()))
+
+    def to_state(self) -> dict:
+        return {"last_id": self.last_id, "gaps": self.gaps}
+
+    def pending(self, id_column):
+        """WHERE clause for rows not exported yet"""
+        return or_(id_column > self.last_id, *(id_column.between(first, last) for first, last, _ in self.gaps))
+
+    def observe(self, row_id: int):
+        """Record an exported row; call in ascending id order"""
+        if row_id <= self.last_id:
+            self._filled.add(row_id)
+            return
+        if row_id > self._max + 1:
+            self._new_gaps.append((self._max + 1, row_id - 1))
+        self._max = row_id
+
+    def advance(self, now: float):
+        """Fold the observed rows in: close filled gaps, open new ones, forget expired ones"""
+        gaps = []
+        for first, last, seen in self.gaps:
+            start = first
+            for row_id in sorted(i for i in self._filled if first <= i <= last):
+                if row_id > start:
+                    gaps.append([start, row_id - 1, seen])
+                start = row_id + 1
+            if start <= last:
+                gaps.append([start, last, seen])
+        gaps.extend([first, last, now] for first, last in self._new_gaps)
+        self.gaps = [gap for gap in gaps if now - gap[2] < GAP_RETENTION_SECONDS]
+        self.last_id = self._max
+        self._filled = set()
+        self._new_gaps = []
+
+def _schemas():
+    return {
+        "quiz_attempts": pa.schema([
+            ("id", pa.int64()), ("user_id", pa.int64()), ("created_at", pa.timestamp("us")),
+            ("quiz_type", pa.string()), ("overall_score", pa.float64()), ("total_questions", pa.int32()),
+            ("correct_count", pa.int32()), ("incorrect_count", pa.int32()), ("skipped_count", pa.int32()),
+        ]),
+        "quiz_attempt_topics": pa.schema([
+            ("attempt_id", pa.int64()), ("user_id", pa.int64()), ("created_at", pa.timestamp("us")),
+            ("topic", pa.string()), ("mastery", pa.float64()), ("correct", pa.int32()),
+            ("total", pa.int32()), ("skipped", pa.int32()),
+        ]),
+        "quiz_attempt_answers": pa.schema([
+            ("attempt_id", pa.int64()), ("user_id", pa.int64()), ("created_at", pa.timestamp("us")),
+            ("question_id", pa.int64()), ("topic", pa.string()), ("difficulty", pa.string()),
+            ("user_answer_index", pa.int32()), ("correct_answer_index", pa.int32()),
+            ("is_correct", pa.bool_()), ("is_skipped", pa.bool_()),
+        ]),
+        "question_attempts": pa.schema([
+            ("id", pa.int64()), ("user_id", pa.int64()), ("question_id", pa.int64()),
+            ("selected_answer", pa.int32()), ("is_correct", pa.bool_()), ("skipped", pa.bool_()),
+            ("timestamp", pa.timestamp("us")),
+        ]),
+        "subtopic_progress": pa.schema([
+            ("id", pa.int64()), ("user_id", pa.int64()), ("subtopic_id", pa.int64()),
+            ("completed", pa.bool_()), ("completed_at", pa.timestamp("us")),
+        ]),
+    }
+
+class TableWriter:
+    """Writes one output table chunk by chunk to a temp file, renamed into place on close"""
+    def __init__(self, path: str, schema, fmt: str):
+        self.path = path
+        self.schema = schema
+        self.tmp = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self.tmp, schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(self.tmp, "wb")
+            self._writer = pa_ipc.new_file(self._sink, schema)
+        self.rows = 0
+
+    def write(self, columns: Dict[str, list]):
+        if not columns[self.schema.names[0]]:
+            return
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+        self.rows += len(columns[self.schema.names[0]])
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        try:
+            self._writer.close()
+        finally:
+            if os.path.exists(self.tmp):
+                os.remove(self.tmp)
+
+def _columns(schema) -> Dict[str, list]:
+    return {name: [] for name in schema.names}
+
+def stream_rows(statement, chunk_size: int) -> Iterator[list]:
+    """Yield lists of rows using a server-side cursor, chunk_size rows at a time"""
+    with engine.connect() as conn:
+        # One statement streams the whole table, which can outlast the per-statement limit
+        without_statement_timeout(conn)
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+_PART = re.compile(r"part-(\d+)\.")
+
+def _part_name(table: str, run: int, ext: str) -> str:
+    return os.path.join(table, f"part-{run:06d}.{ext}")
+
+def drop_unrecorded_parts(out: str, table: str, run: int):
+    """Remove part files of runs after `run`, left by a run that died before saving its watermarks"""
+    directory = os.path.join(out, table)
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        match = _PART.match(name)
+        if match and int(match.group(1)) > run:
+            os.remove(os.path.join(directory, name))
+
+def export_quiz_attempts(out: str, fmt: str, ext: str, mark: IdWatermark, run: int, chunk_size: int, schemas) -> int:
+    """Attempts plus their flattened topic results and answers, as part `run`. Returns the number of attempts written."""
+    q = models.QuizAttempt
+    statement = select(
+        q.id, q.user_id, q.created_at, q.quiz_type, q.overall_score, q.total_questions,
+        q.correct_count, q.incorrect_count, q.skipped_count, q.topic_mastery, q.detailed_report
+    ).where(mark.pending(q.id)).order_by(q.id)
+
+    names = ("quiz_attempts", "quiz_attempt_topics", "quiz_attempt_answers")
+    for name in names:
+        drop_unrecorded_parts(out, name, run - 1)
+    writers = {name: TableWriter(os.path.join(out, name, f"_current.{ext}"), schemas[name], fmt) for name in names}
+    try:
+        for rows in stream_rows(statement, chunk_size):
+            attempts, topics, answers = (_columns(schemas[name]) for name in names)
+            for row in rows:
+                mark.observe(row.id)
+                for name in attempts:
+                    attempts[name].append(getattr(row, name))
+                for entry in row.topic_mastery or []:
+                    topics["attempt_id"].append(row.id)
+                    topics["user_id"].append(row.user_id)
+                    topics["created_at"].append(row.created_at)
+                    topics["topic"].append(entry.get("topic"))
+                    topics["mastery"].append(entry.get("mastery"))
+                    topics["correct"].append(entry.get("correct"))
+                    topics["total"].append(entry.get("total"))
+                    topics["skipped"].append(entry.get("skipped"))
+                for entry in row.detailed_report or []:
+                    answers["attempt_id"].append(row.id)
+                    answers["user_id"].append(row.user_id)
+                    answers["created_at"].append(row.created_at)
+                    answers["question_id"].append(entry.get("id"))
+                    answers["topic"].append(entry.get("topic"))
+                    answers["difficulty"].append(entry.get("difficulty"))
+                    answers["user_answer_index"].append(entry.get("user_answer_index"))
+                    answers["correct_answer_index"].append(entry.get("correct_answer_index"))
+                    answers["is_correct"].append(entry.get("is_correct"))
+                    answers["is_skipped"].append(bool(entry.get("is_skipped")))
+            writers["quiz_attempts"].write(attempts)
+            writers["quiz_attempt_topics"].write(topics)
+            writers["quiz_attempt_answers"].write(answers)
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    exported = writers["quiz_attempts"].rows
+    for name, writer in writers.items():
+        writer.close()
+        if exported:
+            os.replace(writer.path, os.path.join(out, _part_name(name, run, ext)))
+        else:
+            os.remove(writer.path)
+        print(f"  {name}: {writer.rows} rows")
+    return exported
+
+def export_simple(out: str, fmt: str, ext: str, name: str, model, mark: Optional[IdWatermark], run: int,
+                  chunk_size: int, schemas) -> int:
+    """
+    Export one table column for column. With a watermark only rows not exported
+    yet go into part `run`; without one the table is rewritten as a snapshot.
+    Returns the number of rows written.
+    """
+    schema = schemas[name]
+    statement = select(*(getattr(model, c) for c in schema.names)).order_by(model.id)
+    if mark is not None:
+        statement = statement.where(mark.pending(model.id))
+        drop_unrecorded_parts(out, name, run - 1)
+    writer = TableWriter(os.path.join(out, name, f"_current.{ext}"), schema, fmt)
+    try:
+        for rows in stream_rows(statement, chunk_size):
+            columns = _columns(schema)
+            for row in rows:
+                if mark is not None:
+                    mark.observe(row.id)
+                for column, value in zip(schema.names, row):
+                    columns[column].append(value)
+            writer.write(columns)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    print(f"  {name}: {writer.rows} rows")
+
+    if mark is None:
+        os.replace(writer.path, os.path.join(out, name, f"snapshot.{ext}"))
+    elif writer.rows:
+        os.replace(writer.path, os.path.join(out, _part_name(name, run, ext)))
+    else:
+        os.remove(writer.path)
+    return writer.rows
+
+def export(out: str = "./export", fmt: str = "parquet", chunk_size: int = 5000, full: bool = False) -> dict:
+    """Run one export. Returns the watermarks saved for the next incremental run."""
+    if pa is None:
+        raise SystemExit("export_history.py requires pyarrow: pip install pyarrow")
+    ext = "parquet" if fmt == "parquet" else "arrow"
+    schemas = _schemas()
+    state_path = os.path.join(out, WATERMARK_FILE)
+    if full:
+        for name in schemas:
+            shutil.rmtree(os.path.join(out, name), ignore_errors=True)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    watermarks: dict = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            watermarks = json.load(f)
+        if watermarks.get("format", fmt) != fmt:
+            raise SystemExit(f"{out} holds a {watermarks['format']} export; use --full to switch formats")
+
+    print(f"Exporting to {out} ({fmt})")
+    run = watermarks.get("run", 0) + 1
+    attempts = IdWatermark.from_state(watermarks.get("quiz_attempts", 0))
+    export_quiz_attempts(out, fmt, ext, attempts, run, chunk_size, schemas)
+    questions = IdWatermark.from_state(watermarks.get("question_attempts", 0))
+    export_simple(out, fmt, ext, "question_attempts", models.QuestionAttempt, questions, run, chunk_size, schemas)
+    export_simple(out, fmt, ext, "subtopic_progress", models.SubtopicProgress, None, run, chunk_size, schemas)
+
+    # Saved last, so an interrupted run is simply redone from the previous watermarks
+    now = time.time()
+    for name, mark in (("quiz_attempts", attempts), ("question_attempts", questions)):
+        mark.advance(now)
+        watermarks[name] = mark.to_state()
+    watermarks["run"] = run
+    watermarks["format"] = fmt
+    tmp = f"{state_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp, state_path)
+    print(f"Export Complete: watermarks {watermarks}")
+    return watermarks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default="./export")
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--full", action="store_true", help="discard previous exports and watermarks")
+    args = parser.parse_args()
+    export(args.out, args.format, args.chunk_size, args.full)
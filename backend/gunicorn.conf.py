@@ -0,0 +1,29 @@
+"""
+Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app
+
+Each worker keeps its own caches; set CACHE_BACKEND=sqlite (one host) or
+CACHE_BACKEND=redis so writes in one worker invalidate the others.
+"""
+import multiprocessing
+import os
+
+# Read from the environment, not Settings: on_starting must run before anything caches Settings
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers import the app themselves so each gets its own engine, pool and bus connection
+preload_app = False
+graceful_timeout = 30
+timeout = 60
+
+def on_starting(server):
+    # Create the schema once in the master so workers don't race on CREATE TABLE,
+    # and let the forked workers skip it so they start faster. Set before anything
+    # reads settings: workers inherit the master's cached Settings when they fork.
+    os.environ["AUTO_MIGRATE"] = "false"
+    import migrate
+    migrate.upgrade()
+    migrate.engine.dispose()
+
+    if server.cfg.workers > 1 and os.environ.get("CACHE_BACKEND", "local") == "local":
+        server.log.warning("Running several workers with CACHE_BACKEND=local: cache invalidations will not reach other workers")
@@ -0,0 +1,59 @@
+"""
+Bulk-create user accounts from a CSV file, e.g. to onboard a whole cohort.
+
+Columns: email, name, and optionally password, language_preference ("en" or
+"hi") and role ("student" or "instructor"). Duplicates (already registered or
+repeated in the file) and invalid rows are reported without stopping the
+import. With --generate-passwords, rows without a password get a random one,
+written with the email to --credentials (default: <csv>.credentials.csv).
+
+Usage: python import_users.py students.csv [--workers 4] [--batch-size 500] [--rounds 12]
+"""
+import argparse
+import csv
+import os
+from config import get_settings
+from database import SessionLocal
+from services.user_import import import_users, read_csv
+
+SHOWN_PROBLEMS = 20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("csv_file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing processes; 0 hashes in this process")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=get_settings().bcrypt_rounds, help="bcrypt cost factor")
+    parser.add_argument("--generate-passwords", action="store_true")
+    parser.add_argument("--credentials")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with open(args.csv_file, encoding="utf-8-sig", newline="") as f:
+            report = import_users(
+                db, read_csv(f), rounds=args.rounds, batch_size=args.batch_size,
+                workers=args.workers, generate_passwords=args.generate_passwords, allow_roles=True,
+            )
+    finally:
+        db.close()
+
+    summary = report.as_dict()
+    print(f"Import Complete: {report.created} users created, {len(report.duplicates)} duplicates, "
+          f"{len(report.errors)} errors in {summary['elapsed_seconds']}s ({summary['users_per_second']} users/sec).")
+    for item in report.duplicates[:SHOWN_PROBLEMS]:
+        print(f"  line {item['line']}: duplicate {item['email']} ({item['reason']})")
+    for item in report.errors[:SHOWN_PROBLEMS]:
+        print(f"  line {item['line']}: {item['error']}")
+    if len(report.duplicates) + len(report.errors) > 2 * SHOWN_PROBLEMS:
+        print("  ...")
+    if report.generated_passwords:
+        path = args.credentials or f"{os.path.splitext(args.csv_file)[0]}.credentials.csv"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["email", "password"])
+            writer.writeheader()
+            writer.writerows(report.generated_passwords)
+        print(f"Generated passwords for {len(report.generated_passwords)} users written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Worker lifecycle: what the app starts when a worker boots and stops when it
+shuts down, run from FastAPI's lifespan hook rather than at import time.
+
+Startup applies the schema (while AUTO_MIGRATE is on), checks out a database
+connection so a bad DATABASE_URL fails the boot instead of the first request,
+starts the cache bus and the recommendation sweeper, and begins warm-up
+(services/warmup.py) on a background thread. /api/health/ready reports 503
+until warm-up finishes, so a load balancer only routes to warm workers.
+Shutdown runs once the server has stopped accepting requests: it waits for
+shared jobs still in flight, stops the background threads, leaves a final
+metrics snapshot and closes the pool.
+"""
+import asyncio
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from fastapi import FastAPI
+from sqlalchemy import text
+from cache import cache
+from config import Settings, get_settings
+from database import engine
+from metrics import REGISTRY
+from ratelimit import drain_flights
+from services.sweeper import RecommendationSweeper
+from services.warmup import run_warmup
+
+logger = logging.getLogger(__name__)
+
+class AppResources:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.sweeper: Optional[RecommendationSweeper] = None
+        self.ready = threading.Event()
+        self.warmup_timings: Dict[str, float] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def start(self):
+        started = time.perf_counter()
+        if self.settings.auto_migrate:
+            import migrate
+            migrate.upgrade(engine)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        # Invalidations must flow before warm-up fills the caches
+        cache.bus.start()
+        self.sweeper = RecommendationSweeper(
+            self.settings.recommendation_sweep_interval_seconds, self.settings.recommendation_sweep_batch_size
+        )
+        self.sweeper.start()
+        if self.settings.warmup_enabled:
+            self._warmup_thread = threading.Thread(target=self._warm, name="warmup", daemon=True)
+            self._warmup_thread.start()
+        else:
+            self._mark_ready()
+        logger.info("Worker %d started in %.0f ms", os.getpid(), (time.perf_counter() - started) * 1000)
+
+    def _warm(self):
+        started = time.perf_counter()
+        try:
+            self.warmup_timings = run_warmup(self.settings.warmup_active_users, self.settings.warmup_active_days)
+        finally:
+            self._mark_ready()
+        logger.info("Worker %d warm in %.0f ms: %s", os.getpid(), (time.perf_counter() - started) * 1000, self.warmup_timings)
+
+    def _mark_ready(self):
+        # Modules, routes and warmed caches live as long as the worker: move them
+        # out of the collector's view so later collections don't keep rescanning them
+        gc.freeze()
+        self.ready.set()
+
+    async def stop(self):
+        self.ready.clear()
+        if self._warmup_thread is not None:
+            # Warm-up uses the pool and the caches torn down below
+            await asyncio.to_thread(self._warmup_thread.join)
+            self._warmup_thread = None
+        unfinished = await drain_flights(self.settings.shutdown_drain_seconds)
+        if unfinished:
+            logger.warning("Shutting down with %d job(s) still running", unfinished)
+        if self.sweeper is not None:
+            self.sweeper.close()
+            self.sweeper = None
+        cache.bus.close()
+        if self.settings.metrics_textfile_dir:
+            path = os.path.join(self.settings.metrics_textfile_dir, f"zerotoone_{os.getpid()}.prom")
+            try:
+                REGISTRY.write_textfile(path)
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot to %s: %s", path, e)
+        engine.dispose()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    resources = AppResources(get_settings())
+    resources.start()
+    app.state.resources = resources
+    try:
+        yield
+    finally:
+        await resources.stop()
@@ -0,0 +1,337 @@
+"""
+Reproducible load test for the backend.
+
+Seeds a synthetic database, drives the app in-process (ASGI transport) or
+over HTTP with realistic scenarios, and writes throughput, latency
+percentiles and SQL query counts to a JSON baseline that can be compared
+across commits.
+
+Usage:
+    python loadtest.py seed --users 200
+    python loadtest.py run --requests 300 --concurrency 8 --out baseline.json
+    python loadtest.py run --url http://localhost:8000 --out http.json
+    python loadtest.py compare baseline.json new.json
+
+The database defaults to sqlite:///./loadtest.db and can be changed with
+--database-url; in HTTP mode the server must already point at it.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+DEFAULT_DATABASE_URL = "sqlite:///./loadtest.db"
+PASSWORD = "loadtest-password"
+EMAIL_TEMPLATE = "loadtest{}@example.com"
+SCENARIOS = ("login", "diagnostic", "submit", "toggle_subtopic", "dashboard")
+
+def configure_database(url: str):
+    # Must run before any app module is imported: settings are read once
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# ---------- seeding ----------
+
+def seed(args):
+    if args.database_url.endswith("learnpath.db"):
+        sys.exit("Refusing to seed the application database; pass a dedicated --database-url")
+    configure_database(args.database_url)
+    import migrate
+    from database import Base, engine, SessionLocal
+    from models import User, QuizAttempt, SubtopicProgress
+    from question_bank import QUESTION_BANK
+    from routers.assessment import grade_submission
+    from routers.auth import get_password_hash
+    from routers.subtopics import DEFAULT_SUBTOPICS
+    from services.analytics import rebuild_summaries
+
+    rng = random.Random(args.seed)
+    Base.metadata.drop_all(bind=engine)
+    # The schema the app runs on: search tables and triggers, analytics tables, seeded catalog
+    migrate.upgrade(engine)
+
+    # One bcrypt hash shared by every synthetic user keeps seeding fast
+    hashed = get_password_hash(PASSWORD)
+    subtopic_ids = [st["id"] for subtopics in DEFAULT_SUBTOPICS.values() for st in subtopics]
+    now = datetime.utcnow()
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        users = [
+            {"email": EMAIL_TEMPLATE.format(i), "name": f"Load Test {i}", "hashed_password": hashed,
+             "language_preference": "hi" if i % 5 == 0 else "en"}
+            for i in range(args.users)
+        ]
+        db.bulk_insert_mappings(User, users)
+        db.commit()
+        user_ids = [uid for (uid,) in db.query(User.id).order_by(User.id).all()]
+
+        attempts, progress = [], []
+        for user_id in user_ids:
+            for n in range(args.attempts):
+                questions = rng.sample(QUESTION_BANK, 40)
+                answers = {str(q["id"]): q["correct"] if rng.random() < 0.6 else rng.randrange(4) for q in questions}
+                graded = grade_submission(questions, answers, set())
+                attempts.append({
+                    "user_id": user_id,
+                    "overall_score": graded["overall"],
+                    "total_questions": len(questions),
+                    "correct_count": graded["total_correct"],
+                    "incorrect_count": graded["total_answered"] - graded["total_correct"],
+                    "skipped_count": 0,
+                    "topic_mastery": graded["topic_mastery"],
+                    "incorrect_questions": graded["incorrect_questions"],
+                    "detailed_report": graded["detailed_report"],
+                    "created_at": now - timedelta(days=n, minutes=rng.randrange(1440)),
+                    "quiz_type": "diagnostic",
+                })
+            for subtopic_id in rng.sample(subtopic_ids, min(args.progress, len(subtopic_ids))):
+                progress.append({"user_id": user_id, "subtopic_id": subtopic_id, "completed": True,
+                                 "completed_at": now - timedelta(minutes=rng.randrange(10000))})
+            if len(attempts) >= 1000:
+                db.bulk_insert_mappings(QuizAttempt, attempts)
+                db.commit()
+                attempts = []
+        db.bulk_insert_mappings(QuizAttempt, attempts)
+        db.bulk_insert_mappings(SubtopicProgress, progress)
+        db.commit()
+        # Bulk inserts skip the per-submit summary upserts
+        rebuild_summaries(db)
+    finally:
+        db.close()
+
+    print(f"Seeded {args.users} users, {args.users * args.attempts} attempts, "
+          f"{args.users * min(args.progress, len(subtopic_ids))} progress rows in {time.perf_counter() - start:.1f}s")
+
+# ---------- scenarios ----------
+
+async def scenario_login(client, user, rng):
+    return [await client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD})]
+
+async def scenario_diagnostic(client, user, rng):
+    return [await client.get("/api/assessment/diagnostic")]
+
+async def scenario_submit(client, user, rng):
+    from question_bank import QUESTION_BANK
+    questions = rng.sample(QUESTION_BANK, 40)
+    answers = {str(q["id"]): q["correct"] if rng.random() < 0.6 else rng.randrange(4) for q in questions[:36]}
+    payload = {"answers": answers, "skipped": [q["id"] for q in questions[36:]], "question_ids": [q["id"] for q in questions]}
+    return [await client.post("/api/assessment/submit", json=payload, headers=user["headers"])]
+
+async def scenario_toggle_subtopic(client, user, rng):
+    subtopic_id = rng.randint(1, 51)
+    return [await client.post(f"/api/subtopics/{subtopic_id}/complete", json={"completed": rng.random() < 0.7}, headers=user["headers"])]
+
+async def scenario_dashboard(client, user, rng):
+    # The dashboard page issues these together on load
+    return list(await asyncio.gather(
+        client.get("/api/recommendations", headers=user["headers"]),
+        client.get("/api/subtopics/user/progress", headers=user["headers"]),
+        client.get("/api/assessment/history", headers=user["headers"]),
+        client.get("/api/roadmap"),
+    ))
+
+SCENARIO_FUNCS = {
+    "login": scenario_login,
+    "diagnostic": scenario_diagnostic,
+    "submit": scenario_submit,
+    "toggle_subtopic": scenario_toggle_subtopic,
+    "dashboard": scenario_dashboard,
+}
+
+# ---------- measurement ----------
+
+METRIC_LINE = re.compile(r'^db_queries_per_request_(sum|count)\{route="([^"]*)"\} (\S+)$')
+
+async def scrape_query_totals(client):
+    """Total SQL statements and requests seen so far, from the /metrics endpoint"""
+    text = (await client.get("/metrics")).text
+    queries = requests = 0.0
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if not match or match.group(2) == "/metrics":
+            continue
+        if match.group(1) == "sum":
+            queries += float(match.group(3))
+        else:
+            requests += float(match.group(3))
+    return queries, requests
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def run_scenario(client, name, users, iterations, concurrency, seed):
+    func = SCENARIO_FUNCS[name]
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(iterations):
+        queue.put_nowait(users[i % len(users)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                user = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                responses = await func(client, user, rng)
+                if any(r.status_code >= 400 for r in responses):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    queries_before, requests_before = await scrape_query_totals(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    queries_after, requests_after = await scrape_query_totals(client)
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(iterations / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "queries_per_iteration": round((queries_after - queries_before) / iterations, 2),
+        "http_requests_per_iteration": round((requests_after - requests_before) / iterations, 2),
+    }
+
+async def login_users(client, count):
+    users = []
+    for i in range(count):
+        email = EMAIL_TEMPLATE.format(i)
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        users.append({"email": email, "headers": {"Authorization": f"Bearer {response.json()['token']}"}})
+    return users
+
+async def run_async(args):
+    import httpx
+    lifespan = contextlib.nullcontext()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+        # ASGITransport doesn't send lifespan events, so run startup and shutdown around the run
+        lifespan = app.router.lifespan_context(app)
+
+    async with lifespan, client:
+        users = await login_users(client, args.login_users)
+        scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+        results = {}
+        for offset, name in enumerate(scenarios):
+            # Warm-up pass so first-call costs don't skew percentiles
+            await run_scenario(client, name, users, min(args.warmup, args.requests), args.concurrency, args.seed)
+            results[name] = await run_scenario(client, name, users, args.requests, args.concurrency, args.seed + offset)
+            r = results[name]
+            print(f"{name:<17} {r['throughput_rps']:>8} req/s  p50 {r['p50_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  "
+                  f"{r['queries_per_iteration']:>6} queries  {r['errors']} errors")
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    configure_database(args.database_url)
+    results = asyncio.run(run_async(args))
+    baseline = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "mode": "http" if args.url else "in-process",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "scenarios": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Wrote {args.out}")
+
+# ---------- comparison ----------
+
+def compare(args):
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+
+    regressions = []
+    print(f"{'scenario':<17}{'metric':<24}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name, new_stats in new["scenarios"].items():
+        old_stats = old["scenarios"].get(name)
+        if not old_stats:
+            continue
+        for metric, higher_is_better in (("throughput_rps", True), ("p50_ms", False), ("p99_ms", False), ("queries_per_iteration", False)):
+            before, after = old_stats[metric], new_stats[metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  <-- regression" if worse > args.threshold else ""
+            if flag:
+                regressions.append((name, metric))
+            print(f"{name:<17}{metric:<24}{before:>12}{after:>12}{change:>+10.1%}{flag}")
+    if regressions:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="Create a synthetic database")
+    p_seed.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    p_seed.add_argument("--users", type=int, default=200)
+    p_seed.add_argument("--attempts", type=int, default=5, help="Quiz attempts per user")
+    p_seed.add_argument("--progress", type=int, default=20, help="Completed subtopics per user")
+    p_seed.add_argument("--seed", type=int, default=1)
+    p_seed.set_defaults(func=seed)
+
+    p_run = sub.add_parser("run", help="Drive the scenarios and record a baseline")
+    p_run.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    p_run.add_argument("--url", help="Base URL of a running server; omit to run in-process")
+    p_run.add_argument("--scenarios", help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    p_run.add_argument("--requests", type=int, default=200, help="Iterations per scenario")
+    p_run.add_argument("--warmup", type=int, default=20)
+    p_run.add_argument("--concurrency", type=int, default=8)
+    p_run.add_argument("--login-users", type=int, default=20, help="Seeded users to rotate through")
+    p_run.add_argument("--seed", type=int, default=1)
+    p_run.add_argument("--out", help="Write results to this JSON file")
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Compare two baselines")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("candidate")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Relative change flagged as a regression")
+    p_cmp.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, topics, assessment, roadmap, resources, chat, notes, subtopics, recommendation
+from config import get_settings
+from lifecycle import lifespan
+from metrics import MetricsMiddleware
+from routers import auth, topics, assessment, roadmap, resources, chat, notes, subtopics, recommendation, metrics, search, analytics, health
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+settings = get_settings()
+logging.basicConfig(level=settings.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
+# Schema, the cache bus, the sweeper and cache warm-up start and stop with the
+# app (lifecycle.py), not on import
 app = FastAPI(
     title="ZeroToOne API",
     description="AI-Driven Personalized Learning Assistant for DSA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -20,6 +26,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(topics.router)
@@ -30,6 +37,10 @@ app.include_router(chat.router)
 app.include_router(notes.router)
 app.include_router(subtopics.router)
 app.include_router(recommendation.router)
+app.include_router(search.router)
+app.include_router(analytics.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,271 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Kept dependency-free and cheap on the hot path: recording a sample is a
+lock, a bisect and two additions. Exposed at GET /metrics.
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def sum(self, *labels) -> float:
+        series = self._series.get(labels)
+        return series[-1] if series else 0.0
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """
+        Write the current values in text exposition format, atomically, for
+        node_exporter's textfile collector. Used at shutdown so a worker's final
+        counts aren't lost with the process.
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+))
+DB_QUERIES_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request",
+    ("route",), QUERY_COUNT_BUCKETS,
+))
+DB_QUERY_TIME_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_query_seconds_per_request", "Total SQL execution time per HTTP request",
+    ("route",), QUERY_TIME_BUCKETS,
+))
+DB_QUERIES_TOTAL = REGISTRY.register(Counter(
+    "db_queries_total", "SQL statements executed, including those outside requests",
+))
+GEMINI_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "gemini_request_duration_seconds", "Gemini generate_content latency by model and outcome",
+    ("model", "outcome"),
+))
+GEMINI_TOKENS = REGISTRY.register(Counter(
+    "gemini_tokens_total", "Tokens billed by Gemini, from response usage metadata",
+    ("model", "kind"),
+))
+CHAT_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "chat_prompt_tokens", "Estimated input tokens per chat prompt after budgeting",
+    (), TOKEN_BUCKETS,
+))
+CHAT_TRUNCATED_MESSAGES = REGISTRY.register(Counter(
+    "chat_truncated_messages_total", "Chat messages shortened to fit the per-message token cap",
+))
+CHAT_FALLBACKS = REGISTRY.register(Counter(
+    "chat_fallbacks_total", "Chat requests answered offline from the notes, by reason",
+    ("reason",),
+))
+RECOMMENDATIONS_SWEPT = REGISTRY.register(Counter(
+    "recommendations_swept_total", "Expired or completed recommendations deleted by the sweeper",
+))
+RECOMMENDATION_JOB_DURATION = REGISTRY.register(Histogram(
+    "recommendation_job_duration_seconds", "Recommendation generation duration by job and outcome",
+    ("job", "outcome"),
+))
+
+# [query_count, query_seconds] for the request being served; None outside requests.
+# A mutable list is shared with threadpool-run dependencies, which see a copy of the context.
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+def instrument_engine(engine):
+    """Count and time every statement executed through the engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERIES_TOTAL.inc()
+        stats = _request_queries.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and SQL usage per route template"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        stats = [0, 0.0]
+        token = _request_queries.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so random URLs can't explode cardinality
+            route_path = getattr(route, "path", "<unmatched>")
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route_path, str(status_holder[0]))
+            DB_QUERIES_PER_REQUEST.observe(stats[0], route_path)
+            DB_QUERY_TIME_PER_REQUEST.observe(stats[1], route_path)
+
+# google.api_core exception names -> outcome label, matched by name to avoid importing the SDK here
+GEMINI_OUTCOMES = {"ResourceExhausted": "quota", "NotFound": "not_found", "DeadlineExceeded": "timeout"}
+
+@contextmanager
+def observe_gemini(model_name: str):
+    """Time one Gemini call, labelled with its outcome"""
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        outcome = GEMINI_OUTCOMES.get(type(e).__name__, "error")
+        raise
+    finally:
+        GEMINI_REQUEST_DURATION.observe(time.perf_counter() - start, model_name, outcome)
+
+def timed_job(job: str):
+    """Decorator recording the duration of a recommendation job, sync or async"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    RECOMMENDATION_JOB_DURATION.observe(time.perf_counter() - start, job, outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                RECOMMENDATION_JOB_DURATION.observe(time.perf_counter() - start, job, outcome)
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+"""
+Creates the database schema: every table in models.py plus the full-text
+search tables and triggers, adds columns and indexes introduced after a table
+was first created, and seeds the topics and subtopics tables from the
+built-in catalog so progress rows satisfy their foreign keys (PostgreSQL
+enforces them; SQLite does not). Safe to run repeatedly; run it on deploy
+before starting workers so application startup does no DDL.
+
+Usage: python migrate.py
+"""
+import time
+from sqlalchemy import insert, inspect, select, text
+import models
+from database import Base, engine
+from services.search import ensure_search_schema
+
+# Columns added to tables after they were first created, as (table, column, DDL).
+# create_all only creates missing tables, so these are added with ALTER TABLE.
+ADDED_COLUMNS = [
+    ("users", "role", "VARCHAR NOT NULL DEFAULT 'student'"),
+    ("user_notes", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("user_notes", "content_html", "TEXT"),  # NULL until rendered; migrate_notes_html.py backfills it
+    ("revoked_tokens", "revoked_at", "TIMESTAMP"),
+]
+
+# Indexes that earlier versions created and models.py no longer declares
+DROPPED_INDEXES = [
+    "ix_recommendations_completed",  # a lone boolean; ix_recommendations_user_active covers its queries
+]
+
+def add_missing_columns(bind=engine):
+    inspector = inspect(bind)
+    existing = {table: {c["name"] for c in inspector.get_columns(table)} for table in {t for t, _, _ in ADDED_COLUMNS}}
+    with bind.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if column not in existing[table]:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def create_missing_indexes(bind=engine):
+    """Create indexes declared in models.py that existing tables don't have yet, and drop retired ones"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    with bind.begin() as conn:
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def seed_catalog(bind=engine):
+    """Insert built-in topics and subtopics whose ids are missing; existing rows are left alone"""
+    from routers.topics import DEFAULT_TOPICS
+
+    subtopics = [
+        {"id": s["id"], "topic_id": t["id"], "name": s["name"], "description": s["description"], "order": i}
+        for t in DEFAULT_TOPICS for i, s in enumerate(t["subtopics"])
+    ]
+    topics = [{key: t[key] for key in ("id", "name", "description", "order", "prerequisites", "summary_notes")}
+              for t in DEFAULT_TOPICS]
+    with bind.begin() as conn:
+        for model, rows in ((models.Topic, topics), (models.Subtopic, subtopics)):
+            existing = set(conn.execute(select(model.id)).scalars())
+            missing = [row for row in rows if row["id"] not in existing]
+            if missing:
+                conn.execute(insert(model), missing)
+
+def upgrade(bind=engine):
+    Base.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+    create_missing_indexes(bind)
+    ensure_search_schema(bind)
+    seed_catalog(bind)
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    upgrade()
+    print(f"Migration Complete: schema up to date in {time.perf_counter() - started:.2f}s.")
@@ -0,0 +1,32 @@
+"""
+Brings the schema up to date (users.role and the daily analytics summary
+tables, see migrate.py), then rebuilds the summaries from every stored quiz
+attempt. Safe to run repeatedly.
+Grant instructor access with: python migrate_analytics.py --instructor someone@example.com
+"""
+import argparse
+from sqlalchemy import text
+import migrate
+from database import SessionLocal, engine
+from routers.auth import invalidate_user
+from services.analytics import rebuild_summaries
+
+def migrate_db(instructors=()):
+    migrate.upgrade(engine)
+    with engine.begin() as conn:
+        for email in instructors:
+            conn.execute(text("UPDATE users SET role = 'instructor' WHERE email = :email"), {"email": email})
+    for email in instructors:
+        invalidate_user(email)
+
+    db = SessionLocal()
+    try:
+        folded = rebuild_summaries(db)
+    finally:
+        db.close()
+    print(f"Migration Complete: users.role ready, analytics rebuilt from {folded} quiz attempts.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instructor", action="append", default=[], help="email to grant instructor access (repeatable)")
+    migrate_db(parser.parse_args().instructor)
@@ -0,0 +1,38 @@
+"""
+Renders every note that doesn't have cached HTML yet, after migrate.py has
+added the content_html column and listing index. Safe to run repeatedly.
+Re-run with --all after changing services/rendering.py to refresh every note.
+"""
+import sys
+from sqlalchemy import text
+import migrate
+from database import engine
+from services.rendering import render_markdown
+
+BATCH_SIZE = 500
+
+def migrate_db(rerender_all: bool = False):
+    migrate.upgrade(engine)
+
+    condition = "" if rerender_all else "AND content_html IS NULL"
+    rendered = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(f"SELECT id, content FROM user_notes WHERE id > :last_id {condition} ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                text("UPDATE user_notes SET content_html = :html WHERE id = :id"),
+                [{"id": row.id, "html": render_markdown(row.content or "")} for row in rows],
+            )
+        rendered += len(rows)
+        last_id = rows[-1].id
+
+    print(f"Migration Complete: content_html ready, {rendered} notes rendered.")
+
+if __name__ == "__main__":
+    migrate_db(rerender_all="--all" in sys.argv)
@@ -0,0 +1,14 @@
+"""
+Adds the row version used for optimistic concurrency on user_notes; existing
+notes start at version 1. The column is part of migrate.py now, so this runs
+the full migration. Safe to run repeatedly.
+"""
+import migrate
+from database import engine
+
+def migrate_db():
+    migrate.upgrade(engine)
+    print("Migration Complete: user_notes.version ready.")
+
+if __name__ == "__main__":
+    migrate_db()
@@ -1,23 +1,20 @@
-import sqlite3
+"""
+Adds the tags and difficulty_score columns to questions. Safe to run repeatedly.
+"""
+from sqlalchemy import inspect, text
+from database import engine
+from models import JSONType
 
 def migrate_db():
-    conn = sqlite3.connect('learnpath.db')
-    cursor = conn.cursor()
-    
-    # Check if 'tags' column exists in 'questions' table
-    cursor.execute("PRAGMA table_info(questions)")
-    columns = [info[1] for info in cursor.fetchall()]
-    
-    if 'tags' not in columns:
-        print("Migrating: Adding 'tags' column to questions table...")
-        cursor.execute("ALTER TABLE questions ADD COLUMN tags JSON DEFAULT '[]'")
-    
-    if 'difficulty_score' not in columns:
-        print("Migrating: Adding 'difficulty_score' column to questions table...")
-        cursor.execute("ALTER TABLE questions ADD COLUMN difficulty_score INTEGER DEFAULT 5")
-        
-    conn.commit()
-    conn.close()
+    columns = {c["name"] for c in inspect(engine).get_columns("questions")}
+    json_type = JSONType().compile(dialect=engine.dialect)  # JSON on SQLite, JSONB on PostgreSQL
+    with engine.begin() as conn:
+        if "tags" not in columns:
+            print("Migrating: Adding 'tags' column to questions table...")
+            conn.execute(text(f"ALTER TABLE questions ADD COLUMN tags {json_type} DEFAULT '[]'"))
+        if "difficulty_score" not in columns:
+            print("Migrating: Adding 'difficulty_score' column to questions table...")
+            conn.execute(text("ALTER TABLE questions ADD COLUMN difficulty_score INTEGER DEFAULT 5"))
     print("Migration Check Complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+"""
+Gives recommendations created before expiry existed a full TTL from now, so
+the sweeper eventually removes them too, after migrate.py has added the
+expiry indexes. Safe to run repeatedly.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from config import get_settings
+import migrate
+from database import engine
+
+def migrate_db():
+    expires_at = datetime.utcnow() + timedelta(hours=get_settings().recommendation_ttl_hours)
+    migrate.upgrade(engine)
+    with engine.begin() as conn:
+        result = conn.execute(
+            text("UPDATE recommendations SET expires_at = :expires_at WHERE expires_at IS NULL"),
+            {"expires_at": expires_at},
+        )
+    print(f"Migration Complete: recommendation indexes ready, {result.rowcount} rows given an expiry.")
+
+if __name__ == "__main__":
+    migrate_db()
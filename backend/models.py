@@ -1,8 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, JSON, Text, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from database import Base
 
+class JSONType(TypeDecorator):
+    """JSON on SQLite, binary JSONB on PostgreSQL (no re-parsing on read, indexable)"""
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            # Imported here so SQLite deployments don't load the PostgreSQL dialect at startup
+            from sqlalchemy.dialects.postgresql import JSONB
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(JSON())
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -10,6 +23,7 @@ class User(Base):
     name = Column(String)
     hashed_password = Column(String)
     language_preference = Column(String, default="en")  # "en" or "hi"
+    role = Column(String, default="student", nullable=False, server_default="student")  # "student" or "instructor"
     created_at = Column(DateTime, default=datetime.utcnow)
     progress = relationship("UserProgress", back_populates="user")
     notes = relationship("UserNote", back_populates="user")
@@ -24,11 +38,11 @@ class Topic(Base):
     name = Column(String, index=True)
     description = Column(String)
     order = Column(Integer)
-    prerequisites = Column(JSON, default=[])
+    prerequisites = Column(JSONType, default=[])
     summary_notes = Column(Text, nullable=True)  # Auto-generated topic summary
     questions = relationship("Question", back_populates="topic")
     resources = relationship("Resource", back_populates="topic")
-    subtopics = relationship("Subtopic", back_populates="topic")
+    subtopics = relationship("Subtopic", back_populates="topic", order_by="Subtopic.order")
     leetcode_problems = relationship("LeetCodeProblem", back_populates="topic")
 
 class Subtopic(Base):
@@ -57,11 +71,11 @@ class Question(Base):
     topic_id = Column(Integer, ForeignKey("topics.id"))
     text = Column(String)
     text_hi = Column(String, nullable=True)  # Hindi translation
-    options = Column(JSON)
-    options_hi = Column(JSON, nullable=True)  # Hindi options
+    options = Column(JSONType)
+    options_hi = Column(JSONType, nullable=True)  # Hindi options
     correct_answer = Column(Integer)
     difficulty = Column(String, default="medium")
-    tags = Column(JSON, default=[])  # e.g., ["Arrays", "Two Pointers"]
+    tags = Column(JSONType, default=[])  # e.g., ["Arrays", "Two Pointers"]
     difficulty_score = Column(Integer, default=5)  # 1-10
     topic = relationship("Topic", back_populates="questions")
 
@@ -94,10 +108,19 @@ class UserNote(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     topic_id = Column(Integer, ForeignKey("topics.id"))
     content = Column(Text)
+    content_html = Column(Text, nullable=True)  # content rendered on write, see services/rendering.py
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
     user = relationship("User", back_populates="notes")
 
+    # UPDATEs are conditioned on the version read, so concurrent edits fail instead of clobbering
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        # Serves the keyset-paginated "my notes" listing
+        Index("ix_user_notes_user_topic_updated", "user_id", "topic_id", "updated_at"),
+    )
+
 class UserProgress(Base):
     __tablename__ = "user_progress"
     id = Column(Integer, primary_key=True, index=True)
@@ -135,7 +158,7 @@ class Recommendation(Base):
     __tablename__ = "recommendations"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    type = Column(String)  # 'question', 'video', 'topic_focus'
+    type = Column(String)  # 'question', 'video', 'problem', 'topic_focus'
     
     # Content details (stored to avoid complex joins and external API calls on read)
     content_id = Column(Integer, nullable=True)  # ID of question/resource if internal
@@ -152,6 +175,13 @@ class Recommendation(Base):
     
     user = relationship("User", back_populates="recommendations")
 
+    __table_args__ = (
+        # Active recommendations for a user, and the sweeper's scan for expired rows. Completed
+        # rows are few and short-lived, so a boolean index would cost writes without narrowing reads.
+        Index("ix_recommendations_user_active", "user_id", "is_completed", "expires_at"),
+        Index("ix_recommendations_expires_at", "expires_at"),
+    )
+
 class QuizAttempt(Base):
     """Stores quiz attempt history for users"""
     __tablename__ = "quiz_attempts"
@@ -166,9 +196,9 @@ class QuizAttempt(Base):
     skipped_count = Column(Integer)
     
     # Detailed data stored as JSON
-    topic_mastery = Column(JSON)  # List of {topic, mastery, correct, total}
-    incorrect_questions = Column(JSON)  # List of {id, topic, question, your_answer, correct_answer}
-    detailed_report = Column(JSON)  # Full question-by-question breakdown
+    topic_mastery = Column(JSONType)  # List of {topic, mastery, correct, total}
+    incorrect_questions = Column(JSONType)  # List of {id, topic, question, your_answer, correct_answer}
+    detailed_report = Column(JSONType)  # Full question-by-question breakdown
     
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -176,3 +206,35 @@ class QuizAttempt(Base):
     
     user = relationship("User", back_populates="quiz_attempts")
 
+    __table_args__ = (
+        # A user's attempts newest first: history and the ranking's recent attempts
+        Index("ix_quiz_attempts_user_created", "user_id", "created_at"),
+    )
+
+
+class TopicDailyStats(Base):
+    """Per-day, per-topic quiz results bucketed by mastery; maintained on submit by services/analytics.py"""
+    __tablename__ = "topic_daily_stats"
+    day = Column(Date, primary_key=True)
+    topic_id = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # mastery decile, 0-9
+    attempts = Column(Integer, default=0, nullable=False)
+    answered = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    mastery_sum = Column(Float, default=0.0, nullable=False)
+
+class QuestionDailyStats(Base):
+    """Per-day, per-question answer counts; maintained on submit by services/analytics.py"""
+    __tablename__ = "question_daily_stats"
+    day = Column(Date, primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    skipped = Column(Integer, default=0, nullable=False)
+
+class RevokedToken(Base):
+    """Rotated refresh tokens and logged-out sessions (by token or family id), kept until they would expire"""
+    __tablename__ = "revoked_tokens"
+    token_id = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)  # starts the reuse grace window of a rotated refresh token
@@ -0,0 +1,139 @@
+"""
+Batch precomputation of recommendations for every user, meant to run nightly
+(e.g. from cron) so morning dashboard traffic reads stored rows instead of
+triggering generation.
+
+Users are walked in id order, one chunk at a time. Each chunk's inputs are
+loaded with one query per table, ranked in a process pool (services/ranking.py)
+while the next chunk loads, and written back in a single transaction: one
+DELETE and one multi-row INSERT per chunk. It lifts PostgreSQL's
+per-statement timeout (DB_STATEMENT_TIMEOUT_MS) on its own connections.
+
+Cached recommendations are invalidated once per chunk through the cache bus,
+so the server's workers must share one with this script
+(CACHE_BACKEND=sqlite or redis, same CACHE_BUS_URL). With
+CACHE_BACKEND=local the invalidations never leave this process and the
+script refuses to run unless --allow-stale is given; workers then serve
+their cached recommendations until CACHE_TTL_SECONDS passes or they restart.
+
+Usage: python precompute_recommendations.py [--chunk-size 500] [--workers 4] [--allow-stale]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import delete, insert, select
+import models
+from cache import cache
+from config import get_settings
+from database import SessionLocal, engine, without_statement_timeout
+from services.ranking import UserState, get_pool, load_user_states, rank
+from services.recommendation import CACHE_NAMESPACE, RECOMMENDATION_LIMIT
+
+def iter_user_chunks(chunk_size: int) -> Iterator[List[int]]:
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            without_statement_timeout(conn)
+            ids = conn.execute(
+                select(models.User.id).where(models.User.id > last_id).order_by(models.User.id).limit(chunk_size)
+            ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+def rank_states(states: List[UserState], now: datetime) -> List[Tuple[int, List[dict]]]:
+    return [(state.user_id, rank(state, RECOMMENDATION_LIMIT, now)) for state in states]
+
+def write_chunk(user_ids: List[int], ranked: List[Tuple[int, List[dict]]], expires_at: datetime):
+    rows = [
+        {
+            "user_id": user_id,
+            "type": item["type"],
+            "content_id": item["content_id"],
+            "title": item["title"],
+            "description": item["description"],
+            "action_url": item["action_url"],
+            "source": "rule_based",
+            "priority": item["priority"],
+            "is_completed": False,
+            "expires_at": expires_at,
+        }
+        for user_id, items in ranked
+        for item in items
+    ]
+    with engine.begin() as conn:
+        # A large chunk's INSERT can outlast the per-statement limit
+        without_statement_timeout(conn)
+        conn.execute(delete(models.Recommendation).where(models.Recommendation.user_id.in_(user_ids)))
+        if rows:
+            conn.execute(insert(models.Recommendation), rows)
+    # One message for the chunk rather than one per user
+    cache.invalidate(CACHE_NAMESPACE)
+
+def _split(states: List[UserState], parts: int) -> List[List[UserState]]:
+    size = max(1, -(-len(states) // parts))
+    return [states[i:i + size] for i in range(0, len(states), size)]
+
+def precompute(chunk_size: int = 500, workers: int = 0, now: Optional[datetime] = None) -> int:
+    """Regenerate every user's recommendations. Returns the number of users processed."""
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(hours=get_settings().recommendation_ttl_hours)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=get_pool) if workers > 0 else None
+    pending: Optional[Tuple[List[int], List[Future]]] = None
+    processed = 0
+    started = time.perf_counter()
+
+    def finish(user_ids: List[int], futures: List[Future]):
+        nonlocal processed
+        ranked = [pair for future in futures for pair in future.result()]
+        write_chunk(user_ids, ranked, expires_at)
+        processed += len(user_ids)
+        elapsed = time.perf_counter() - started
+        print(f"  {processed} users ({processed / elapsed:.0f} users/sec)")
+
+    try:
+        for user_ids in iter_user_chunks(chunk_size):
+            db = SessionLocal()
+            try:
+                # The set-based loads read a whole chunk's attempts and progress at once
+                without_statement_timeout(db.connection())
+                states = list(load_user_states(db, user_ids).values())
+            finally:
+                db.close()
+            if executor is None:
+                done = Future()
+                done.set_result(rank_states(states, now))
+                futures = [done]
+            else:
+                # Rank this chunk in the pool while the previous one is written and the next one loads
+                futures = [executor.submit(rank_states, part, now) for part in _split(states, workers)]
+            if pending is not None:
+                finish(*pending)
+            pending = (user_ids, futures)
+        if pending is not None:
+            finish(*pending)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print(f"Precomputed recommendations for {processed} users in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.0f} users/sec).")
+    return processed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="ranking processes; 0 ranks in this process")
+    parser.add_argument("--allow-stale", action="store_true",
+                        help="run without a shared cache bus; workers keep cached recommendations until TTL or restart")
+    args = parser.parse_args()
+    if get_settings().cache_backend == "local" and not args.allow_stale:
+        parser.error("CACHE_BACKEND=local cannot invalidate the server's caches; set CACHE_BACKEND "
+                     "and CACHE_BUS_URL as the server does, or pass --allow-stale")
+    precompute(args.chunk_size, args.workers)
@@ -0,0 +1,64 @@
+"""
+Hot read queries as prebuilt select() statements.
+
+Building a statement through db.query(...).filter(...) costs more Python
+than running it on SQLite: every call constructs a new Query, walks it to
+compute its cache key and only then finds the compiled SQL in SQLAlchemy's
+cache. These statements are built once at import with bound parameters, so a
+call only binds values (bench_queries.py measures the difference). Lists
+use expanding parameters, so every list length shares one compiled form.
+
+Run them with db.execute(STATEMENT, {params}).
+"""
+from datetime import datetime
+from sqlalchemy import bindparam, or_, select
+import models
+
+_User = models.User
+_Progress = models.SubtopicProgress
+_Recommendation = models.Recommendation
+
+# {email} -> User
+USER_BY_EMAIL = select(_User).where(_User.email == bindparam("email")).limit(1)
+
+# {user_id, subtopic_id} -> SubtopicProgress
+SUBTOPIC_PROGRESS = select(_Progress).where(
+    _Progress.user_id == bindparam("user_id"),
+    _Progress.subtopic_id == bindparam("subtopic_id"),
+).limit(1)
+
+# {user_id, subtopic_ids} -> subtopic ids completed among subtopic_ids
+COMPLETED_SUBTOPIC_IDS_IN = select(_Progress.subtopic_id).where(
+    _Progress.user_id == bindparam("user_id"),
+    _Progress.subtopic_id.in_(bindparam("subtopic_ids", expanding=True)),
+    _Progress.completed == True,
+)
+
+# {user_id} -> every subtopic id the user completed
+COMPLETED_SUBTOPIC_IDS = select(_Progress.subtopic_id).where(
+    _Progress.user_id == bindparam("user_id"),
+    _Progress.completed == True,
+)
+
+# {user_id, now, limit} -> the user's open, unexpired Recommendations, highest priority first
+ACTIVE_RECOMMENDATIONS = select(_Recommendation).where(
+    _Recommendation.user_id == bindparam("user_id"),
+    _Recommendation.is_completed == False,
+    or_(_Recommendation.expires_at.is_(None), _Recommendation.expires_at > bindparam("now")),
+).order_by(_Recommendation.priority.desc()).limit(bindparam("limit"))
+
+# {user_ids, now} -> the same for several users, grouped by user
+ACTIVE_RECOMMENDATIONS_FOR_USERS = select(_Recommendation).where(
+    _Recommendation.user_id.in_(bindparam("user_ids", expanding=True)),
+    _Recommendation.is_completed == False,
+    or_(_Recommendation.expires_at.is_(None), _Recommendation.expires_at > bindparam("now")),
+).order_by(_Recommendation.user_id, _Recommendation.priority.desc())
+
+# Statements worth compiling ahead of the first request, with parameters matching nothing
+WARMUP = (
+    (USER_BY_EMAIL, {"email": ""}),
+    (SUBTOPIC_PROGRESS, {"user_id": 0, "subtopic_id": 0}),
+    (COMPLETED_SUBTOPIC_IDS_IN, {"user_id": 0, "subtopic_ids": [0]}),
+    (COMPLETED_SUBTOPIC_IDS, {"user_id": 0}),
+    (ACTIVE_RECOMMENDATIONS, {"user_id": 0, "now": datetime.min, "limit": 1}),
+)
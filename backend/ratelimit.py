@@ -0,0 +1,177 @@
+"""
+Per-user throttling and request coalescing for expensive endpoints.
+
+RateLimit is a FastAPI dependency backed by a token bucket. Buckets live in
+a pluggable store: in-memory per process by default, or a shared SQLite
+file when CACHE_BACKEND=sqlite. Other shared stores can be installed with
+set_bucket_store().
+SingleFlight lets concurrent identical requests share one computation.
+"""
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+from fastapi import Depends, HTTPException, Request
+from cache import DEFAULT_BUS_PATH
+from config import get_settings
+from metrics import REGISTRY, Counter
+from routers.auth import get_optional_user
+
+RATE_LIMITED = REGISTRY.register(Counter(
+    "rate_limited_requests_total", "Requests rejected by the rate limiter", ("endpoint",),
+))
+COALESCED = REGISTRY.register(Counter(
+    "coalesced_requests_total", "Requests served by joining an identical in-flight computation", ("endpoint",),
+))
+
+class InMemoryBucketStore:
+    """Token buckets in a process-local dict, pruned once it grows past max_keys"""
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: Hashable, capacity: float, refill_per_second: float, now: float) -> float:
+        """Take one token. Returns 0 if allowed, otherwise seconds until a token is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / refill_per_second
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, capacity, refill_per_second)
+            return wait
+
+    def _prune(self, now: float, capacity: float, refill_per_second: float):
+        # A bucket that would have refilled completely carries no state worth keeping
+        full_after = capacity / refill_per_second
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by every worker on the host"""
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: Hashable, capacity: float, refill_per_second: float, now: float) -> float:
+        key_text = "|".join(map(str, key)) if isinstance(key, tuple) else str(key)
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key_text,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / refill_per_second
+            if wait == 0.0:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key_text, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+_settings = get_settings()
+if _settings.cache_backend == "sqlite":
+    _bucket_store = SQLiteBucketStore(_settings.cache_bus_url or DEFAULT_BUS_PATH)
+else:
+    _bucket_store = InMemoryBucketStore()
+
+def set_bucket_store(store):
+    """Install a shared bucket store (any object with the InMemoryBucketStore.take signature)"""
+    global _bucket_store
+    _bucket_store = store
+
+def get_bucket_store():
+    return _bucket_store
+
+class RateLimit:
+    """
+    Dependency enforcing `capacity` burst requests and `per_minute` sustained
+    requests per user (or per client address when unauthenticated).
+    """
+    def __init__(self, endpoint: str, capacity: int, per_minute: float):
+        self.endpoint = endpoint
+        self.capacity = capacity
+        self.refill_per_second = per_minute / 60
+
+    async def __call__(self, request: Request, user=Depends(get_optional_user)):
+        if user is not None:
+            subject = f"user:{user.id}"
+        else:
+            subject = f"ip:{request.client.host if request.client else 'unknown'}"
+        wait = _bucket_store.take((self.endpoint, subject), self.capacity, self.refill_per_second, time.time())
+        if wait > 0:
+            RATE_LIMITED.inc(self.endpoint)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please slow down.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+        return user
+
+class SingleFlight:
+    """Concurrent calls with the same key await one shared computation"""
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        _flights.append(self)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]):
+        future = self._inflight.get(key)
+        if future is not None:
+            COALESCED.inc(self.endpoint)
+            # Shield so one cancelled waiter doesn't cancel the shared work
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func())
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def pending(self) -> List[asyncio.Future]:
+        return [future for future in self._inflight.values() if not future.done()]
+
+_flights: List[SingleFlight] = []
+
+async def drain_flights(timeout: float) -> int:
+    """
+    Wait up to `timeout` seconds for shared computations still running, e.g.
+    ones every waiter has disconnected from. Returns how many were left unfinished.
+    """
+    pending = [future for flight in _flights for future in flight.pending()]
+    if not pending:
+        return 0
+    _, not_done = await asyncio.wait(pending, timeout=timeout)
+    return len(not_done)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel
+from database import get_db
+from models import User
+from routers.auth import get_current_instructor
+from services import analytics as analytics_service
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+class TopicStats(BaseModel):
+    topic_id: int
+    topic: str
+    attempts: int
+    answered: int
+    correct: int
+    accuracy: float
+    mean_mastery: float
+    weak_share: float  # share of attempts below 60% mastery
+    distribution: List[int]  # attempts per mastery decile, 0-10% first
+
+class MissedQuestion(BaseModel):
+    question_id: int
+    topic_id: Optional[int]
+    text: str
+    difficulty: Optional[str]
+    attempts: int
+    missed: int
+    skipped: int
+    miss_rate: float
+
+class TrendPoint(BaseModel):
+    day: str
+    attempts: int
+    accuracy: float
+    mean_mastery: float
+
+Days = Query(30, ge=1, le=analytics_service.MAX_DAYS)
+
+@router.get("/topics", response_model=List[TopicStats])
+def topic_stats(days: int = Days, db: Session = Depends(get_db), instructor: User = Depends(get_current_instructor)):
+    """Class-wide mastery per topic over the last `days` days"""
+    return analytics_service.topic_overview(db, days)
+
+@router.get("/questions/most-missed", response_model=List[MissedQuestion])
+def most_missed(
+    days: int = Days,
+    topic_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    instructor: User = Depends(get_current_instructor),
+):
+    return analytics_service.most_missed_questions(db, days, limit, topic_id)
+
+@router.get("/trend", response_model=List[TrendPoint])
+def trend(
+    days: int = Days,
+    topic_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    instructor: User = Depends(get_current_instructor),
+):
+    return analytics_service.mastery_trend(db, days, topic_id)
@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
@@ -6,11 +7,15 @@ from database import get_db
 from models import Question, QuestionAttempt, UserProgress, User, QuizAttempt
 from routers.auth import get_current_user
 from services.recommendation import RecommendationService
+from services.analytics import record_quiz_attempt
 from datetime import datetime
+from functools import lru_cache
 import random
 from question_bank import QUESTION_BANK
+from serialization import FastJSONResponse
 
 router = APIRouter(prefix="/api/assessment", tags=["assessment"])
+logger = logging.getLogger(__name__)
 
 class QuestionResponse(BaseModel):
     id: int
@@ -31,25 +36,85 @@ class SkipQuestionRequest(BaseModel):
 class SkipAllRequest(BaseModel):
     start_from_basics: bool = True
 
+class TopicMasteryItem(BaseModel):
+    topic: str
+    mastery: float
+    correct: int
+    total: int
+    skipped: int = 0
+
+class IncorrectQuestion(BaseModel):
+    id: int
+    topic: str
+    question: str
+    your_answer: Optional[str]
+    correct_answer: str
+
+class SkippedQuestion(BaseModel):
+    id: int
+    topic: str
+    question: str
+    correct_answer: str
+
+class QuestionReport(BaseModel):
+    id: int
+    topic: str
+    text: str
+    difficulty: str
+    options: List[str]
+    correct_answer_index: int
+    correct_answer_text: str
+    user_answer_index: Optional[int]
+    user_answer_text: Optional[str]
+    is_correct: Optional[bool]
+    is_skipped: bool
+
+class SubmitResponse(BaseModel):
+    attemptId: int
+    overallScore: float
+    topicMastery: List[TopicMasteryItem]
+    totalQuestions: int
+    answered: int
+    skipped: int
+    correctCount: int
+    incorrectCount: int
+    incorrectQuestions: List[IncorrectQuestion]
+    skippedQuestions: List[SkippedQuestion]
+    detailedReport: List[QuestionReport]
+
+class QuizAttemptDetail(BaseModel):
+    id: int
+    overallScore: float
+    totalQuestions: int
+    correctCount: int
+    incorrectCount: int
+    skippedCount: int
+    quizType: str
+    createdAt: Optional[str]
+    topicMastery: List[TopicMasteryItem]
+    incorrectQuestions: List[IncorrectQuestion]
+    detailedReport: List[QuestionReport]
+
 # Number of questions to display per quiz (randomly selected from bank)
 QUESTIONS_PER_QUIZ = 40
 QUESTIONS_PER_TOPIC = 5  # 5 questions per topic for balanced quiz
 
+@lru_cache(maxsize=None)
+def questions_by_topic() -> Dict[int, List[dict]]:
+    """Question bank grouped by topic id, in bank order. Built once, on first use or at warm-up."""
+    index: Dict[int, List[dict]] = {}
+    for q in QUESTION_BANK:
+        index.setdefault(q["topic_id"], []).append(q)
+    return index
+
 def get_random_questions(topic_ids: Optional[List[int]] = None):
     """Select random questions from bank, balanced across topics"""
     questions = []
     
-    # Group questions by topic
-    topics = {}
-    for q in QUESTION_BANK:
-        if topic_ids and q["topic_id"] not in topic_ids:
-            continue
-        if q["topic_id"] not in topics:
-            topics[q["topic_id"]] = []
-        topics[q["topic_id"]].append(q)
-    
     # Select random questions from each topic
-    for topic_id, topic_questions in topics.items():
+    for topic_id, topic_questions in questions_by_topic().items():
+        if topic_ids and topic_id not in topic_ids:
+            continue
         count = min(QUESTIONS_PER_TOPIC, len(topic_questions))
         selected = random.sample(topic_questions, count)
         questions.extend(selected)
@@ -82,15 +147,8 @@ async def get_diagnostic(topic_ids: Optional[str] = None):
         "can_skip": True
     }
 
-@router.post("/submit")
-async def submit_assessment(
-    submit_data: SubmitRequest, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    answers = submit_data.answers
-    skipped_ids = submit_data.skipped
-    question_ids = submit_data.question_ids  # Questions that were shown
+def grade_submission(questions_to_check: list, answers: Dict[str, int], skipped_ids: set) -> dict:
+    """Score answers against the given questions and build the per-question report"""
     topic_scores = {}
     skipped_count = 0
     
@@ -99,11 +157,6 @@ async def submit_assessment(
     incorrect_questions = []
     skipped_questions = []
     
-    # Filter to only questions that were shown (if provided)
-    questions_to_check = QUESTION_BANK
-    if question_ids:
-        questions_to_check = [q for q in QUESTION_BANK if q["id"] in question_ids]
-    
     for q in questions_to_check:
         qid = str(q["id"])
         topic = q["topic"]
@@ -173,7 +226,42 @@ async def submit_assessment(
     
     total_answered = sum(s["total"] for s in topic_scores.values())
     total_correct = sum(s["correct"] for s in topic_scores.values())
-    overall = total_correct / max(total_answered, 1)
+    
+    return {
+        "topic_mastery": topic_mastery,
+        "detailed_report": detailed_report,
+        "incorrect_questions": incorrect_questions,
+        "skipped_questions": skipped_questions,
+        "skipped_count": skipped_count,
+        "total_answered": total_answered,
+        "total_correct": total_correct,
+        "overall": total_correct / max(total_answered, 1),
+    }
+
+# Heavy endpoints return FastJSONResponse directly: the typed models document the
+# response shape while the payload skips jsonable_encoder and model re-validation
+@router.post("/submit", response_model=SubmitResponse, response_class=FastJSONResponse)
+def submit_assessment(
+    submit_data: SubmitRequest, 
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    question_ids = set(submit_data.question_ids)  # Questions that were shown
+    
+    # Filter to only questions that were shown (if provided)
+    questions_to_check = QUESTION_BANK
+    if question_ids:
+        questions_to_check = [q for q in QUESTION_BANK if q["id"] in question_ids]
+    
+    graded = grade_submission(questions_to_check, submit_data.answers, set(submit_data.skipped))
+    topic_mastery = graded["topic_mastery"]
+    detailed_report = graded["detailed_report"]
+    incorrect_questions = graded["incorrect_questions"]
+    skipped_questions = graded["skipped_questions"]
+    skipped_count = graded["skipped_count"]
+    total_answered = graded["total_answered"]
+    total_correct = graded["total_correct"]
+    overall = graded["overall"]
     
     # Save quiz attempt to history FIRST (before recommendations to ensure persistence)
     try:
@@ -190,22 +278,23 @@ async def submit_assessment(
             quiz_type="diagnostic"
         )
         db.add(quiz_attempt)
+        record_quiz_attempt(db, quiz_attempt)
         db.commit()
         db.refresh(quiz_attempt)
-        print(f"Quiz attempt {quiz_attempt.id} saved successfully for user {current_user.id}")
+        logger.info("Quiz attempt %s saved for user %s", quiz_attempt.id, current_user.id)
     except Exception as e:
         db.rollback()
-        print(f"ERROR: Failed to save quiz attempt: {e}")
+        logger.exception("Failed to save quiz attempt for user %s", current_user.id)
         raise HTTPException(status_code=500, detail=f"Failed to save quiz attempt: {str(e)}")
     
     # Generate recommendations based on quiz results (non-blocking)
     try:
         rec_service = RecommendationService(db, current_user.id)
-        await rec_service.generate_recommendations_from_assessment(topic_mastery)
+        rec_service.generate_recommendations_from_assessment(topic_mastery)
     except Exception as e:
-        print(f"Recommendation generation failed (non-blocking): {e}")
+        logger.warning("Recommendation generation failed (non-blocking): %s", e)
     
-    return {
+    return FastJSONResponse({
         "attemptId": quiz_attempt.id,
         "overallScore": overall, 
         "topicMastery": topic_mastery,
@@ -217,7 +306,7 @@ async def submit_assessment(
         "incorrectQuestions": incorrect_questions,
         "skippedQuestions": skipped_questions,
         "detailedReport": detailed_report
-    }
+    })
 
 @router.post("/skip-question")
 async def skip_question(request: SkipQuestionRequest):
@@ -235,7 +324,7 @@ async def skip_all(request: SkipAllRequest, db: Session = Depends(get_db)):
 
 @router.get("/topic/{topic_id}")
 async def get_topic_questions(topic_id: int):
-    questions = [q for q in SAMPLE_QUESTIONS if q["topic_id"] == topic_id]
+    questions = questions_by_topic().get(topic_id, [])
     return {
         "questions": [
             {
@@ -251,15 +340,7 @@ async def get_topic_questions(topic_id: int):
 @router.get("/reassess")
 async def get_reassess_questions(db: Session = Depends(get_db)):
     """Get a comprehensive reassessment quiz (one random question from each topic)"""
-    import random
-    
-    questions = []
-    topics = set(q["topic_id"] for q in SAMPLE_QUESTIONS)
-    
-    for topic_id in topics:
-        topic_questions = [q for q in SAMPLE_QUESTIONS if q["topic_id"] == topic_id]
-        if topic_questions:
-            questions.append(random.choice(topic_questions))
+    questions = [random.choice(topic_questions) for topic_questions in questions_by_topic().values()]
             
     return {
         "questions": [
@@ -277,7 +358,7 @@ async def get_reassess_questions(db: Session = Depends(get_db)):
     }
 
 @router.get("/history")
-async def get_quiz_history(
+def get_quiz_history(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -302,8 +383,8 @@ async def get_quiz_history(
         "total": len(attempts)
     }
 
-@router.get("/history/{attempt_id}")
-async def get_quiz_attempt_detail(
+@router.get("/history/{attempt_id}", response_model=QuizAttemptDetail, response_class=FastJSONResponse)
+def get_quiz_attempt_detail(
     attempt_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -317,7 +398,7 @@ async def get_quiz_attempt_detail(
     if not attempt:
         raise HTTPException(status_code=404, detail="Quiz attempt not found")
     
-    return {
+    return FastJSONResponse({
         "id": attempt.id,
         "overallScore": attempt.overall_score,
         "totalQuestions": attempt.total_questions,
@@ -329,5 +410,5 @@ async def get_quiz_attempt_detail(
         "topicMastery": attempt.topic_mastery,
         "incorrectQuestions": attempt.incorrect_questions,
         "detailedReport": attempt.detailed_report
-    }
+    })
 
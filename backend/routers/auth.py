@@ -1,18 +1,21 @@
-from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
 import bcrypt
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User
 from config import get_settings
+from cache import cache
+import queries
+from services.tokens import TokenError, create_token_pair, decode_token, revoke_session, rotate_refresh_token
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 class UserCreate(BaseModel):
     name: str
@@ -24,9 +27,17 @@ class UserResponse(BaseModel):
     id: int
     name: str
     email: str
-    token: str
+    token: str  # short-lived access token
+    refresh_token: str
+    expires_in: int  # access token lifetime in seconds
     language_preference: str = "en"
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+def user_response(user: User, tokens: dict) -> UserResponse:
+    return UserResponse(id=user.id, name=user.name, email=user.email, language_preference=user.language_preference, **tokens)
+
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -35,46 +46,111 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode('utf-8')
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+        email: str = decode_token(token, "access")["sub"]
+    except TokenError:
         raise credentials_exception
-    user = db.query(User).filter(User.email == email).first()
+    cached = cache.get("auth", email)
+    if cached is not None:
+        # Reattach the cached row to this session without a SELECT
+        return db.merge(cached, load=False)
+    user = get_user_by_email(db, email)
     if user is None:
         raise credentials_exception
-    return user
+    cache_user(db, user)
+    return db.merge(user, load=False)
+
+async def get_current_instructor(current_user: User = Depends(get_current_user)):
+    if current_user.role != "instructor":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Instructor access required")
+    return current_user
+
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.execute(queries.USER_BY_EMAIL, {"email": email}).scalars().first()
+
+def cache_user(db: Session, user: User):
+    """Detach a freshly loaded user and keep it for get_current_user"""
+    db.expunge(user)
+    cache.set("auth", user.email, user)
+
+def invalidate_user(email: str):
+    """Call after changing a user row so every worker reloads it"""
+    cache.invalidate("auth", email)
+
+def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)):
+    """Like get_current_user, but returns None instead of 401 for anonymous or invalid tokens"""
+    if not token:
+        return None
+    try:
+        return get_current_user(token, db)
+    except HTTPException:
+        return None
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == user_data.email).first():
+def register(user_data: UserCreate, db: Session = Depends(get_db)):
+    if get_user_by_email(db, user_data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     user = User(name=user_data.name, email=user_data.email, hashed_password=get_password_hash(user_data.password), language_preference=user_data.language_preference)
     db.add(user)
     db.commit()
     db.refresh(user)
-    token = create_access_token(data={"sub": user.email})
-    return UserResponse(id=user.id, name=user.name, email=user.email, token=token, language_preference=user.language_preference)
+    return user_response(user, create_token_pair(user.email))
 
 @router.post("/login", response_model=UserResponse)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
+def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+    user = get_user_by_email(db, login_data.email)
     if not user or not verify_password(login_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
-    token = create_access_token(data={"sub": user.email})
-    return UserResponse(id=user.id, name=user.name, email=user.email, token=token, language_preference=user.language_preference)
+    return user_response(user, create_token_pair(user.email))
+
+@router.post("/refresh", response_model=UserResponse)
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new token pair; the old refresh token stops working"""
+    try:
+        email, tokens = rotate_refresh_token(request.refresh_token)
+    except TokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    user = cache.get("auth", email)
+    if user is None:
+        user = get_user_by_email(db, email)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return user_response(user, tokens)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(request: RefreshRequest):
+    """End the session: its refresh token and every access token issued with it stop working"""
+    revoke_session(request.refresh_token)
+
+@router.post("/import")
+def import_users(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    instructor: User = Depends(get_current_instructor),
+):
+    """
+    Create student accounts from a CSV with columns email, name, password and optionally
+    language_preference. Duplicates and invalid rows are reported, not fatal; rows asking
+    for another role are errors, since only import_users.py may assign roles.
+    Uploads are limited to USER_IMPORT_MAX_ROWS rows; import larger cohorts with import_users.py.
+    """
+    from services.user_import import TooManyRows, import_users as run_import, read_csv
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = run_import(
+            db, read_csv(stream), rounds=settings.bcrypt_rounds, workers=settings.user_import_workers,
+            max_rows=settings.user_import_max_rows, threads=True,
+        )
+    except TooManyRows as e:
+        raise HTTPException(status_code=413, detail=f"{e}; import larger files with import_users.py")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return report.as_dict()
 
 @router.get("/profile")
 async def get_profile(current_user: User = Depends(get_current_user)):
@@ -1,14 +1,45 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends
+from cache import cache
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from config import get_settings
-import google.generativeai as genai
-import google.api_core.exceptions
+from metrics import CHAT_FALLBACKS, CHAT_PROMPT_TOKENS, CHAT_TRUNCATED_MESSAGES, GEMINI_TOKENS, observe_gemini
+from models import User
+from ratelimit import RateLimit, SingleFlight
+from routers.auth import get_current_user
+from services.fallback import answer_offline
+from services.prompting import ConversationMemory, build_prompt
+from services.retrieval import retrieve
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
+logger = logging.getLogger(__name__)
 
-# Configure Gemini API
 settings = get_settings()
-genai.configure(api_key=settings.gemini_api_key)
+
+# The Gemini SDK takes most of a second to import, so it is loaded and
+# configured on the first chat request instead of at application startup
+_genai = None
+_genai_lock = threading.Lock()
+
+def gemini():
+    """Return the configured google.generativeai module, importing it on first use"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.gemini_api_key)
+                _genai = genai
+    return _genai
+
+chat_limit = RateLimit("chat", settings.chat_rate_capacity, settings.chat_rate_per_minute)
+chat_flight = SingleFlight("chat")
+memory = ConversationMemory(cache, settings.chat_history_turns, settings.chat_history_ttl_seconds)
 
 # System prompt for DSA-focused responses
 SYSTEM_PROMPT = """You are an expert DSA (Data Structures and Algorithms) tutor helping students learn programming concepts. 
@@ -39,7 +70,9 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     response: str
-    sources: list = []
+    sources: list = []  # human-readable titles of the notes used
+    source_ids: list = []  # e.g. "summary:1", "note:3", "subtopic:12"
+    degraded: bool = False  # answered offline from the notes because Gemini was unavailable
 
 # Topic context mapping
 TOPIC_CONTEXT = {
@@ -61,72 +94,121 @@ MODELS_TO_TRY = [
     'gemini-flash-latest',    # Alias for latest flash
 ]
 
-@router.post("", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    try:
-        # Build context-aware prompt
-        context = ""
-        if request.topic_id and request.topic_id in TOPIC_CONTEXT:
-            context = f"\n\nContext: {TOPIC_CONTEXT[request.topic_id]}"
-        
-        full_prompt = f"{SYSTEM_PROMPT}{context}\n\nStudent Question: {request.message}"
-        
-        response_text = None
-        last_error = None
-
-        # Try models in sequence
-        for model_name in MODELS_TO_TRY:
-            try:
+# A model that hit its quota (or doesn't exist) is skipped until this monotonic time,
+# so later requests fail over immediately instead of retrying it first
+_model_retry_at: Dict[str, float] = {}
+NOT_FOUND_COOLDOWN_SECONDS = 3600
+MIN_ATTEMPT_SECONDS = 0.5
+
+class UpstreamUnavailable(Exception):
+    """No model produced an answer before the deadline"""
+
+def available_models() -> List[str]:
+    now = time.monotonic()
+    return [m for m in MODELS_TO_TRY if _model_retry_at.get(m, 0) <= now]
+
+def generate_reply(full_prompt: str, deadline: float) -> str:
+    """Try available models in order until one answers or the deadline passes. Blocking: call it through the threadpool."""
+    genai = gemini()
+    from google.api_core import exceptions  # already loaded by the SDK import
+    last_error = "No model available"
+    for model_name in available_models():
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            last_error = "Deadline exceeded"
+            break
+        try:
+            with observe_gemini(model_name):
                 model = genai.GenerativeModel(model_name)
-                response = model.generate_content(full_prompt)
+                response = model.generate_content(full_prompt, request_options={"timeout": remaining})
                 response_text = response.text
-                break # Success!
-            except google.api_core.exceptions.ResourceExhausted:
-                # Quota hit, try next model
-                last_error = "Quota exceeded"
-                continue
-            except google.api_core.exceptions.NotFound:
-                # Model not found, try next
-                last_error = "Model not found"
-                continue
-            except Exception as e:
-                # Other error
-                print(f"Error with model {model_name}: {e}")
-                last_error = str(e)
-                continue
-        
-        if not response_text:
-            raise Exception(f"All models failed. Last error: {last_error}")
-
-        # Extract relevant sources based on topic
-        sources = []
-        if request.topic_id:
-            topic_names = {
-                1: "Arrays & Strings Notes",
-                2: "Linked Lists Guide",
-                3: "Stacks & Queues Notes",
-                4: "Recursion Notes",
-                5: "Trees & BST Notes",
-                6: "Graphs Guide",
-                7: "Sorting Notes",
-                8: "DP Fundamentals",
-            }
-            if request.topic_id in topic_names:
-                sources.append(topic_names[request.topic_id])
-        
-        return ChatResponse(
-            response=response_text,
-            sources=sources
+        except exceptions.ResourceExhausted:
+            # Quota hit: rest this model and try the next
+            _model_retry_at[model_name] = time.monotonic() + settings.chat_model_cooldown_seconds
+            last_error = "Quota exceeded"
+            continue
+        except exceptions.NotFound:
+            _model_retry_at[model_name] = time.monotonic() + NOT_FOUND_COOLDOWN_SECONDS
+            last_error = "Model not found"
+            continue
+        except Exception as e:
+            logger.warning("Error with model %s: %s", model_name, e)
+            last_error = str(e)
+            continue
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            GEMINI_TOKENS.inc(model_name, "prompt", amount=usage.prompt_token_count or 0)
+            GEMINI_TOKENS.inc(model_name, "completion", amount=usage.candidates_token_count or 0)
+        return response_text
+
+    raise UpstreamUnavailable(last_error)
+
+def cite(chunks: List[dict]):
+    """Display titles and ids of the notes used, each once, best match first"""
+    source_ids = list(dict.fromkeys(c["source_id"] for c in chunks))
+    titles = {c["source_id"]: c["title"] for c in chunks}
+    return [titles[s] for s in source_ids], source_ids
+
+def offline_reply(request: ChatRequest, reason: str) -> ChatResponse:
+    CHAT_FALLBACKS.inc(reason)
+    response_text, chunks = answer_offline(request.message, request.topic_id)
+    sources, source_ids = cite(chunks)
+    return ChatResponse(response=response_text, sources=sources, source_ids=source_ids, degraded=True)
+
+@router.post("", response_model=ChatResponse)
+async def chat(request: ChatRequest, current_user: Optional[User] = Depends(chat_limit)):
+    # Answer locally straight away when no model could be reached anyway
+    if not settings.gemini_api_key:
+        return offline_reply(request, "not_configured")
+    if not available_models():
+        return offline_reply(request, "cooldown")
+
+    user_id = current_user.id if current_user else None
+
+    # Build context-aware prompt
+    context = ""
+    if request.topic_id and request.topic_id in TOPIC_CONTEXT:
+        context = f"\n\nContext: {TOPIC_CONTEXT[request.topic_id]}"
+    
+    # Ground the answer in the few most relevant note chunks rather than whole notes,
+    # then fit chunks and recent conversation into the token budget
+    chunks = await run_in_threadpool(retrieve, request.message, None, request.topic_id)
+    prompt = build_prompt(
+        SYSTEM_PROMPT,
+        request.message,
+        max_tokens=settings.chat_max_input_tokens,
+        max_message_tokens=settings.chat_max_message_tokens,
+        topic_context=context,
+        chunks=chunks,
+        history=memory.get(user_id),
+    )
+    CHAT_PROMPT_TOKENS.observe(prompt.tokens)
+    if prompt.message_truncated:
+        CHAT_TRUNCATED_MESSAGES.inc()
+    
+    # One deadline covers every model attempt; past it the student gets the offline answer
+    deadline = time.monotonic() + settings.chat_deadline_seconds
+    # Identical questions already in flight for this user share one upstream call
+    flight_key = (user_id, request.topic_id, request.message)
+    try:
+        response_text = await asyncio.wait_for(
+            chat_flight.do(flight_key, lambda: run_in_threadpool(generate_reply, prompt.text, deadline)),
+            timeout=settings.chat_deadline_seconds,
         )
-        
+    except asyncio.TimeoutError:
+        logger.warning("Gemini did not answer within %.1fs", settings.chat_deadline_seconds)
+        return offline_reply(request, "timeout")
     except Exception as e:
-        print(f"Gemini API error: {e}")
-        # Fallback to basic response
-        error_msg = "It seems I'm currently overloaded with requests (API quota exceeded). Please try again later."
-        if "Quota" not in str(e) and "exhausted" not in str(e).lower():
-            error_msg = "I'm having trouble connecting to the AI brain right now. Please try again in a moment."
-            
-        return ChatResponse(
-            response=f"{error_msg} \n\nIn the meantime, check the learning resources for this topic!",
-            sources=["Learning Resources"]
-        )
+        logger.error("Gemini API error: %s", e)
+        return offline_reply(request, "error")
+
+    memory.append(user_id, request.message, response_text)
+    sources, source_ids = cite(prompt.chunks)
+    return ChatResponse(response=response_text, sources=sources, source_ids=source_ids)
+
+@router.delete("/history")
+async def clear_history(current_user: User = Depends(get_current_user)):
+    """Forget the current user's recent conversation"""
+    memory.clear(current_user.id)
+    return {"success": True}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter(prefix="/api/health", tags=["health"])
+
+@router.get("")
+async def live():
+    """Liveness: the worker is up and serving"""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready(request: Request):
+    """Readiness: 503 until the worker has finished warming its caches"""
+    resources = getattr(request.app.state, "resources", None)
+    if resources is None or not resources.ready.is_set():
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return {"status": "ready", "warmup_ms": resources.warmup_timings}
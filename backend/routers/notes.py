@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from database import get_db
 from models import UserNote, User
 from routers.auth import get_current_user
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
+from config import get_settings
+from services.catalog import catalog, catalog_response
+from services.rendering import render_markdown
 
 router = APIRouter(prefix="/api/notes", tags=["notes"])
+settings = get_settings()
 
 class NoteCreate(BaseModel):
     topic_id: int
@@ -16,6 +23,103 @@ class NoteCreate(BaseModel):
 class NoteUpdate(BaseModel):
     content: str
 
+MAX_PAGE_SIZE = 100
+MAX_EDITS = 200
+
+class TextEdit(BaseModel):
+    """Replace [start, end) of the base version with text. Offsets are UTF-16 code units, i.e. JavaScript string indices."""
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+class NotePatch(BaseModel):
+    base_version: Optional[int] = None  # alternative to an If-Match header
+    edits: List[TextEdit] = Field(max_length=MAX_EDITS)
+
+def note_to_dict(note: UserNote) -> dict:
+    return {
+        "id": note.id,
+        "topic_id": note.topic_id,
+        "content": note.content,
+        "content_html": note.content_html,
+        "version": note.version,
+        "created_at": note.created_at.isoformat(),
+        "updated_at": note.updated_at.isoformat()
+    }
+
+def note_etag(note: UserNote) -> str:
+    return f'"{note.id}.{note.version}"'
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Version named by an If-Match header; None when absent or '*'"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"').rsplit(".", 1)[1])
+    except (IndexError, ValueError):
+        raise HTTPException(status_code=412, detail="If-Match does not name a version of this note")
+
+def version_conflict(note: UserNote) -> HTTPException:
+    # The current note travels with the error so the client can merge without another round trip
+    return HTTPException(
+        status_code=412,
+        detail={"message": "Note was changed elsewhere", "current": note_to_dict(note)},
+        headers={"ETag": note_etag(note)},
+    )
+
+def apply_edits(content: str, edits: List[TextEdit]) -> str:
+    """Apply non-overlapping edits, all addressed against the same base content"""
+    units = content.encode("utf-16-le")
+    length = len(units) // 2
+    pieces = []
+    position = 0
+    for edit in sorted(edits, key=lambda e: (e.start, e.end)):
+        if edit.start < position or edit.end < edit.start or edit.end > length:
+            raise HTTPException(status_code=422, detail="Edits must be in range and must not overlap")
+        pieces.append(units[position * 2:edit.start * 2])
+        pieces.append(edit.text.encode("utf-16-le"))
+        position = edit.end
+    pieces.append(units[position * 2:])
+    try:
+        return b"".join(pieces).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=422, detail="Edit splits a surrogate pair")
+
+def get_user_note(db: Session, note_id: int, user_id: int) -> UserNote:
+    note = db.query(UserNote).filter(
+        UserNote.id == note_id,
+        UserNote.user_id == user_id
+    ).first()
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return note
+
+def save_note_content(db: Session, note: UserNote, content: str, expected_version: Optional[int]):
+    """Write new content, failing with 412 if the note moved past expected_version"""
+    if expected_version is not None and expected_version != note.version:
+        raise version_conflict(note)
+    note.content = content
+    note.content_html = render_markdown(content)
+    note.updated_at = datetime.utcnow()
+    try:
+        # version_id_col makes this UPDATE ... WHERE version = <read version>; a concurrent writer makes it match nothing
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise version_conflict(get_user_note(db, note.id, note.user_id))
+    db.refresh(note)
+
+def encode_cursor(note: UserNote) -> str:
+    raw = f"{note.updated_at.isoformat()}|{note.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        updated_at, note_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 # Topic summaries (auto-generated notes)
 TOPIC_SUMMARIES = {
     1: """## Arrays & Strings - Summary
@@ -146,16 +250,10 @@ def backtrack(choices):
 - LIS with binary search optimization"""
 }
 
-@router.get("/topic/{topic_id}")
-async def get_notes_for_topic(
-    topic_id: int, 
-    db: Session = Depends(get_db)
-):
-    """Get topic summary and user's custom notes"""
+def build_topic_notes(topic_id: int):
     summary = TOPIC_SUMMARIES.get(topic_id, "No summary available for this topic.")
     
-    # User notes require authentication - returning empty for now
-    # Frontend should use authenticated endpoints for user-specific notes
+    # Shared, cacheable payload: a user's own notes are listed by GET /api/notes/mine
     user_notes = []
     
     return {
@@ -164,9 +262,48 @@ async def get_notes_for_topic(
         "user_notes": user_notes
     }
 
+catalog.register("notes", build_topic_notes, keys=TOPIC_SUMMARIES.keys())
+
+@router.get("/topic/{topic_id}")
+async def get_notes_for_topic(request: Request, topic_id: int):
+    """Get topic summary and user's custom notes"""
+    return catalog_response(request, catalog.get("notes", topic_id), settings.catalog_max_age)
+
+@router.get("/mine")
+def list_my_notes(
+    topic_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List the current user's notes, most recently edited first.
+    Pass the returned next_cursor back to fetch the following page.
+    """
+    query = db.query(UserNote).filter(UserNote.user_id == current_user.id)
+    if topic_id is not None:
+        query = query.filter(UserNote.topic_id == topic_id)
+    if cursor:
+        # Keyset pagination: resume strictly after the last row of the previous page
+        updated_at, note_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            UserNote.updated_at < updated_at,
+            and_(UserNote.updated_at == updated_at, UserNote.id < note_id),
+        ))
+    notes = query.order_by(UserNote.updated_at.desc(), UserNote.id.desc()).limit(limit + 1).all()
+
+    has_more = len(notes) > limit
+    notes = notes[:limit]
+    return {
+        "notes": [note_to_dict(n) for n in notes],
+        "next_cursor": encode_cursor(notes[-1]) if has_more else None
+    }
+
 @router.post("")
-async def create_note(
+def create_note(
     note_data: NoteCreate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -174,64 +311,86 @@ async def create_note(
     note = UserNote(
         user_id=current_user.id,
         topic_id=note_data.topic_id,
-        content=note_data.content
+        content=note_data.content,
+        content_html=render_markdown(note_data.content)
     )
     db.add(note)
     db.commit()
     db.refresh(note)
     
-    return {
-        "id": note.id,
-        "topic_id": note.topic_id,
-        "content": note.content,
-        "created_at": note.created_at.isoformat(),
-        "updated_at": note.updated_at.isoformat()
-    }
+    response.headers["ETag"] = note_etag(note)
+    return note_to_dict(note)
+
+@router.get("/{note_id}")
+def get_note(
+    note_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get one note; its ETag is the value to send as If-Match when editing"""
+    note = get_user_note(db, note_id, current_user.id)
+    response.headers["ETag"] = note_etag(note)
+    return note_to_dict(note)
 
 @router.put("/{note_id}")
-async def update_note(
+def update_note(
     note_id: int,
     note_data: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Update an existing user note"""
-    note = db.query(UserNote).filter(
-        UserNote.id == note_id,
-        UserNote.user_id == current_user.id
-    ).first()
-    
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    
-    note.content = note_data.content
-    note.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(note)
-    
-    return {
-        "id": note.id,
-        "topic_id": note.topic_id,
-        "content": note.content,
-        "updated_at": note.updated_at.isoformat()
-    }
+    """Replace a note's content. With If-Match, fails with 412 if the note changed since that version."""
+    note = get_user_note(db, note_id, current_user.id)
+    save_note_content(db, note, note_data.content, parse_if_match(if_match))
+    response.headers["ETag"] = note_etag(note)
+    return note_to_dict(note)
+
+@router.patch("/{note_id}")
+def patch_note(
+    note_id: int,
+    patch: NotePatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply text edits made against a known version (If-Match or base_version).
+    Autosave sends only the changed ranges; a stale base version gets 412 with the current note.
+    """
+    expected_version = parse_if_match(if_match)
+    if expected_version is None:
+        expected_version = patch.base_version
+    if expected_version is None:
+        raise HTTPException(status_code=428, detail="PATCH requires If-Match or base_version")
+
+    note = get_user_note(db, note_id, current_user.id)
+    if expected_version != note.version:
+        raise version_conflict(note)
+    save_note_content(db, note, apply_edits(note.content or "", patch.edits), expected_version)
+    response.headers["ETag"] = note_etag(note)
+    return note_to_dict(note)
 
 @router.delete("/{note_id}")
-async def delete_note(
+def delete_note(
     note_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Delete a user note"""
-    note = db.query(UserNote).filter(
-        UserNote.id == note_id,
-        UserNote.user_id == current_user.id
-    ).first()
-    
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    
+    """Delete a user note. With If-Match, fails with 412 if the note changed since that version."""
+    note = get_user_note(db, note_id, current_user.id)
+    expected_version = parse_if_match(if_match)
+    if expected_version is not None and expected_version != note.version:
+        raise version_conflict(note)
     db.delete(note)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise version_conflict(get_user_note(db, note_id, current_user.id))
     
     return {"success": True, "message": "Note deleted"}
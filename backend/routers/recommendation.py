@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import models
-from database import get_db
+from database import SessionLocal, get_db
 from routers.auth import get_current_user
 from services.recommendation import RecommendationService
 from pydantic import BaseModel
+from config import get_settings
+from ratelimit import RateLimit, SingleFlight
 
 router = APIRouter(prefix="/api/recommendations", tags=["recommendations"])
+settings = get_settings()
+generate_limit = RateLimit("recommendations_generate", settings.generate_rate_capacity, settings.generate_rate_per_minute)
+generate_flight = SingleFlight("recommendations_generate")
 
 class RecommendationOut(BaseModel):
     id: int
@@ -21,17 +27,26 @@ class RecommendationOut(BaseModel):
     class Config:
         from_attributes = True
 
-@router.post("/generate")
-async def generate_recommendations(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
-):
+def regenerate(user_id: int):
+    """
+    One shared regeneration. It opens its own session: it can outlive the
+    request that started it, whose session closes when that request ends.
+    """
+    db = SessionLocal()
+    try:
+        RecommendationService(db, user_id).generate_daily_recommendations()
+    finally:
+        db.close()
+
+@router.post("/generate", dependencies=[Depends(generate_limit)])
+async def generate_recommendations(current_user: models.User = Depends(get_current_user)):
     """
     Triggers the recommendation engine. 
     In production, this would be a background task (Celery).
+    Concurrent requests from the same user share one regeneration.
     """
-    service = RecommendationService(db, current_user.id)
-    await service.generate_daily_recommendations()
+    # The session work runs in the threadpool so it never blocks the event loop
+    await generate_flight.do(current_user.id, lambda: run_in_threadpool(regenerate, current_user.id))
     return {"status": "success", "message": "Recommendations generated"}
 
 @router.get("", response_model=List[RecommendationOut])
@@ -45,3 +60,18 @@ def get_recommendations(
     service = RecommendationService(db, current_user.id)
     recs = service.get_user_recommendations()
     return recs
+
+@router.post("/{recommendation_id}/complete")
+def complete_recommendation(
+    recommendation_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Mark a recommendation as done. It disappears from the list right away
+    and is purged by the background sweeper.
+    """
+    service = RecommendationService(db, current_user.id)
+    if not service.complete_recommendation(recommendation_id):
+        raise HTTPException(status_code=404, detail="Recommendation not found")
+    return {"status": "success", "message": "Recommendation completed"}
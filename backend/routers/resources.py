@@ -1,12 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from models import UserNote
-from routers.auth import get_current_user
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Request
+from config import get_settings
+from services.catalog import catalog, catalog_response
 
 router = APIRouter(prefix="/api/resources", tags=["resources"])
+settings = get_settings()
 
 # Sample resources with multilingual support (English and Hindi videos)
 SAMPLE_RESOURCES = {
@@ -87,47 +84,62 @@ SAMPLE_RESOURCES = {
 
 from routers.subtopics import DEFAULT_SUBTOPICS
 
-@router.get("/topic/{topic_id}")
-async def get_resources_by_topic(topic_id: int, language: str = "en", db: Session = Depends(get_db)):
-    if topic_id in SAMPLE_RESOURCES:
-        resource = SAMPLE_RESOURCES[topic_id].copy()
-        
-        # Get videos from subtopics
-        subtopics = DEFAULT_SUBTOPICS.get(topic_id, [])
-        videos = []
-        
-        # Add videos from subtopics
-        for st in subtopics:
-            if "video_url" in st:
-                # Convert regular YouTube watch URLs to embed URLs if needed
-                url = st["video_url"]
-                if "watch?v=" in url:
-                    url = url.replace("watch?v=", "embed/")
-                
-                videos.append({
-                    "id": st["id"],
-                    "title": st["name"],
-                    "url": url,
-                    "duration": "15:00", # Placeholder duration
-                    "completed": False
-                })
-        
-        # If no subtopic videos, fall back to sample videos (compatibility)
-        if not videos:
-            for v in resource.get("videos", []):
-                video = v.copy()
-                if language == "hi":
-                    video["title"] = v.get("title_hi", v["title"])
-                    video["url"] = v.get("url_hi", v["url"])
-                videos.append({
-                    "id": video["id"],
-                    "title": video["title"],
-                    "url": video["url"],
-                    "duration": video.get("duration", ""),
-                    "completed": False
-                })
-        
-        resource["videos"] = videos
-        return resource
+RESOURCE_LANGUAGES = ("en", "hi")
+
+def build_topic_resources(key):
+    """Assemble the resources payload for a (topic_id, language) pair"""
+    topic_id, language = key
+    if topic_id not in SAMPLE_RESOURCES:
+        return {"topic": {"id": topic_id, "name": "Topic"}, "videos": [], "notes": [], "summary": "", "problems": []}
+
+    resource = SAMPLE_RESOURCES[topic_id].copy()
+    
+    # Get videos from subtopics
+    subtopics = DEFAULT_SUBTOPICS.get(topic_id, [])
+    videos = []
+    
+    # Add videos from subtopics
+    for st in subtopics:
+        if "video_url" in st:
+            # Convert regular YouTube watch URLs to embed URLs if needed
+            url = st["video_url"]
+            if "watch?v=" in url:
+                url = url.replace("watch?v=", "embed/")
+            
+            videos.append({
+                "id": st["id"],
+                "title": st["name"],
+                "url": url,
+                "duration": "15:00", # Placeholder duration
+                "completed": False
+            })
     
-    return {"topic": {"id": topic_id, "name": "Topic"}, "videos": [], "notes": [], "summary": "", "problems": []}
+    # If no subtopic videos, fall back to sample videos (compatibility)
+    if not videos:
+        for v in resource.get("videos", []):
+            video = v.copy()
+            if language == "hi":
+                video["title"] = v.get("title_hi", v["title"])
+                video["url"] = v.get("url_hi", v["url"])
+            videos.append({
+                "id": video["id"],
+                "title": video["title"],
+                "url": video["url"],
+                "duration": video.get("duration", ""),
+                "completed": False
+            })
+    
+    resource["videos"] = videos
+    return resource
+
+catalog.register(
+    "resources",
+    build_topic_resources,
+    keys=[(topic_id, language) for topic_id in SAMPLE_RESOURCES for language in RESOURCE_LANGUAGES],
+)
+
+@router.get("/topic/{topic_id}")
+async def get_resources_by_topic(request: Request, topic_id: int, language: str = "en"):
+    # Any language other than Hindi renders the English payload
+    language = "hi" if language == "hi" else "en"
+    return catalog_response(request, catalog.get("resources", (topic_id, language)), settings.catalog_max_age)
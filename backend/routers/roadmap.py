@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from database import get_db
-from models import UserProgress
-from routers.auth import get_current_user
+from config import get_settings
+from services.catalog import catalog, catalog_response
 
 router = APIRouter(prefix="/api/roadmap", tags=["roadmap"])
+settings = get_settings()
 
 DEFAULT_ROADMAP = {
     "subject": "Data Structures & Algorithms",
@@ -22,9 +23,11 @@ DEFAULT_ROADMAP = {
     "overallProgress": 35, "xp": 1250, "streak": 5
 }
 
+catalog.register("roadmap", lambda: DEFAULT_ROADMAP)
+
 @router.get("")
-async def get_roadmap(db: Session = Depends(get_db)):
-    return DEFAULT_ROADMAP
+async def get_roadmap(request: Request):
+    return catalog_response(request, catalog.get("roadmap"), settings.catalog_max_age)
 
 @router.post("/update")
 async def update_roadmap(db: Session = Depends(get_db)):
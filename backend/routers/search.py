@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel
+from database import get_db
+from models import User
+from routers.auth import get_optional_user
+from services import search as search_service
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+class SearchHit(BaseModel):
+    kind: str  # 'note', 'summary', 'video', 'resource_note', 'question'
+    id: Union[int, str]
+    topic_id: Optional[int]
+    title: str
+    snippet: str  # HTML-escaped text with matches wrapped in <mark>
+    score: float  # relative to the best hit from the same source (notes or catalog), which scores 1.0
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: List[SearchHit]
+    took_ms: float
+
+@router.get("", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: Literal["all", "notes", "catalog"] = "all",
+    topic_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=search_service.MAX_LIMIT),
+    current_user: Optional[User] = Depends(get_optional_user),
+    db: Session = Depends(get_db),
+):
+    """Search your notes and the learning catalog. Anonymous requests only search the catalog."""
+    user_id = current_user.id if current_user else None
+    return search_service.search(db, q, user_id=user_id, scope=scope, topic_id=topic_id, limit=limit)
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from database import get_db
-from models import SubtopicProgress, User, Topic
-from routers.auth import get_current_user
+from models import SubtopicProgress, User
+from routers.auth import get_current_user, get_optional_user
+import queries
 from services.recommendation import RecommendationService
 from pydantic import BaseModel
-from typing import Optional
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/api/subtopics", tags=["subtopics"])
+logger = logging.getLogger(__name__)
 
 class ToggleCompleteRequest(BaseModel):
     completed: bool
@@ -84,48 +87,24 @@ DEFAULT_SUBTOPICS = {
     ],
 }
 
-from fastapi import Header
-
-def get_optional_user(authorization: str = Header(None), db: Session = Depends(get_db)):
-    """Get current user from token if provided, otherwise return None"""
-    if not authorization or not authorization.startswith("Bearer "):
-        return None
-    
-    token = authorization.replace("Bearer ", "")
-    try:
-        from jose import jwt
-        from config import get_settings
-        settings = get_settings()
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email = payload.get("sub")
-        if email:
-            return db.query(User).filter(User.email == email).first()
-    except:
-        pass
-    return None
-
 @router.get("/{topic_id}")
-async def get_subtopics(
+def get_subtopics(
     topic_id: int,
     db: Session = Depends(get_db),
-    authorization: str = Header(None)
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     """Get subtopics for a topic with completion status"""
     subtopics = DEFAULT_SUBTOPICS.get(topic_id, [])
     
     # Try to get user-specific completion status
     completed_ids = set()
-    current_user = get_optional_user(authorization, db)
     
     if current_user:
         # Fetch user's completed subtopics for this topic
         subtopic_ids = [st["id"] for st in subtopics]
-        completed_records = db.query(SubtopicProgress).filter(
-            SubtopicProgress.user_id == current_user.id,
-            SubtopicProgress.subtopic_id.in_(subtopic_ids),
-            SubtopicProgress.completed == True
-        ).all()
-        completed_ids = {r.subtopic_id for r in completed_records}
+        completed_ids = set(db.execute(
+            queries.COMPLETED_SUBTOPIC_IDS_IN, {"user_id": current_user.id, "subtopic_ids": subtopic_ids}
+        ).scalars())
     
     result = []
     for st in subtopics:
@@ -145,7 +124,7 @@ async def get_subtopics(
     }
 
 @router.post("/{subtopic_id}/complete")
-async def toggle_subtopic_completion(
+def toggle_subtopic_completion(
     subtopic_id: int,
     request: ToggleCompleteRequest,
     db: Session = Depends(get_db),
@@ -153,10 +132,9 @@ async def toggle_subtopic_completion(
 ):
     """Toggle completion status of a subtopic"""
     # Find existing progress record
-    progress = db.query(SubtopicProgress).filter(
-        SubtopicProgress.user_id == current_user.id,
-        SubtopicProgress.subtopic_id == subtopic_id
-    ).first()
+    progress = db.execute(
+        queries.SUBTOPIC_PROGRESS, {"user_id": current_user.id, "subtopic_id": subtopic_id}
+    ).scalars().first()
     
     if progress:
         progress.completed = request.completed
@@ -190,12 +168,9 @@ async def toggle_subtopic_completion(
         
         # Get all completed subtopics for this topic
         subtopic_ids = [st["id"] for st in topic_subtopics]
-        completed_records = db.query(SubtopicProgress).filter(
-            SubtopicProgress.user_id == current_user.id,
-            SubtopicProgress.subtopic_id.in_(subtopic_ids),
-            SubtopicProgress.completed == True
-        ).all()
-        completed_count = len(completed_records)
+        completed_count = len(db.execute(
+            queries.COMPLETED_SUBTOPIC_IDS_IN, {"user_id": current_user.id, "subtopic_ids": subtopic_ids}
+        ).scalars().all())
         topic_completed = completed_count == total_count and total_count > 0
     
     # Generate fresh recommendations based on current progress
@@ -214,20 +189,14 @@ async def toggle_subtopic_completion(
             topic_progress=topic_progress
         )
         
-        # Fetch the updated recommendations to return
+        # Served from the cache the generator just populated
         recs = rec_service.get_user_recommendations()
         recommendations = [
-            {
-                "id": r.id,
-                "type": r.type,
-                "title": r.title,
-                "description": r.description,
-                "action_url": r.action_url,
-                "priority": r.priority
-            } for r in recs
+            {key: r[key] for key in ("id", "type", "title", "description", "action_url", "priority")}
+            for r in recs
         ]
     except Exception as e:
-        print(f"Recommendation generation on subtopic change failed: {e}")  # Non-blocking
+        logger.warning("Recommendation generation on subtopic change failed: %s", e)  # Non-blocking
     
     return {
         "subtopic_id": subtopic_id,
@@ -243,24 +212,21 @@ async def toggle_subtopic_completion(
     }
 
 @router.get("/user/progress")
-async def get_user_subtopic_progress(
+def get_user_subtopic_progress(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all subtopic progress for current user"""
-    progress = db.query(SubtopicProgress).filter(
-        SubtopicProgress.user_id == current_user.id,
-        SubtopicProgress.completed == True
-    ).all()
+    completed_ids = db.execute(queries.COMPLETED_SUBTOPIC_IDS, {"user_id": current_user.id}).scalars().all()
     
     completed_by_topic = {}
-    for p in progress:
+    for subtopic_id in completed_ids:
         # Find which topic this subtopic belongs to
         for topic_id, subtopics in DEFAULT_SUBTOPICS.items():
-            if any(st["id"] == p.subtopic_id for st in subtopics):
+            if any(st["id"] == subtopic_id for st in subtopics):
                 if topic_id not in completed_by_topic:
                     completed_by_topic[topic_id] = []
-                completed_by_topic[topic_id].append(p.subtopic_id)
+                completed_by_topic[topic_id].append(subtopic_id)
                 break
     
     # Calculate progress per topic
@@ -275,13 +241,13 @@ async def get_user_subtopic_progress(
         }
     
     return {
-        "completed_subtopic_ids": [p.subtopic_id for p in progress],
+        "completed_subtopic_ids": completed_ids,
         "completed_by_topic": completed_by_topic,
         "topic_progress": topic_progress
     }
 
 @router.post("/complete-all")
-async def complete_all_subtopics(
+def complete_all_subtopics(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
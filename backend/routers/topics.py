@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from typing import List
-from pydantic import BaseModel
-from database import get_db
+from pydantic import BaseModel, TypeAdapter
+from config import get_settings
+from database import get_db, SessionLocal
 from models import Topic
+from services.catalog import catalog, catalog_response
 
 router = APIRouter(prefix="/api/topics", tags=["topics"])
+settings = get_settings()
 
 class SubtopicItem(BaseModel):
     id: int
@@ -21,6 +24,8 @@ class TopicResponse(BaseModel):
     subtopics: List[SubtopicItem]
     summary_notes: str | None = None
 
+TopicList = TypeAdapter(List[TopicResponse])
+
 # Comprehensive DSA Topics with full subtopics
 DEFAULT_TOPICS = [
     {
@@ -224,33 +229,47 @@ LEETCODE_PROBLEMS = {
     ],
 }
 
-@router.get("", response_model=List[TopicResponse])
-async def get_topics(db: Session = Depends(get_db)):
-    topics = db.query(Topic).order_by(Topic.order).all()
-    if not topics:
-        return DEFAULT_TOPICS
-    # Convert database topics to include subtopics list
-    result = []
-    for topic in topics:
-        topic_dict = {
-            "id": topic.id,
-            "name": topic.name,
-            "description": topic.description,
-            "order": topic.order,
-            "prerequisites": topic.prerequisites or [],
-            "subtopics": [{"id": st.id, "name": st.name, "description": st.description} for st in topic.subtopics],
-            "summary_notes": topic.summary_notes
-        }
-        result.append(topic_dict)
-    return result if result else DEFAULT_TOPICS
+def build_topics():
+    """
+    Topics are seeded catalog data that the API never writes, so the list is read once and rendered.
+    Call catalog.invalidate("topics") after reseeding the table.
+    Validated against TopicResponse here, once, since the endpoint serves the rendered bytes.
+    """
+    db = SessionLocal()
+    try:
+        topics = db.query(Topic).order_by(Topic.order).all()
+        # Convert database topics to include subtopics list
+        result = [
+            {
+                "id": topic.id,
+                "name": topic.name,
+                "description": topic.description,
+                "order": topic.order,
+                "prerequisites": topic.prerequisites or [],
+                "subtopics": [{"id": st.id, "name": st.name, "description": st.description} for st in topic.subtopics],
+                "summary_notes": topic.summary_notes
+            }
+            for topic in topics
+        ]
+    finally:
+        db.close()
+    return TopicList.dump_python(TopicList.validate_python(result or DEFAULT_TOPICS))
+
+catalog.register("topics", build_topics)
+catalog.register("topics_selection", lambda: {"topics": [{"id": t["id"], "name": t["name"], "description": t["description"]} for t in DEFAULT_TOPICS]})
+
+# Served pre-rendered (build_topics validates it), so the model only documents the body
+@router.get("", responses={200: {"model": List[TopicResponse]}})
+async def get_topics(request: Request):
+    return catalog_response(request, catalog.get("topics"), settings.catalog_max_age)
 
 @router.get("/selection")
-async def get_topics_for_selection():
+async def get_topics_for_selection(request: Request):
     """Get topics for initial selection screen"""
-    return {"topics": [{"id": t["id"], "name": t["name"], "description": t["description"]} for t in DEFAULT_TOPICS]}
+    return catalog_response(request, catalog.get("topics_selection"), settings.catalog_max_age)
 
 @router.get("/{topic_id}", response_model=TopicResponse)
-async def get_topic(topic_id: int, db: Session = Depends(get_db)):
+def get_topic(topic_id: int, db: Session = Depends(get_db)):
     topic = db.query(Topic).filter(Topic.id == topic_id).first()
     if not topic:
         for t in DEFAULT_TOPICS:
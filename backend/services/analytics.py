@@ -0,0 +1,206 @@
+"""
+Cohort analytics over quiz attempts.
+
+Each submitted attempt is folded into two small daily summary tables in the
+same transaction that saves it: per topic and mastery bucket, and per
+question. Dashboards then GROUP BY over at most (days x topics x buckets)
+rows instead of decoding every attempt's JSON report, so answers stay fast
+however many attempts pile up. rebuild_summaries() recomputes the tables
+from quiz_attempts (used by migrate_analytics.py for existing data).
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+from question_bank import QUESTION_BANK
+
+MASTERY_BUCKETS = 10  # distribution resolution: 0-10%, 10-20%, ... 90-100%
+MAX_DAYS = 365
+
+_TOPIC_IDS = {q["topic"]: q["topic_id"] for q in QUESTION_BANK}
+_QUESTIONS = {q["id"]: q for q in QUESTION_BANK}
+
+def mastery_bucket(mastery: float) -> int:
+    return min(max(int(mastery * MASTERY_BUCKETS), 0), MASTERY_BUCKETS - 1)
+
+def _upsert(db: Session, model, rows: List[dict], keys: tuple):
+    """Add each row's counters onto the existing summary row for its keys, creating it if needed"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model)
+        counters = [c for c in rows[0] if c not in keys]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={c: getattr(model, c) + getattr(stmt.excluded, c) for c in counters},
+        )
+        db.execute(stmt, rows)
+        return
+    # Other dialects: read-modify-write through the session
+    for row in rows:
+        existing = db.get(model, tuple(row[k] for k in keys))
+        if existing is None:
+            db.add(model(**row))
+        else:
+            for column, value in row.items():
+                if column not in keys:
+                    setattr(existing, column, getattr(existing, column) + value)
+    # get() only finds flushed rows, so a later attempt in this transaction must see these
+    db.flush()
+
+def summary_rows(day: date, topic_mastery: list, detailed_report: list):
+    """Summary increments for one attempt: (topic rows, question rows)"""
+    topic_rows = []
+    for entry in topic_mastery or []:
+        topic_id = _TOPIC_IDS.get(entry.get("topic"))
+        if topic_id is None or not entry.get("total"):
+            continue  # a topic skipped entirely has no mastery to report
+        topic_rows.append({
+            "day": day, "topic_id": topic_id, "bucket": mastery_bucket(entry["mastery"]),
+            "attempts": 1, "answered": entry["total"], "correct": entry["correct"], "mastery_sum": entry["mastery"],
+        })
+    question_rows = [
+        {
+            "day": day, "question_id": q["id"],
+            "attempts": 0 if q.get("is_skipped") else 1,
+            "correct": 1 if q.get("is_correct") else 0,
+            "skipped": 1 if q.get("is_skipped") else 0,
+        }
+        for q in detailed_report or []
+        if q.get("is_skipped") or q.get("is_correct") is not None
+    ]
+    return topic_rows, question_rows
+
+def record_quiz_attempt(db: Session, attempt: models.QuizAttempt):
+    """Fold one attempt into the daily summaries; call before committing the attempt"""
+    day = (attempt.created_at or datetime.utcnow()).date()
+    topic_rows, question_rows = summary_rows(day, attempt.topic_mastery, attempt.detailed_report)
+    _upsert(db, models.TopicDailyStats, topic_rows, ("day", "topic_id", "bucket"))
+    _upsert(db, models.QuestionDailyStats, question_rows, ("day", "question_id"))
+
+def rebuild_summaries(db: Session, batch_size: int = 1000) -> int:
+    """Recompute both summary tables from quiz_attempts. Returns the number of attempts folded in."""
+    db.query(models.TopicDailyStats).delete()
+    db.query(models.QuestionDailyStats).delete()
+    processed = 0
+    last_id = 0
+    while True:
+        attempts = db.query(
+            models.QuizAttempt.id, models.QuizAttempt.created_at,
+            models.QuizAttempt.topic_mastery, models.QuizAttempt.detailed_report
+        ).filter(models.QuizAttempt.id > last_id).order_by(models.QuizAttempt.id).limit(batch_size).all()
+        if not attempts:
+            break
+        # Merge the batch in memory first so each summary row is written once per batch
+        topics: Dict[tuple, dict] = {}
+        questions: Dict[tuple, dict] = {}
+        for attempt in attempts:
+            day = (attempt.created_at or datetime.utcnow()).date()
+            topic_rows, question_rows = summary_rows(day, attempt.topic_mastery, attempt.detailed_report)
+            for rows, merged, keys in ((topic_rows, topics, ("day", "topic_id", "bucket")), (question_rows, questions, ("day", "question_id"))):
+                for row in rows:
+                    key = tuple(row[k] for k in keys)
+                    if key in merged:
+                        for column, value in row.items():
+                            if column not in keys:
+                                merged[key][column] += value
+                    else:
+                        merged[key] = row
+        _upsert(db, models.TopicDailyStats, list(topics.values()), ("day", "topic_id", "bucket"))
+        _upsert(db, models.QuestionDailyStats, list(questions.values()), ("day", "question_id"))
+        db.commit()
+        processed += len(attempts)
+        last_id = attempts[-1].id
+    return processed
+
+def _since(days: int) -> date:
+    return datetime.utcnow().date() - timedelta(days=min(max(days, 1), MAX_DAYS) - 1)
+
+def topic_overview(db: Session, days: int = 30) -> List[dict]:
+    """Per topic: attempts, accuracy, mean mastery and the mastery distribution"""
+    from routers.topics import DEFAULT_TOPICS
+
+    s = models.TopicDailyStats
+    rows = db.query(
+        s.topic_id, s.bucket,
+        func.sum(s.attempts), func.sum(s.answered), func.sum(s.correct), func.sum(s.mastery_sum)
+    ).filter(s.day >= _since(days)).group_by(s.topic_id, s.bucket).all()
+
+    names = {t["id"]: t["name"] for t in DEFAULT_TOPICS}
+    topics: Dict[int, dict] = {}
+    for topic_id, bucket, attempts, answered, correct, mastery_sum in rows:
+        topic = topics.setdefault(topic_id, {
+            "topic_id": topic_id, "topic": names.get(topic_id, f"Topic {topic_id}"),
+            "attempts": 0, "answered": 0, "correct": 0, "mastery_sum": 0.0,
+            "distribution": [0] * MASTERY_BUCKETS,
+        })
+        topic["attempts"] += attempts
+        topic["answered"] += answered
+        topic["correct"] += correct
+        topic["mastery_sum"] += mastery_sum
+        topic["distribution"][bucket] += attempts
+
+    result = []
+    for topic in sorted(topics.values(), key=lambda t: t["topic_id"]):
+        mastery_sum = topic.pop("mastery_sum")
+        topic["accuracy"] = topic["correct"] / topic["answered"] if topic["answered"] else 0.0
+        topic["mean_mastery"] = mastery_sum / topic["attempts"] if topic["attempts"] else 0.0
+        # Share of attempts below 60% mastery, the threshold recommendations treat as weak
+        weak_buckets = int(0.6 * MASTERY_BUCKETS)
+        topic["weak_share"] = sum(topic["distribution"][:weak_buckets]) / topic["attempts"] if topic["attempts"] else 0.0
+        result.append(topic)
+    return result
+
+def most_missed_questions(db: Session, days: int = 30, limit: int = 10, topic_id: Optional[int] = None) -> List[dict]:
+    s = models.QuestionDailyStats
+    missed = func.sum(s.attempts) - func.sum(s.correct)
+    query = db.query(
+        s.question_id, func.sum(s.attempts), func.sum(s.correct), func.sum(s.skipped), missed
+    ).filter(s.day >= _since(days))
+    if topic_id is not None:
+        ids = [q["id"] for q in QUESTION_BANK if q["topic_id"] == topic_id]
+        query = query.filter(s.question_id.in_(ids))
+    rows = query.group_by(s.question_id).order_by(missed.desc(), s.question_id).limit(limit).all()
+
+    result = []
+    for question_id, attempts, correct, skipped, missed_count in rows:
+        q = _QUESTIONS.get(question_id, {})
+        result.append({
+            "question_id": question_id,
+            "topic_id": q.get("topic_id"),
+            "text": q.get("text", ""),
+            "difficulty": q.get("difficulty"),
+            "attempts": attempts,
+            "missed": missed_count,
+            "skipped": skipped,
+            "miss_rate": missed_count / attempts if attempts else 0.0,
+        })
+    return result
+
+def mastery_trend(db: Session, days: int = 30, topic_id: Optional[int] = None) -> List[dict]:
+    """
+    Daily accuracy and mean mastery, oldest day first. Without a topic filter
+    `attempts` counts topic results, so one quiz covering four topics counts four.
+    """
+    s = models.TopicDailyStats
+    query = db.query(
+        s.day, func.sum(s.attempts), func.sum(s.answered), func.sum(s.correct), func.sum(s.mastery_sum)
+    ).filter(s.day >= _since(days))
+    if topic_id is not None:
+        query = query.filter(s.topic_id == topic_id)
+    rows = query.group_by(s.day).order_by(s.day).all()
+    return [
+        {
+            "day": day.isoformat(),
+            "attempts": attempts,
+            "accuracy": correct / answered if answered else 0.0,
+            "mean_mastery": mastery_sum / attempts if attempts else 0.0,
+        }
+        for day, attempts, answered, correct, mastery_sum in rows
+    ]
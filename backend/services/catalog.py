@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+from typing import Callable, Dict, Hashable, Iterable, Optional
+from fastapi import Request, Response
+from serialization import dumps
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+CATALOG_MEDIA_TYPE = "application/json"
+MIN_COMPRESS_SIZE = 512  # Tiny payloads are not worth the compression overhead
+
+class CatalogPayload:
+    """A response body pre-rendered to bytes, with compressed variants and a strong ETag"""
+    __slots__ = ("body", "gzip", "br", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.gzip = None
+        self.br = None
+        if len(body) >= MIN_COMPRESS_SIZE:
+            # Brotli at quality 11 is slow, so payloads are prerendered by warm-up
+            # (services/warmup.py) off the request path rather than on first request
+            self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(body, quality=11)
+
+    @classmethod
+    def from_content(cls, content) -> "CatalogPayload":
+        return cls(dumps(content))
+
+class CatalogCache:
+    """
+    Pre-rendered payloads for static catalog endpoints.
+    Each named section registers a builder and the keys to render ahead of time;
+    unknown keys are rendered on demand but not kept, so arbitrary path params can't grow the cache.
+    """
+    def __init__(self):
+        self._builders: Dict[str, Callable] = {}
+        self._keys: Dict[str, set] = {}
+        self._payloads: Dict[tuple, CatalogPayload] = {}
+
+    def register(self, section: str, builder: Callable, keys: Iterable[Hashable] = (None,)):
+        self._builders[section] = builder
+        self._keys[section] = set(keys)
+
+    def get(self, section: str, key: Hashable = None) -> CatalogPayload:
+        payload = self._payloads.get((section, key))
+        if payload is not None:
+            return payload
+        build = self._builders[section]
+        payload = CatalogPayload.from_content(build() if key is None else build(key))
+        if key in self._keys[section]:
+            self._payloads[(section, key)] = payload
+        return payload
+
+    def prerender(self):
+        """Render every registered (section, key) pair. Called once at startup."""
+        for section, keys in self._keys.items():
+            for key in keys:
+                self.get(section, key)
+
+    def invalidate(self, section: Optional[str] = None):
+        if section is None:
+            self._payloads.clear()
+            return
+        for cache_key in [k for k in self._payloads if k[0] == section]:
+            del self._payloads[cache_key]
+
+catalog = CatalogCache()
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Every encoding of a payload carries the same hash, so any variant revalidates
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"').split("-", 1)[0] == etag:
+            return True
+    return False
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != coding:
+            continue
+        params = params.replace(" ", "")
+        return params not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def catalog_response(request: Request, payload: CatalogPayload, max_age: int = 0) -> Response:
+    """Serve a pre-rendered payload, honouring If-None-Match and Accept-Encoding"""
+    accept_encoding = request.headers.get("accept-encoding", "")
+    body, encoding = payload.body, None
+    if payload.br is not None and _accepts(accept_encoding, "br"):
+        body, encoding = payload.br, "br"
+    elif payload.gzip is not None and _accepts(accept_encoding, "gzip"):
+        body, encoding = payload.gzip, "gzip"
+
+    # Strong ETags must differ per content-coding
+    headers = {
+        "ETag": f'"{payload.etag}-{encoding}"' if encoding else f'"{payload.etag}"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, payload.etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=CATALOG_MEDIA_TYPE, headers=headers)
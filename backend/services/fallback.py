@@ -0,0 +1,70 @@
+"""
+Offline chat answers for when Gemini is unavailable.
+
+Deterministic and network-free: the question is keyword-matched against a
+small curated FAQ and the local notes index (services/retrieval.py), and the
+answer is assembled from what matched. Typical latency is well under a
+millisecond once the notes index is loaded.
+"""
+import re
+from typing import List, Optional, Tuple
+from services.retrieval import retrieve
+
+# (keywords, topic_id, answer). Multi-word keywords count for more than single words.
+FAQ = [
+    (("array", "arrays", "subarray"), 1,
+     "Arrays are contiguous memory blocks with O(1) index access. Key patterns include Two Pointers and Sliding Window. For sorted arrays, use binary search for O(log n) lookups."),
+    (("two pointers", "two pointer", "sliding window", "kadane", "prefix sum"), 1,
+     "Two Pointers walks inward from both ends of a sorted array to find pairs in O(n). Sliding Window grows and shrinks a contiguous range to answer subarray questions in O(n). Kadane's algorithm finds the maximum subarray sum in one pass."),
+    (("linked list", "linked lists", "node", "floyd", "cycle"), 2,
+     "Linked Lists use nodes with pointers. Key operations: insert at head O(1), search O(n). Common problems: cycle detection (Floyd's fast and slow pointers), reversal, merge two lists."),
+    (("stack", "stacks", "lifo", "monotonic stack", "parentheses"), 3,
+     "Stacks follow LIFO (Last In First Out). Used in recursion, expression evaluation, and monotonic stack problems. Push/pop are O(1)."),
+    (("queue", "queues", "fifo", "deque", "priority queue", "heap"), 3,
+     "Queues follow FIFO (First In First Out): enqueue at the back, dequeue from the front, both O(1). They drive BFS and task scheduling. A priority queue (heap) always serves the min or max element in O(log n)."),
+    (("recursion", "recursive", "base case", "backtracking", "permutations", "n queens"), 4,
+     "Recursion needs a base case and recursive case. Think: 1) What's the smallest input? 2) How does solving smaller input help solve bigger one? Backtracking adds: make a choice, recurse, undo the choice."),
+    (("tree", "trees", "bst", "binary search tree", "traversal", "inorder", "lca"), 5,
+     "Trees are hierarchical with parent-child relationships. BST property: left < root < right. Key traversals: inorder, preorder, postorder (DFS) and level-order (BFS)."),
+    (("graph", "graphs", "bfs", "dfs", "topological sort", "shortest path"), 6,
+     "Graphs have nodes (vertices) and edges. BFS for shortest path in unweighted graphs. DFS for exploring all paths. Track visited nodes to avoid cycles."),
+    (("sort", "sorting", "merge sort", "quick sort", "quicksort", "counting sort"), 7,
+     "Merge Sort: O(n log n), stable, extra space. Quick Sort: O(n log n) avg, in-place. For nearly sorted data, consider Insertion Sort."),
+    (("dynamic programming", "dp", "memoization", "tabulation", "knapsack"), 8,
+     "DP = Recursion + Memoization. Identify overlapping subproblems. Common patterns: 1D DP (climbing stairs), 2D DP (grid paths)."),
+    (("big o", "time complexity", "space complexity", "complexity"), None,
+     "Big-O describes how cost grows with input size. Count the work in the innermost loop: one loop over n is O(n), two nested loops O(n^2), halving the input each step O(log n)."),
+]
+
+DEFAULT_ANSWER = "That's a great question! Based on your learning path, I'd recommend reviewing the fundamentals first. Check the resources section for curated videos and notes on this topic."
+NOTES_PER_ANSWER = 2
+EXCERPT_CHARS = 220
+_WORD = re.compile(r"[\wऀ-ॿ]+")
+
+def match_faq(message: str, topic_id: Optional[int] = None) -> Optional[str]:
+    text = " " + " ".join(_WORD.findall(message.lower())) + " "
+    best, best_score = None, 0.0
+    for keywords, faq_topic, answer in FAQ:
+        score = sum(len(k.split()) for k in keywords if f" {k} " in text)
+        if score and faq_topic is not None and faq_topic == topic_id:
+            score += 0.5  # break ties toward the topic being studied
+        if score > best_score:
+            best, best_score = answer, score
+    return best
+
+def _excerpt(text: str) -> str:
+    text = " ".join(line.strip("#*- ").strip() for line in text.splitlines() if line.strip())
+    return text if len(text) <= EXCERPT_CHARS else text[:EXCERPT_CHARS].rsplit(" ", 1)[0] + "…"
+
+def answer_offline(message: str, topic_id: Optional[int] = None) -> Tuple[str, List[dict]]:
+    """Build an answer from the FAQ and notes. Returns (markdown answer, note chunks cited)."""
+    chunks = retrieve(message, NOTES_PER_ANSWER, topic_id)
+    parts = ["*The AI tutor is unavailable right now, so this answer comes from your course notes.*"]
+    faq_answer = match_faq(message, topic_id)
+    if faq_answer:
+        parts.append(faq_answer)
+    if chunks:
+        parts.append("**From the notes:**\n" + "\n".join(f"- **{c['title']}**: {_excerpt(c['text'])}" for c in chunks))
+    if not faq_answer and not chunks:
+        parts.append(DEFAULT_ANSWER)
+    return "\n\n".join(parts), chunks
@@ -0,0 +1,117 @@
+"""
+Token-budgeted prompt assembly for chat.
+
+Token counts are estimated locally (no tokenizer download): roughly four
+characters per token for ASCII text and two for other scripts such as
+Devanagari, which is close enough to keep prompts under a budget.
+
+The budget is filled in priority order: system prompt and the (possibly
+truncated) student message first, then retrieved note chunks best-first,
+then as much recent conversation as still fits.
+"""
+import math
+from typing import List, Optional, Sequence, Tuple
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """
+    Shorten text to about max_tokens, keeping its beginning and end (the
+    question is usually at one end of a pasted code blob). Returns (text, truncated).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+    # Characters per token observed in this text, so scripts other than ASCII are cut proportionally
+    chars_per_token = len(text) / estimate_tokens(text)
+    keep = int(max_tokens * chars_per_token)
+    head = text[:keep * 2 // 3]
+    tail = text[len(text) - keep // 3:]
+    omitted = len(text) - len(head) - len(tail)
+    return f"{head}\n[... {omitted} characters omitted ...]\n{tail}", True
+
+class BuiltPrompt:
+    def __init__(self, text: str, tokens: int, chunks: List[dict], history_turns: int, message_truncated: bool):
+        self.text = text
+        self.tokens = tokens
+        self.chunks = chunks  # the retrieved chunks that made it into the prompt
+        self.history_turns = history_turns
+        self.message_truncated = message_truncated
+
+def build_prompt(
+    system_prompt: str,
+    message: str,
+    max_tokens: int,
+    max_message_tokens: int,
+    topic_context: str = "",
+    chunks: Sequence[dict] = (),
+    history: Sequence[Tuple[str, str]] = (),
+) -> BuiltPrompt:
+    message, truncated = truncate_to_tokens(message, max_message_tokens)
+    question = f"\n\nStudent Question: {message}"
+    used = estimate_tokens(system_prompt) + estimate_tokens(topic_context) + estimate_tokens(question)
+
+    kept_chunks = []
+    references = []
+    for chunk in chunks:
+        block = f"[{chunk['source_id']}] {chunk['title']}\n{chunk['text']}"
+        cost = estimate_tokens(block) + 1
+        if used + cost > max_tokens:
+            break
+        used += cost
+        kept_chunks.append(chunk)
+        references.append(block)
+
+    # Newest turns matter most: walk backwards and stop at the first one that doesn't fit
+    turns = []
+    for role, text in reversed(history):
+        line = f"{'Student' if role == 'user' else 'Tutor'}: {text}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        used += cost
+        turns.append(line)
+    turns.reverse()
+
+    parts = [system_prompt, topic_context]
+    if references:
+        parts.append("\n\nReference notes (prefer these when answering):\n" + "\n\n".join(references))
+    if turns:
+        parts.append("\n\nConversation so far:\n" + "\n".join(turns))
+    parts.append(question)
+    return BuiltPrompt("".join(parts), used, kept_chunks, len(turns), truncated)
+
+class ConversationMemory:
+    """
+    Rolling window of recent turns per user, kept in the worker's cache (process
+    memory with a TTL) rather than the database, so no chat log is persisted.
+    Turns are stored already truncated to keep each user's footprint small.
+    """
+    NAMESPACE = "chat_history"
+
+    def __init__(self, cache, max_turns: int, ttl: float, max_turn_tokens: int = 150):
+        self.cache = cache
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_turn_tokens = max_turn_tokens
+
+    def get(self, user_id: Optional[int]) -> Tuple[Tuple[str, str], ...]:
+        if user_id is None or self.max_turns <= 0:
+            return ()
+        return self.cache.get(self.NAMESPACE, user_id, ())
+
+    def append(self, user_id: Optional[int], message: str, reply: str):
+        if user_id is None or self.max_turns <= 0:
+            return
+        turns = self.get(user_id) + (
+            ("user", truncate_to_tokens(message, self.max_turn_tokens)[0]),
+            ("assistant", truncate_to_tokens(reply, self.max_turn_tokens)[0]),
+        )
+        # Tuples, not lists: cached values are shared with concurrent readers and must not be mutated
+        self.cache.set(self.NAMESPACE, user_id, turns[-self.max_turns * 2:], ttl=self.ttl)
+
+    def clear(self, user_id: int):
+        self.cache.invalidate(self.NAMESPACE, user_id)
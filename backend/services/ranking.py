@@ -0,0 +1,332 @@
+"""
+Recommendation ranking: candidate generation -> features -> scoring -> diversification.
+
+The candidate pool (practice questions, topic and subtopic videos, LeetCode
+problems, roadmap subtopics) is static, so it is built once per process as
+parallel NumPy arrays. Ranking a user is then a few vectorized operations
+over the whole pool: gather the user's per-topic features for every
+candidate, take a weighted sum, mask out what they have already done, and
+greedily pick a top-k that is spread across topics and types.
+
+Weights come from settings, so they can be tuned through the environment,
+e.g. RECOMMENDATION_WEIGHTS='{"weakness": 3.0}', without a code change.
+"""
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+from config import get_settings
+
+FEATURES = ("weakness", "unlocked", "in_progress", "next_subtopic", "difficulty_fit", "recency")
+DEFAULT_WEIGHTS = {
+    "weakness": 3.0,        # 1 - latest assessed mastery of the topic (0.5 when never assessed)
+    "unlocked": 3.0,        # how far the topic's prerequisites are done or mastered
+    "in_progress": 0.8,     # topic has some, but not all, subtopics completed
+    "next_subtopic": 1.2,   # candidate is the first uncompleted subtopic of its topic
+    "difficulty_fit": 1.0,  # question/problem difficulty close to the student's mastery
+    "recency": 0.5,         # decays with days since the student last touched the topic
+    "topic_repeat": 0.5,    # diversification: subtracted per pick already made from the same topic
+}
+TYPES = ("question", "video", "problem", "topic_focus")
+DEFAULT_TYPE_BIAS = {"question": 0.8, "video": 0.2, "problem": 0.3, "topic_focus": 0.4}
+DIFFICULTY_LEVELS = {"easy": 0.0, "medium": 0.5, "hard": 1.0}
+RECENCY_DAYS = 7.0
+MASTERY_THRESHOLD = 0.6  # below this a topic counts as weak in recommendation reasons
+RECENT_ATTEMPTS = 3  # quiz attempts per user considered for mastery and answered questions
+
+# One overview video per topic, keyed by topic id
+TOPIC_VIDEOS = {
+    1: {"url": "https://www.youtube.com/watch?v=RBSGKlAvoiM", "title": "Arrays Interview Patterns"},
+    2: {"url": "https://www.youtube.com/watch?v=njTh_OwMljA", "title": "Linked List Deep Dive"},
+    3: {"url": "https://www.youtube.com/watch?v=RBSGKlAvoiM", "title": "Stacks & Queues Explained"},
+    4: {"url": "https://www.youtube.com/watch?v=M2uO2n5H69U", "title": "Recursion Mastery"},
+    5: {"url": "https://www.youtube.com/watch?v=fAAZixBzIAI", "title": "Tree Traversals Explained"},
+    6: {"url": "https://www.youtube.com/watch?v=tWVWeAqZ0WU", "title": "Graph Algorithms Crash Course"},
+    7: {"url": "https://www.youtube.com/watch?v=kgBjXUE_Nwc", "title": "All Sorting Algorithms Visualized"},
+    8: {"url": "https://www.youtube.com/watch?v=oBt53YbR9Kk", "title": "DP for Beginners"},
+}
+
+class UserState:
+    """What ranking needs to know about one user, loaded up front so ranking itself never queries"""
+    def __init__(
+        self,
+        user_id: int,
+        mastery: Optional[Dict[int, float]] = None,
+        completed_subtopics: Optional[Set[int]] = None,
+        last_active: Optional[Dict[int, datetime]] = None,
+        correct_questions: Optional[Set[int]] = None,
+    ):
+        self.user_id = user_id
+        self.mastery = mastery or {}  # topic_id -> latest assessed mastery 0..1
+        self.completed_subtopics = completed_subtopics or set()
+        self.last_active = last_active or {}  # topic_id -> last quiz or subtopic completion
+        self.correct_questions = correct_questions or set()
+
+class CandidatePool:
+    """Every recommendable item as parallel arrays; `items` holds the row details for the winners"""
+    def __init__(self):
+        from question_bank import QUESTION_BANK
+        from routers.subtopics import DEFAULT_SUBTOPICS
+        from routers.topics import DEFAULT_TOPICS, LEETCODE_PROBLEMS
+
+        self.topic_ids = [t["id"] for t in DEFAULT_TOPICS]
+        self.topic_index = {tid: i for i, tid in enumerate(self.topic_ids)}
+        self.topic_names = [t["name"] for t in DEFAULT_TOPICS]
+        # Assessment results name topics as the question bank does ("Sorting"), the roadmap as "Sorting Algorithms"
+        self.topic_by_name = {t["name"]: t["id"] for t in DEFAULT_TOPICS}
+        self.topic_by_name.update((q["topic"], q["topic_id"]) for q in QUESTION_BANK)
+
+        n_topics = len(self.topic_ids)
+        self.prerequisites = np.zeros((n_topics, n_topics), dtype=bool)
+        for t in DEFAULT_TOPICS:
+            for prereq in t.get("prerequisites", []):
+                if prereq in self.topic_index:
+                    self.prerequisites[self.topic_index[t["id"]], self.topic_index[prereq]] = True
+
+        # Roadmap subtopics, in order within each topic
+        self.subtopic_ids, subtopic_topic, subtopic_position = [], [], []
+        for tid, subtopics in DEFAULT_SUBTOPICS.items():
+            for position, st in enumerate(subtopics):
+                self.subtopic_ids.append(st["id"])
+                subtopic_topic.append(self.topic_index[tid])
+                subtopic_position.append(position)
+        self.subtopic_row = {sid: i for i, sid in enumerate(self.subtopic_ids)}
+        self.subtopic_topic = np.array(subtopic_topic, dtype=np.int32)
+        self.subtopic_position = np.array(subtopic_position, dtype=np.int32)
+        self.subtopic_totals = np.bincount(self.subtopic_topic, minlength=n_topics)
+
+        self.items: List[dict] = []
+        rows = []  # (type, topic index, difficulty or nan, subtopic row or -1, question id or -1)
+
+        def add(kind, tid, item, difficulty=math.nan, subtopic_row=-1, question_id=-1):
+            self.items.append(dict(item, type=kind, topic_id=tid))
+            rows.append((TYPES.index(kind), self.topic_index[tid], difficulty, subtopic_row, question_id))
+
+        for tid, subtopics in DEFAULT_SUBTOPICS.items():
+            for st in subtopics:
+                row = self.subtopic_row[st["id"]]
+                add("topic_focus", tid, {
+                    "content_id": st["id"], "title": f"Next: {st['name']}",
+                    "description": st.get("description") or f"Learn {st['name']}", "action_url": "/roadmap",
+                }, subtopic_row=row)
+                if st.get("video_url"):
+                    add("video", tid, {
+                        "content_id": st["id"], "title": f"Video: {st['name']}",
+                        "description": st.get("description") or f"Learn {st['name']}", "action_url": st["video_url"],
+                    }, subtopic_row=row)
+        for tid, video in TOPIC_VIDEOS.items():
+            if tid in self.topic_index:
+                add("video", tid, {
+                    "content_id": None, "title": video["title"],
+                    "description": f"Watch this video to strengthen your understanding of {self.topic_names[self.topic_index[tid]]}.",
+                    "action_url": video["url"],
+                })
+        for q in QUESTION_BANK:
+            if q["topic_id"] in self.topic_index:
+                add("question", q["topic_id"], {
+                    "content_id": q["id"], "title": f"Practice: {q['topic']}",
+                    "description": f"Try this {q['difficulty']} question to reinforce your understanding.",
+                    "action_url": f"/assessment?topic={q['topic_id']}",
+                }, difficulty=DIFFICULTY_LEVELS.get(q["difficulty"], 0.5), question_id=q["id"])
+        for tid, problems in LEETCODE_PROBLEMS.items():
+            if tid in self.topic_index:
+                for p in problems:
+                    add("problem", tid, {
+                        "content_id": p["id"], "title": f"LeetCode: {p['title']}",
+                        "description": f"Apply {self.topic_names[self.topic_index[tid]]} in practice ({p['difficulty']}).",
+                        "action_url": p["url"],
+                    }, difficulty=DIFFICULTY_LEVELS.get(p["difficulty"].lower(), 0.5))
+
+        columns = list(zip(*rows))
+        self.kind = np.array(columns[0], dtype=np.int32)
+        self.topic = np.array(columns[1], dtype=np.int32)
+        self.difficulty = np.array(columns[2], dtype=np.float32)
+        self.subtopic = np.array(columns[3], dtype=np.int32)
+        self.question = np.array(columns[4], dtype=np.int64)
+        self.has_subtopic = self.subtopic >= 0
+        self.has_difficulty = ~np.isnan(self.difficulty)
+
+    def __len__(self):
+        return len(self.items)
+
+    def topic_id_for(self, name: str) -> Optional[int]:
+        return self.topic_by_name.get(name)
+
+_pool: Optional[CandidatePool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> CandidatePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CandidatePool()
+    return _pool
+
+def get_weights() -> Dict[str, float]:
+    settings = get_settings()
+    weights = dict(DEFAULT_WEIGHTS, **settings.recommendation_weights)
+    weights.update({f"type:{k}": v for k, v in dict(DEFAULT_TYPE_BIAS, **settings.recommendation_type_bias).items()})
+    return weights
+
+def topic_features(pool: CandidatePool, state: UserState, now: datetime) -> Dict[str, np.ndarray]:
+    """Per-topic feature vectors for one user (length = number of topics)"""
+    n_topics = len(pool.topic_ids)
+    mastery = np.full(n_topics, np.nan, dtype=np.float32)
+    for tid, value in state.mastery.items():
+        if tid in pool.topic_index:
+            mastery[pool.topic_index[tid]] = value
+
+    completed = np.zeros(len(pool.subtopic_ids), dtype=bool)
+    rows = [pool.subtopic_row[s] for s in state.completed_subtopics if s in pool.subtopic_row]
+    completed[rows] = True
+    done = np.bincount(pool.subtopic_topic[completed], minlength=n_topics)
+    completion = np.divide(done, pool.subtopic_totals, out=np.zeros(n_topics), where=pool.subtopic_totals > 0)
+
+    # A prerequisite counts as met by working through it or by testing well on it
+    readiness = np.maximum(completion, np.nan_to_num(mastery, nan=0.0))
+    unlocked = np.where(pool.prerequisites, readiness[None, :], 1.0).min(axis=1)
+
+    # Position of the first subtopic not yet done, per topic (a large number once all are done)
+    first_open = np.full(n_topics, np.iinfo(np.int32).max, dtype=np.int32)
+    np.minimum.at(first_open, pool.subtopic_topic[~completed], pool.subtopic_position[~completed])
+
+    days = np.full(n_topics, np.inf)
+    for tid, when in state.last_active.items():
+        if tid in pool.topic_index and when is not None:
+            days[pool.topic_index[tid]] = max((now - when).total_seconds() / 86400, 0.0)
+
+    return {
+        "mastery": mastery,
+        "completed": completed,
+        "weakness": 1.0 - np.nan_to_num(mastery, nan=0.5),
+        "unlocked": unlocked,
+        "in_progress": ((completion > 0) & (completion < 1)).astype(np.float32),
+        "first_open": first_open,
+        "recency": np.exp(-days / RECENCY_DAYS),
+    }
+
+def score_candidates(pool: CandidatePool, state: UserState, weights: Dict[str, float], now: datetime):
+    """Score every candidate for one user. Returns (scores with -inf for excluded candidates, topic features)."""
+    per_topic = topic_features(pool, state, now)
+    t = pool.topic
+
+    # Difficulty fit targets the topic's mastery; unassessed topics aim at easy-to-medium
+    target = np.nan_to_num(per_topic["mastery"], nan=0.25)[t]
+    fit = np.where(pool.has_difficulty, 1.0 - np.abs(np.nan_to_num(pool.difficulty, nan=0.0) - target), 0.5)
+    next_subtopic = pool.has_subtopic & (pool.subtopic_position[pool.subtopic] == per_topic["first_open"][t])
+
+    features = np.stack([
+        per_topic["weakness"][t],
+        per_topic["unlocked"][t],
+        per_topic["in_progress"][t],
+        next_subtopic,
+        fit,
+        per_topic["recency"][t],
+    ], axis=1).astype(np.float32)
+    scores = features @ np.array([weights[f] for f in FEATURES], dtype=np.float32)
+    scores += np.array([weights[f"type:{k}"] for k in TYPES], dtype=np.float32)[pool.kind]
+
+    # Drop subtopics (and their videos) already done and questions already answered correctly
+    excluded = pool.has_subtopic & per_topic["completed"][pool.subtopic]
+    if state.correct_questions:
+        excluded |= np.isin(pool.question, list(state.correct_questions))
+    scores[excluded] = -np.inf
+    return scores, per_topic
+
+def diversify(pool: CandidatePool, scores: np.ndarray, k: int, topic_repeat: float, max_per_type: int) -> List[int]:
+    """
+    Greedy top-k: each pick lowers the rest of its topic, rules out more of the
+    same type for that topic (no two identical-looking cards), and a type stops
+    at max_per_type.
+    """
+    scores = scores.copy()
+    topic_picks = np.zeros(len(pool.topic_ids), dtype=np.float32)
+    type_picks = np.zeros(len(TYPES), dtype=np.int32)
+    picked = []
+    for _ in range(min(k, len(scores))):
+        adjusted = scores - topic_repeat * topic_picks[pool.topic]
+        adjusted[type_picks[pool.kind] >= max_per_type] = -np.inf
+        best = int(np.argmax(adjusted))
+        if not np.isfinite(adjusted[best]):
+            break
+        picked.append(best)
+        scores[(pool.kind == pool.kind[best]) & (pool.topic == pool.topic[best])] = -np.inf
+        topic_picks[pool.topic[best]] += 1
+        type_picks[pool.kind[best]] += 1
+    return picked
+
+def rank(state: UserState, k: int, now: Optional[datetime] = None) -> List[dict]:
+    """Top-k recommendations for one user, best first, as dicts ready for a Recommendation row"""
+    pool = get_pool()
+    weights = get_weights()
+    now = now or datetime.utcnow()
+    scores, per_topic = score_candidates(pool, state, weights, now)
+    picked = diversify(pool, scores, k, weights["topic_repeat"], get_settings().recommendation_max_per_type)
+
+    ranked = []
+    for position, i in enumerate(picked):
+        item = dict(pool.items[i])
+        mastery = per_topic["mastery"][pool.topic[i]]
+        if item["type"] in ("question", "problem") and mastery < MASTERY_THRESHOLD:
+            item["description"] = f"You scored {mastery:.0%} on {pool.topic_names[pool.topic[i]]} in your last assessment. " + item["description"]
+        item["score"] = float(scores[i])
+        item["priority"] = max(5 - position, 1)
+        ranked.append(item)
+    return ranked
+
+def load_user_states(db: Session, user_ids: Iterable[int]) -> Dict[int, UserState]:
+    """Load ranking inputs for many users with one query per table"""
+    pool = get_pool()
+    user_ids = list(user_ids)
+    states = {uid: UserState(uid) for uid in user_ids}
+    if not user_ids:
+        return states
+    subtopic_topic = {sid: pool.topic_ids[pool.subtopic_topic[row]] for sid, row in pool.subtopic_row.items()}
+
+    progress = db.query(
+        models.SubtopicProgress.user_id, models.SubtopicProgress.subtopic_id, models.SubtopicProgress.completed_at
+    ).filter(
+        models.SubtopicProgress.user_id.in_(user_ids),
+        models.SubtopicProgress.completed == True
+    )
+    for user_id, subtopic_id, completed_at in progress:
+        state = states[user_id]
+        state.completed_subtopics.add(subtopic_id)
+        tid = subtopic_topic.get(subtopic_id)
+        if tid is not None and completed_at is not None and completed_at > state.last_active.get(tid, datetime.min):
+            state.last_active[tid] = completed_at
+
+    # Number each user's attempts newest first in SQL, so the JSON columns are
+    # only read for the RECENT_ATTEMPTS rows that are used
+    Attempt = models.QuizAttempt
+    recent = db.query(
+        Attempt.id,
+        func.row_number().over(
+            partition_by=Attempt.user_id, order_by=(Attempt.created_at.desc(), Attempt.id.desc())
+        ).label("recency"),
+    ).filter(Attempt.user_id.in_(user_ids)).subquery()
+    attempts = db.query(
+        Attempt.user_id, Attempt.created_at, Attempt.topic_mastery, Attempt.detailed_report
+    ).join(recent, recent.c.id == Attempt.id).filter(
+        recent.c.recency <= RECENT_ATTEMPTS
+    ).order_by(Attempt.user_id, recent.c.recency)
+    for user_id, created_at, topic_mastery, report in attempts:
+        state = states[user_id]
+        for entry in topic_mastery or []:
+            tid = pool.topic_id_for(entry.get("topic", ""))
+            if tid is None or not entry.get("total"):
+                continue
+            # Newest attempt first, so keep the first mastery seen for each topic
+            state.mastery.setdefault(tid, entry.get("mastery", 0.0))
+            if created_at is not None and created_at > state.last_active.get(tid, datetime.min):
+                state.last_active[tid] = created_at
+        state.correct_questions.update(q["id"] for q in report or [] if q.get("is_correct"))
+    return states
+
+def load_user_state(db: Session, user_id: int) -> UserState:
+    return load_user_states(db, [user_id])[user_id]
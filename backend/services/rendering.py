@@ -0,0 +1,32 @@
+"""
+Markdown rendering for user notes.
+
+Notes are rendered once when they are written and the HTML is stored on the
+row, so list views never re-render markdown. Raw HTML in notes is escaped
+rather than passed through, and links with script-capable schemes
+(javascript:, vbscript:, data: except images) are dropped, so the stored HTML
+is safe to inject into the page.
+"""
+import html
+import re
+
+try:
+    from markdown_it import MarkdownIt
+except ImportError:  # pragma: no cover - markdown-it-py is listed in requirements.txt
+    MarkdownIt = None
+
+if MarkdownIt is not None:
+    _md = MarkdownIt("commonmark", {"html": False, "breaks": True}).enable(["table", "strikethrough"])
+else:
+    _md = None
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+def render_markdown(text: str) -> str:
+    if not text:
+        return ""
+    if _md is not None:
+        return _md.render(text)
+    # Without markdown-it, keep the text readable and safe: escaped paragraphs with line breaks
+    paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+    return "".join(f"<p>{html.escape(p).replace(chr(10), '<br>')}</p>\n" for p in paragraphs)
@@ -0,0 +1,172 @@
+"""
+Local retrieval for grounding chat answers in the curated notes.
+
+Topic summaries, resource notes and subtopic descriptions are split into
+small chunks and embedded with hashed TF-IDF (CPU only, no model download).
+Vectors are saved as a .npy file and memory-mapped, so every worker shares
+one copy through the OS page cache; the index is rebuilt only when the
+source content changes.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional
+import numpy as np
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1  # bump when tokenization or weighting changes so saved indexes are rebuilt
+DIMENSIONS = 1 << 12
+MAX_CHUNK_CHARS = 320
+TOPIC_BOOST = 0.15  # added to chunks from the topic the student is studying
+MIN_SCORE = 0.05
+_TOKEN = re.compile(r"[\wऀ-ॿ]+")
+_SECTION_BREAK = re.compile(r"\n\s*\n|\n(?=#+ )")
+
+_SUFFIXES = ("ations", "ation", "ions", "ion", "ings", "ing", "ed", "es", "s")
+
+def _stem(word: str) -> str:
+    # Crude suffix stripping so "detect" matches "detection" and "pointer" matches "pointers"
+    if len(word) > 4:
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                return word[:-len(suffix)]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    words = [_stem(w) for w in _TOKEN.findall(text.lower())]
+    # Bigrams keep phrases like "two pointers" distinct from either word alone
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def _bucket(term: str) -> int:
+    # crc32 rather than hash(): bucket ids must be stable across processes
+    return zlib.crc32(term.encode("utf-8")) & (DIMENSIONS - 1)
+
+def term_frequencies(text: str) -> np.ndarray:
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for term in tokenize(text):
+        vector[_bucket(term)] += 1
+    # Sublinear tf so a repeated word can't dominate a chunk
+    np.log1p(vector, out=vector)
+    return vector
+
+def _split(text: str) -> List[str]:
+    """Split on blank lines and headings, then merge small pieces up to MAX_CHUNK_CHARS"""
+    chunks, current = [], ""
+    for section in (s.strip() for s in _SECTION_BREAK.split(text)):
+        if not section:
+            continue
+        if current and len(current) + len(section) + 2 > MAX_CHUNK_CHARS:
+            chunks.append(current)
+            current = section
+        else:
+            current = f"{current}\n\n{section}" if current else section
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_chunks() -> List[dict]:
+    from routers.notes import TOPIC_SUMMARIES
+    from routers.resources import SAMPLE_RESOURCES
+    from routers.subtopics import DEFAULT_SUBTOPICS
+
+    chunks = []
+    for topic_id, summary in TOPIC_SUMMARIES.items():
+        title = summary.splitlines()[0].lstrip("# ").strip()
+        for part in _split(summary):
+            chunks.append({"source_id": f"summary:{topic_id}", "title": title, "topic_id": topic_id, "text": part})
+    for topic_id, resource in SAMPLE_RESOURCES.items():
+        for note in resource.get("notes", []):
+            for part in _split(note["content"]):
+                chunks.append({"source_id": f"note:{note['id']}", "title": note["title"], "topic_id": topic_id, "text": part})
+    for topic_id, subtopics in DEFAULT_SUBTOPICS.items():
+        for subtopic in subtopics:
+            chunks.append({
+                "source_id": f"subtopic:{subtopic['id']}", "title": subtopic["name"], "topic_id": topic_id,
+                "text": f"{subtopic['name']}: {subtopic['description']}",
+            })
+    return chunks
+
+class VectorIndex:
+    def __init__(self, chunks: List[dict], idf: np.ndarray, vectors: np.ndarray):
+        self.chunks = chunks
+        self.idf = idf
+        self.vectors = vectors
+        self.topic_ids = np.array([c["topic_id"] for c in chunks], dtype=np.int32)
+
+    @classmethod
+    def build(cls, chunks: List[dict]) -> "VectorIndex":
+        tf = np.stack([term_frequencies(f"{c['title']}\n{c['text']}") for c in chunks])
+        df = np.count_nonzero(tf, axis=0)
+        idf = (np.log((1 + len(chunks)) / (1 + df)) + 1).astype(np.float32)
+        vectors = tf * idf
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return cls(chunks, idf, vectors.astype(np.float32))
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = term_frequencies(text) * self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, query: str, k: int = 4, topic_id: Optional[int] = None) -> List[dict]:
+        scores = self.vectors @ self.embed(query)
+        if topic_id is not None:
+            scores = scores + TOPIC_BOOST * (self.topic_ids == topic_id)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.chunks[i], score=float(scores[i])) for i in top if scores[i] >= MIN_SCORE]
+
+    def save(self, directory: str, digest: str):
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so a worker never maps a half-written file
+        for name, array in (("vectors.npy", self.vectors), ("idf.npy", self.idf)):
+            tmp = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, os.path.join(directory, name))
+        tmp = os.path.join(directory, f".meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"digest": digest, "dimensions": DIMENSIONS, "chunks": self.chunks}, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def load(cls, directory: str, digest: str) -> Optional["VectorIndex"]:
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["digest"] != digest or meta["dimensions"] != DIMENSIONS:
+                return None
+            vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+            idf = np.load(os.path.join(directory, "idf.npy"))
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(meta["chunks"], idf, vectors)
+
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+
+def get_index() -> VectorIndex:
+    """Load the memory-mapped index, rebuilding it first if the notes changed"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                chunks = build_chunks()
+                digest = hashlib.sha256(json.dumps([INDEX_VERSION, chunks], sort_keys=True).encode("utf-8")).hexdigest()
+                directory = get_settings().retrieval_index_dir
+                index = VectorIndex.load(directory, digest)
+                if index is None:
+                    logger.info("Building retrieval index (%d chunks) in %s", len(chunks), directory)
+                    VectorIndex.build(chunks).save(directory, digest)
+                    index = VectorIndex.load(directory, digest)
+                _index = index
+    return _index
+
+def retrieve(query: str, k: Optional[int] = None, topic_id: Optional[int] = None) -> List[dict]:
+    return get_index().search(query, k or get_settings().retrieval_top_k, topic_id)
@@ -0,0 +1,263 @@
+"""
+Full-text search over user notes and the static catalog (topic summaries,
+resource notes and the question bank), backed by SQLite FTS5.
+
+- note_search indexes user_notes through a view and is kept in sync by
+  triggers, so writes never touch Python. The owner column holds "u<user_id>"
+  so a user filter is one more posting list intersected inside FTS5 rather
+  than a post-filter over every user's matches.
+- catalog_search is rebuilt at startup only when the catalog content changes.
+
+On databases without FTS5 (e.g. PostgreSQL) search falls back to LIKE scans.
+"""
+import hashlib
+import html
+import logging
+import re
+import time
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# unicode61 treats Devanagari vowel signs and viramas as separators, which
+# shreds Hindi words; declaring them token characters keeps words whole
+_DEVANAGARI_MARKS = "".join(
+    chr(c) for lo, hi in [(0x0900, 0x0904), (0x093A, 0x0950), (0x0951, 0x0958), (0x0962, 0x0964)] for c in range(lo, hi)
+)
+TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{_DEVANAGARI_MARKS}'"
+_TERM = re.compile(r"[\wऀ-ॿ]+\*?")
+
+SNIPPET_TOKENS = 12
+MAX_LIMIT = 50
+
+# snippet() marks matches with these control characters rather than tags, so the
+# text around them can be HTML-escaped before the <mark> tags go in
+_OPEN, _CLOSE = "\x02", "\x03"
+
+NOTE_SEARCH_DDL = [
+    "CREATE VIEW IF NOT EXISTS user_notes_search_source AS "
+    "SELECT id, content, 'u' || user_id AS owner, topic_id FROM user_notes",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS note_search USING fts5(
+        content, owner, topic_id UNINDEXED,
+        content='user_notes_search_source', content_rowid='id',
+        tokenize="{TOKENIZER}"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS user_notes_search_insert AFTER INSERT ON user_notes BEGIN
+        INSERT INTO note_search(rowid, content, owner, topic_id)
+        VALUES (new.id, new.content, 'u' || new.user_id, new.topic_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_notes_search_delete AFTER DELETE ON user_notes BEGIN
+        INSERT INTO note_search(note_search, rowid, content, owner, topic_id)
+        VALUES ('delete', old.id, old.content, 'u' || old.user_id, old.topic_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_notes_search_update AFTER UPDATE OF content, user_id, topic_id ON user_notes BEGIN
+        INSERT INTO note_search(note_search, rowid, content, owner, topic_id)
+        VALUES ('delete', old.id, old.content, 'u' || old.user_id, old.topic_id);
+        INSERT INTO note_search(rowid, content, owner, topic_id)
+        VALUES (new.id, new.content, 'u' || new.user_id, new.topic_id);
+    END""",
+]
+
+CATALOG_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5(
+        title, body, kind UNINDEXED, ref UNINDEXED, topic_id UNINDEXED,
+        tokenize="{TOKENIZER}"
+    )""",
+    "CREATE TABLE IF NOT EXISTS catalog_search_meta (id INTEGER PRIMARY KEY CHECK (id = 1), digest TEXT NOT NULL)",
+]
+
+def fts_available(db_or_engine) -> bool:
+    bind = db_or_engine.get_bind() if isinstance(db_or_engine, Session) else db_or_engine
+    return bind.dialect.name == "sqlite"
+
+def catalog_documents() -> List[dict]:
+    """Static searchable documents: topic summaries, videos, resource notes and questions"""
+    from question_bank import QUESTION_BANK
+    from routers.notes import TOPIC_SUMMARIES
+    from routers.resources import SAMPLE_RESOURCES
+
+    docs = []
+    for topic_id, summary in TOPIC_SUMMARIES.items():
+        title = summary.splitlines()[0].lstrip("# ").strip()
+        docs.append({"kind": "summary", "ref": topic_id, "topic_id": topic_id, "title": title, "body": summary})
+    for topic_id, resource in SAMPLE_RESOURCES.items():
+        for video in resource.get("videos", []):
+            # Index both titles so Hindi queries find the same videos
+            docs.append({"kind": "video", "ref": video["id"], "topic_id": topic_id, "title": video["title"],
+                         "body": video.get("title_hi", "")})
+        for note in resource.get("notes", []):
+            docs.append({"kind": "resource_note", "ref": note["id"], "topic_id": topic_id, "title": note["title"], "body": note["content"]})
+    for q in QUESTION_BANK:
+        docs.append({"kind": "question", "ref": q["id"], "topic_id": q["topic_id"], "title": q["topic"],
+                     "body": q["text"] + "\n" + "\n".join(q["options"])})
+    return docs
+
+def ensure_search_schema(engine):
+    """Create FTS tables and triggers (idempotent) and refresh the catalog index if it changed"""
+    if not fts_available(engine):
+        logger.info("FTS5 search unavailable on %s; using LIKE fallback", engine.dialect.name)
+        return
+    with engine.begin() as conn:
+        created = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'note_search'")).first() is None
+        for statement in NOTE_SEARCH_DDL + CATALOG_SEARCH_DDL:
+            conn.execute(text(statement))
+        if created:
+            # Index notes written before the triggers existed
+            conn.execute(text("INSERT INTO note_search(note_search) VALUES ('rebuild')"))
+
+        docs = catalog_documents()
+        digest = hashlib.sha256(repr(docs).encode("utf-8")).hexdigest()
+        current = conn.execute(text("SELECT digest FROM catalog_search_meta WHERE id = 1")).scalar()
+        if current != digest:
+            conn.execute(text("DELETE FROM catalog_search"))
+            conn.execute(
+                text("INSERT INTO catalog_search (title, body, kind, ref, topic_id) VALUES (:title, :body, :kind, :ref, :topic_id)"),
+                docs,
+            )
+            conn.execute(
+                text("INSERT INTO catalog_search_meta (id, digest) VALUES (1, :digest) "
+                     "ON CONFLICT(id) DO UPDATE SET digest = excluded.digest"),
+                {"digest": digest},
+            )
+
+def build_match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 expression: every term is quoted (so user
+    input can't inject operators) and ANDed. Terms ending in * and the last
+    term are prefix matches, so results update while the user types.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    parts = []
+    for i, term in enumerate(terms):
+        prefix = term.endswith("*") or i == len(terms) - 1
+        word = term.rstrip("*")
+        parts.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(parts)
+
+def render_snippet(marked: str) -> str:
+    """HTML-escape a snippet whose matches are delimited by _OPEN/_CLOSE, then wrap them in <mark>"""
+    return html.escape(marked).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+def normalise_scores(hits: List[dict]) -> List[dict]:
+    """
+    Scale scores so the best hit from a source scores 1.0. bm25 values from
+    different indexes depend on each index's size and term statistics, so
+    they can only be merged once each is relative to its own best match.
+    """
+    top = max((h["score"] for h in hits), default=0.0)
+    if top > 0:
+        for h in hits:
+            h["score"] = round(h["score"] / top, 4)
+    return hits
+
+def search_notes(db: Session, user_id: int, query: str, topic_id: Optional[int] = None, limit: int = 20) -> List[dict]:
+    expression = build_match_expression(query)
+    if expression is None:
+        return []
+    if not fts_available(db):
+        return _like_search_notes(db, user_id, query, topic_id, limit)
+    sql = (
+        "SELECT rowid AS id, topic_id, "
+        "snippet(note_search, 0, :open, :close, '…', :snippet_tokens) AS snippet, "
+        "bm25(note_search, 1.0, 0.0) AS score "
+        "FROM note_search WHERE note_search MATCH :match"
+    )
+    params = {"match": f"owner:u{int(user_id)} AND content:({expression})", "open": _OPEN, "close": _CLOSE,
+              "snippet_tokens": SNIPPET_TOKENS, "limit": limit}
+    if topic_id is not None:
+        sql += " AND topic_id = :topic_id"
+        params["topic_id"] = topic_id
+    sql += " ORDER BY score LIMIT :limit"
+    rows = db.execute(text(sql), params).mappings().all()
+    return [
+        {"kind": "note", "id": r["id"], "topic_id": r["topic_id"], "title": "My note",
+         "snippet": render_snippet(r["snippet"]), "score": -r["score"]}
+        for r in rows
+    ]
+
+def search_catalog(db: Session, query: str, topic_id: Optional[int] = None, limit: int = 20) -> List[dict]:
+    expression = build_match_expression(query)
+    if expression is None:
+        return []
+    if not fts_available(db):
+        return _like_search_catalog(query, topic_id, limit)
+    sql = (
+        "SELECT kind, ref, topic_id, title, "
+        "snippet(catalog_search, 1, :open, :close, '…', :snippet_tokens) AS snippet, "
+        "bm25(catalog_search, 2.0, 1.0) AS score "
+        "FROM catalog_search WHERE catalog_search MATCH :match"
+    )
+    params = {"match": f"{{title body}}:({expression})", "open": _OPEN, "close": _CLOSE,
+              "snippet_tokens": SNIPPET_TOKENS, "limit": limit}
+    if topic_id is not None:
+        sql += " AND topic_id = :topic_id"
+        params["topic_id"] = topic_id
+    sql += " ORDER BY score LIMIT :limit"
+    rows = db.execute(text(sql), params).mappings().all()
+    return [
+        {"kind": r["kind"], "id": r["ref"], "topic_id": r["topic_id"], "title": r["title"],
+         "snippet": render_snippet(r["snippet"]), "score": -r["score"]}
+        for r in rows
+    ]
+
+def search(db: Session, query: str, user_id: Optional[int] = None, scope: str = "all",
+           topic_id: Optional[int] = None, limit: int = 20) -> dict:
+    """Ranked hits across the requested scopes; anonymous callers only see the catalog"""
+    limit = max(1, min(limit, MAX_LIMIT))
+    start = time.perf_counter()
+    hits = []
+    if scope in ("all", "notes") and user_id is not None:
+        hits.extend(normalise_scores(search_notes(db, user_id, query, topic_id, limit)))
+    if scope in ("all", "catalog"):
+        hits.extend(normalise_scores(search_catalog(db, query, topic_id, limit)))
+    # Stable: on equal scores notes stay ahead of the catalog
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    return {
+        "query": query,
+        "hits": hits[:limit],
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+# ---------- LIKE fallback for databases without FTS5 ----------
+
+def _like_snippet(content: str, terms: List[str]) -> str:
+    """About 120 characters around the first term, every term marked as snippet() would"""
+    index = content.lower().find(terms[0].lower())
+    start = max(0, index - 40)
+    fragment = content[start:start + 120].replace(_OPEN, "").replace(_CLOSE, "")
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    marked = pattern.sub(lambda m: _OPEN + m.group(0) + _CLOSE, fragment)
+    return ("…" if start else "") + render_snippet(marked) + ("…" if start + 120 < len(content) else "")
+
+def _like_search_notes(db: Session, user_id: int, query: str, topic_id: Optional[int], limit: int) -> List[dict]:
+    from models import UserNote
+    terms = [t.rstrip("*") for t in _TERM.findall(query)]
+    q = db.query(UserNote).filter(UserNote.user_id == user_id)
+    for term in terms:
+        q = q.filter(UserNote.content.ilike(f"%{term}%"))
+    if topic_id is not None:
+        q = q.filter(UserNote.topic_id == topic_id)
+    notes = q.order_by(UserNote.updated_at.desc()).limit(limit).all()
+    return [
+        {"kind": "note", "id": n.id, "topic_id": n.topic_id, "title": "My note",
+         "snippet": _like_snippet(n.content, terms), "score": 0.0}
+        for n in notes
+    ]
+
+def _like_search_catalog(query: str, topic_id: Optional[int], limit: int) -> List[dict]:
+    terms = [t.rstrip("*").lower() for t in _TERM.findall(query)]
+    hits = []
+    for doc in catalog_documents():
+        if topic_id is not None and doc["topic_id"] != topic_id:
+            continue
+        haystack = (doc["title"] + "\n" + doc["body"]).lower()
+        if all(term in haystack for term in terms):
+            hits.append({"kind": doc["kind"], "id": doc["ref"], "topic_id": doc["topic_id"], "title": doc["title"],
+                         "snippet": _like_snippet(doc["body"], terms), "score": 0.0})
+            if len(hits) >= limit:
+                break
+    return hits
@@ -0,0 +1,77 @@
+"""
+Background purge of expired and completed recommendations.
+
+Rows are deleted in bounded batches, each in its own short transaction, so
+the sweeper never holds the write lock for long. Every worker may run one;
+deletes are idempotent, so overlapping sweeps only cost a few empty scans.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+import models
+from database import SessionLocal
+from metrics import RECOMMENDATIONS_SWEPT
+from services.recommendation import invalidate_user_recommendations
+
+logger = logging.getLogger(__name__)
+
+def sweep_recommendations(batch_size: int = 500, now: Optional[datetime] = None, max_batches: Optional[int] = None) -> int:
+    """Delete expired and completed recommendations. Returns the number of rows removed."""
+    now = now or datetime.utcnow()
+    removed = 0
+    batches = 0
+    # One condition per pass so the expiry scan is an index range rather than an OR over the table;
+    # completed rows are few, since they are swept every interval
+    for condition in (models.Recommendation.expires_at <= now, models.Recommendation.is_completed == True):
+        while max_batches is None or batches < max_batches:
+            db = SessionLocal()
+            try:
+                rows = db.query(models.Recommendation.id, models.Recommendation.user_id).filter(condition).limit(batch_size).all()
+                if rows:
+                    db.query(models.Recommendation).filter(
+                        models.Recommendation.id.in_([row.id for row in rows])
+                    ).delete(synchronize_session=False)
+                    db.commit()
+            finally:
+                db.close()
+            if not rows:
+                break
+
+            # Completed rows are already hidden, but expired ones may still sit in a user's cache entry
+            for user_id in {row.user_id for row in rows}:
+                invalidate_user_recommendations(user_id)
+            removed += len(rows)
+            batches += 1
+            RECOMMENDATIONS_SWEPT.inc(amount=len(rows))
+            if len(rows) < batch_size:
+                break
+    return removed
+
+class RecommendationSweeper:
+    """Runs sweep_recommendations every `interval` seconds on a daemon thread"""
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                removed = sweep_recommendations(self.batch_size)
+                if removed:
+                    logger.info("Swept %d recommendations", removed)
+            except Exception:
+                logger.exception("Recommendation sweep failed")
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="recommendation-sweeper", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
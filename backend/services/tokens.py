@@ -0,0 +1,211 @@
+"""
+Short-lived access tokens with rotating refresh tokens.
+
+Login issues a pair: an access token (minutes) and a refresh token (days).
+/api/auth/refresh trades a refresh token for a new pair without touching
+bcrypt, and revokes the one it was given. Every pair from one login shares
+a family id; presenting an already-rotated refresh token means it leaked,
+so the whole family is revoked, and logout revokes the family the same way.
+
+Tabs share one stored token pair, so several of them can refresh with the
+same refresh token at once. A rotated token presented again within
+REFRESH_REUSE_GRACE_SECONDS of its rotation is treated as such a race, not
+as theft: it gets a twin of the pair already issued. The successor's jti is
+derived from its predecessor's, so twins share one jti and whichever copy a
+tab keeps can be rotated exactly once.
+
+Revoked ids are kept in a per-process set, loaded once from the
+revoked_tokens table and kept current by messages on the cache bus, so
+checking a token stays a signature check plus a set lookup. Entries drop
+out when the token they revoke would have expired anyway, which keeps the
+set small.
+"""
+import hashlib
+import hmac
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from jose import JWTError, jwt
+from sqlalchemy.exc import IntegrityError
+import models
+from cache import cache
+from config import get_settings
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "token-revoked"
+PRUNE_EVERY = 1000  # revocations between sweeps of expired entries from memory
+
+class RevocationList:
+    def __init__(self, bus):
+        self.bus = bus
+        self._revoked: Dict[str, float] = {}  # token or family id -> unix time it stops mattering
+        self._revoked_at: Dict[str, float] = {}  # token or family id -> unix time it was revoked
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._since_prune = 0
+        bus.subscribe(REVOCATION_CHANNEL, self._on_message)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            now = datetime.utcnow()
+            db = SessionLocal()
+            try:
+                db.query(models.RevokedToken).filter(models.RevokedToken.expires_at <= now).delete(synchronize_session=False)
+                db.commit()
+                rows = db.query(
+                    models.RevokedToken.token_id, models.RevokedToken.expires_at, models.RevokedToken.revoked_at
+                ).all()
+            finally:
+                db.close()
+            for token_id, expires_at, revoked_at in rows:
+                self._revoked[token_id] = expires_at.replace(tzinfo=timezone.utc).timestamp()
+                if revoked_at is not None:
+                    self._revoked_at[token_id] = revoked_at.replace(tzinfo=timezone.utc).timestamp()
+            self._loaded = True
+
+    def is_revoked(self, *token_ids: Optional[str]) -> bool:
+        self._ensure_loaded()
+        now = time.time()
+        return any(self._revoked.get(token_id, 0) > now for token_id in token_ids if token_id)
+
+    def revoked_at(self, token_id: str) -> Optional[float]:
+        """Unix time the id was revoked, if it is revoked and the time is known"""
+        self._ensure_loaded()
+        return self._revoked_at.get(token_id) if self.is_revoked(token_id) else None
+
+    def revoke(self, token_id: str, expires_at: float, exclusive: bool = False) -> bool:
+        """
+        Revoke an id everywhere. With exclusive=True the database row acts as a
+        claim: returns False if another request or worker revoked it first.
+        """
+        self._ensure_loaded()
+        revoked_at = time.time()
+        row = models.RevokedToken(
+            token_id=token_id, expires_at=datetime.utcfromtimestamp(expires_at),
+            revoked_at=datetime.utcfromtimestamp(revoked_at),
+        )
+        db = SessionLocal()
+        try:
+            if exclusive:
+                db.add(row)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    # Learn when the winner revoked it; its bus message may not have arrived yet
+                    winner = db.get(models.RevokedToken, token_id)
+                    if winner is not None and winner.revoked_at is not None:
+                        self._add(token_id, expires_at, winner.revoked_at.replace(tzinfo=timezone.utc).timestamp())
+                    return False
+            else:
+                db.merge(row)
+                db.commit()
+        finally:
+            db.close()
+        self._add(token_id, expires_at, revoked_at)
+        self.bus.publish(REVOCATION_CHANNEL, f"{token_id}|{expires_at}|{revoked_at}")
+        return True
+
+    def _add(self, token_id: str, expires_at: float, revoked_at: Optional[float]):
+        with self._lock:
+            self._revoked[token_id] = max(expires_at, self._revoked.get(token_id, 0))
+            if revoked_at is not None:
+                self._revoked_at.setdefault(token_id, revoked_at)
+            self._since_prune += 1
+            if self._since_prune >= PRUNE_EVERY:
+                now = time.time()
+                self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+                self._revoked_at = {k: v for k, v in self._revoked_at.items() if k in self._revoked}
+                self._since_prune = 0
+
+    def _on_message(self, message: str):
+        # "id|expires_at|revoked_at"; workers from before the grace window send "id|expires_at"
+        token_id, expires_at, *revoked_at = message.split("|")
+        self._add(token_id, float(expires_at), float(revoked_at[0]) if revoked_at else None)
+
+revocations = RevocationList(cache.bus)
+
+class TokenError(Exception):
+    pass
+
+def successor_jti(jti: str) -> str:
+    """The jti of the refresh token issued when `jti` is rotated; the same on every worker"""
+    key = get_settings().secret_key.encode("utf-8")
+    return hmac.new(key, jti.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+def create_token_pair(email: str, family: Optional[str] = None, jti: Optional[str] = None) -> dict:
+    settings = get_settings()
+    family = family or uuid.uuid4().hex
+    now = datetime.utcnow()
+    access_ttl = timedelta(minutes=settings.access_token_expire_minutes)
+    access = jwt.encode(
+        {"sub": email, "type": "access", "fam": family, "exp": now + access_ttl},
+        settings.secret_key, algorithm=settings.algorithm,
+    )
+    refresh = jwt.encode(
+        {"sub": email, "type": "refresh", "fam": family, "jti": jti or uuid.uuid4().hex,
+         "exp": now + timedelta(days=settings.refresh_token_expire_days)},
+        settings.secret_key, algorithm=settings.algorithm,
+    )
+    return {"token": access, "refresh_token": refresh, "expires_in": int(access_ttl.total_seconds())}
+
+def decode_token(token: str, token_type: str) -> dict:
+    """Verify signature, expiry, type and revocation; raises TokenError"""
+    settings = get_settings()
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError as e:
+        raise TokenError(str(e))
+    # Tokens issued before refresh tokens existed carry no type and count as access tokens
+    if payload.get("type", "access") != token_type or not payload.get("sub"):
+        raise TokenError("wrong token type")
+    if revocations.is_revoked(payload.get("fam"), payload.get("jti")):
+        raise TokenError("token revoked")
+    return payload
+
+def _family_expiry() -> float:
+    # A family can't outlive the newest refresh token issued in it
+    return time.time() + get_settings().refresh_token_expire_days * 86400
+
+def rotate_refresh_token(refresh_token: str) -> tuple:
+    """Revoke a refresh token and issue the next pair in its family. Returns (email, pair)."""
+    settings = get_settings()
+    try:
+        payload = jwt.decode(refresh_token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError as e:
+        raise TokenError(str(e))
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        raise TokenError("wrong token type")
+    if revocations.is_revoked(payload["fam"]):
+        raise TokenError("token revoked")
+    email, family = payload["sub"], payload["fam"]
+    successor = successor_jti(payload["jti"])
+    if revocations.is_revoked(payload["jti"]) or not revocations.revoke(payload["jti"], float(payload["exp"]), exclusive=True):
+        revoked_at = revocations.revoked_at(payload["jti"])
+        if revoked_at is not None and time.time() - revoked_at <= settings.refresh_reuse_grace_seconds:
+            # Another tab (or a concurrent request) rotated it moments ago: hand out a twin of its pair
+            return email, create_token_pair(email, family, successor)
+        # Rotated a while ago: someone else holds this token, so end the whole session
+        logger.warning("Refresh token reuse for %s; revoking its family", email)
+        revocations.revoke(family, _family_expiry())
+        raise TokenError("token reused")
+    return email, create_token_pair(email, family, successor)
+
+def revoke_session(refresh_token: str):
+    """Log out: revoke every token issued from the same login. Invalid tokens are ignored."""
+    settings = get_settings()
+    try:
+        payload = jwt.decode(refresh_token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return
+    if payload.get("fam"):
+        revocations.revoke(payload["fam"], _family_expiry())
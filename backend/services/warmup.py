@@ -0,0 +1,89 @@
+"""
+Warm-up run when a worker starts, so the first requests after a deploy don't
+pay the cold costs: building the question bank index, the ranking candidate
+pool and the chat retrieval index, rendering catalog payloads, compiling the
+hot SQL statements, and loading recently active users into the auth and
+recommendation caches.
+
+Each step is timed and a failing step is logged and skipped: a worker with a
+cold cache still serves correctly, just slower.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+def recently_active_users(db: Session, days: int, limit: int) -> List[int]:
+    """Ids of the users with the most recent quiz attempts or completed subtopics, newest first"""
+    since = datetime.utcnow() - timedelta(days=days)
+    last_seen: Dict[int, datetime] = {}
+    for column, user_column in (
+        (models.QuizAttempt.created_at, models.QuizAttempt.user_id),
+        (models.SubtopicProgress.completed_at, models.SubtopicProgress.user_id),
+    ):
+        rows = db.query(user_column, func.max(column)).filter(column >= since).group_by(user_column) \
+            .order_by(func.max(column).desc()).limit(limit)
+        for user_id, seen in rows:
+            if seen > last_seen.get(user_id, datetime.min):
+                last_seen[user_id] = seen
+    return sorted(last_seen, key=last_seen.get, reverse=True)[:limit]
+
+def compile_statements(db: Session):
+    """
+    Run the hot read queries once against ids that match nothing. SQLAlchemy
+    caches each statement's compiled SQL by its shape, so real requests skip
+    compilation; nothing is cached in application caches.
+    """
+    import queries
+    from services.ranking import load_user_state
+
+    for statement, params in queries.WARMUP:
+        db.execute(statement, params).all()
+    load_user_state(db, 0)
+
+def preload_users(db: Session, user_ids: List[int]):
+    from routers.auth import cache_user
+    from services.recommendation import prime_recommendation_cache
+
+    for user in db.query(models.User).filter(models.User.id.in_(user_ids)):
+        cache_user(db, user)
+    prime_recommendation_cache(db, user_ids)
+
+def run_warmup(active_users: int = 0, active_days: int = 7) -> Dict[str, float]:
+    """Run every warm-up step; returns milliseconds per step"""
+    from routers.assessment import questions_by_topic
+    from services.catalog import catalog
+    from services.ranking import get_pool
+    from services.retrieval import get_index
+
+    db = SessionLocal()
+    steps: List[tuple] = [
+        ("question_index", questions_by_topic),
+        ("ranking_pool", get_pool),
+        ("retrieval_index", get_index),
+        ("catalog", catalog.prerender),
+        ("sql_statements", lambda: compile_statements(db)),
+    ]
+    if active_users > 0:
+        steps.append(("active_users", lambda: preload_users(db, recently_active_users(db, active_days, active_users))))
+
+    timings: Dict[str, float] = {}
+    try:
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception("Warm-up step %s failed", name)
+                db.rollback()
+                continue
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    finally:
+        db.close()
+    return timings
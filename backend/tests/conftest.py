@@ -0,0 +1,66 @@
+"""
+Shared test setup: a throwaway SQLite database and retrieval index, and the
+backend on sys.path.
+
+Settings are read at import time, so the environment is set before any
+backend module is imported.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DB_DIR = tempfile.mkdtemp(prefix="zerotoone-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["CACHE_BACKEND"] = "local"
+os.environ["RETRIEVAL_INDEX_DIR"] = os.path.join(_DB_DIR, "retrieval_index")
+os.environ["GEMINI_API_KEY"] = ""
+sys.path.insert(0, BACKEND_DIR)
+
+import pytest  # noqa: E402
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    import migrate
+    from database import engine
+    migrate.upgrade(engine)
+    yield engine
+    engine.dispose()
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+@pytest.fixture
+def db(database):
+    from database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def make_user(db):
+    """Create users with unique emails; the database is shared by the whole run"""
+    import uuid
+    from models import User
+
+    def make(**fields):
+        user = User(email=f"{uuid.uuid4().hex[:12]}@example.com", name="Test User", hashed_password="x", **fields)
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def auth_headers():
+    from services.tokens import create_token_pair
+
+    def headers(user):
+        return {"Authorization": f"Bearer {create_token_pair(user.email)['token']}"}
+    return headers
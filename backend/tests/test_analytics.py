@@ -0,0 +1,84 @@
+from datetime import date, datetime
+import pytest
+import models
+from services.analytics import mastery_bucket, rebuild_summaries, record_quiz_attempt
+
+# Days no other test writes to, since the database is shared by the whole run
+DAYS = [date(2001, 1, 1), date(2001, 1, 2)]
+
+def attempt(day, mastery, report):
+    return models.QuizAttempt(
+        created_at=datetime.combine(day, datetime.min.time()),
+        topic_mastery=[{"topic": topic, "mastery": m, "correct": c, "total": t} for topic, m, c, t in mastery],
+        detailed_report=[{"id": qid, **flags} for qid, flags in report],
+    )
+
+ATTEMPTS = [
+    attempt(DAYS[0], [("Arrays & Strings", 0.5, 1, 2), ("Linked Lists", 1.0, 1, 1)],
+            [(1, {"is_correct": True}), (2, {"is_correct": False})]),
+    attempt(DAYS[0], [("Arrays & Strings", 0.55, 1, 2), ("Graphs", 0.0, 0, 0)],
+            [(1, {"is_correct": False}), (2, {"is_skipped": True, "is_correct": None})]),
+    attempt(DAYS[1], [("Arrays & Strings", 1.0, 2, 2)], [(1, {"is_correct": True})]),
+]
+
+def summaries(db):
+    topic = models.TopicDailyStats
+    question = models.QuestionDailyStats
+    return (
+        {(r.day, r.topic_id, r.bucket): (r.attempts, r.answered, r.correct, pytest.approx(r.mastery_sum))
+         for r in db.query(topic).filter(topic.day.in_(DAYS))},
+        {(r.day, r.question_id): (r.attempts, r.correct, r.skipped)
+         for r in db.query(question).filter(question.day.in_(DAYS))},
+    )
+
+def record(db, user, attempts):
+    for a in attempts:
+        row = models.QuizAttempt(user_id=user.id, created_at=a.created_at,
+                                 topic_mastery=a.topic_mastery, detailed_report=a.detailed_report)
+        db.add(row)
+        record_quiz_attempt(db, row)
+    db.commit()
+
+def clear(db):
+    db.query(models.TopicDailyStats).filter(models.TopicDailyStats.day.in_(DAYS)).delete()
+    db.query(models.QuestionDailyStats).filter(models.QuestionDailyStats.day.in_(DAYS)).delete()
+    db.query(models.QuizAttempt).filter(models.QuizAttempt.created_at < datetime(2002, 1, 1)).delete()
+    db.commit()
+
+EXPECTED = (
+    {
+        (DAYS[0], 1, 5): (2, 4, 2, pytest.approx(1.05)),  # both Arrays attempts land in the 50-60% bucket
+        (DAYS[0], 2, 9): (1, 1, 1, pytest.approx(1.0)),
+        (DAYS[1], 1, 9): (1, 2, 2, pytest.approx(1.0)),
+    },
+    {
+        (DAYS[0], 1): (2, 1, 0),
+        (DAYS[0], 2): (1, 0, 1),
+        (DAYS[1], 1): (1, 1, 0),
+    },
+)
+
+@pytest.fixture
+def fresh(db):
+    clear(db)
+    yield db
+    clear(db)
+
+def test_mastery_buckets():
+    assert [mastery_bucket(m) for m in (0.0, 0.09, 0.1, 0.55, 0.99, 1.0, 1.5, -0.2)] == [0, 0, 1, 5, 9, 9, 9, 0]
+
+def test_attempts_accumulate_onto_daily_rows(fresh, make_user):
+    record(fresh, make_user(), ATTEMPTS)
+    assert summaries(fresh) == EXPECTED
+
+def test_rebuild_matches_incremental_recording(fresh, make_user):
+    record(fresh, make_user(), ATTEMPTS)
+    incremental = summaries(fresh)
+    assert rebuild_summaries(fresh, batch_size=2) >= len(ATTEMPTS)
+    assert summaries(fresh) == incremental
+
+def test_other_dialects_read_modify_write(fresh, make_user, monkeypatch):
+    monkeypatch.setattr(fresh.get_bind().dialect, "name", "other")
+    record(fresh, make_user(), ATTEMPTS)
+    monkeypatch.undo()
+    assert summaries(fresh) == EXPECTED
@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+from main import app
+from routers.assessment import QUESTION_BANK
+
+def test_topic_questions_come_from_the_bank():
+    # These endpoints used to read an undefined SAMPLE_QUESTIONS and failed with 500
+    with TestClient(app) as client:
+        response = client.get("/api/assessment/topic/1")
+    assert response.status_code == 200
+    expected = [q["id"] for q in QUESTION_BANK if q["topic_id"] == 1]
+    assert [q["id"] for q in response.json()["questions"]] == expected
+
+def test_reassess_draws_one_question_per_topic():
+    with TestClient(app) as client:
+        response = client.get("/api/assessment/reassess")
+    assert response.status_code == 200
+    topics = [q["topic_id"] for q in response.json()["questions"]]
+    assert sorted(topics) == sorted({q["topic_id"] for q in QUESTION_BANK})
@@ -0,0 +1,93 @@
+import pytest
+from cache import LocalBus, SharedCache, SQLiteBus
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two caches in separate "workers" sharing one SQLite bus file"""
+    path = str(tmp_path / "bus.db")
+    buses = [SQLiteBus(path), SQLiteBus(path)]
+    yield [(SharedCache(bus), bus) for bus in buses]
+    for bus in buses:
+        bus.close()
+
+def test_get_and_set_stay_local(workers):
+    (first, _), (second, bus) = workers
+    first.set("auth", "a@example.com", "row")
+    bus.poll()
+    assert first.get("auth", "a@example.com") == "row"
+    assert second.get("auth", "a@example.com") is None
+
+def test_invalidating_a_key_reaches_other_workers(workers):
+    (first, _), (second, bus) = workers
+    for cache in (first, second):
+        cache.set("recs", 1, "one")
+        cache.set("recs", 2, "two")
+    first.invalidate("recs", 1)
+    assert first.get("recs", 1) is None
+    assert second.get("recs", 1) == "one"  # not delivered yet
+    bus.poll()
+    assert second.get("recs", 1) is None
+    assert second.get("recs", 2) == "two"
+
+def test_keys_are_matched_by_their_text(workers):
+    # Keys cross the bus as text, so an int key is dropped by its string form
+    (first, _), (second, bus) = workers
+    second.set("recs", 7, "seven")
+    first.invalidate("recs", "7")
+    bus.poll()
+    assert second.get("recs", 7) is None
+
+def test_invalidating_a_namespace_leaves_the_others(workers):
+    (first, _), (second, bus) = workers
+    second.set("recs", 1, "one")
+    second.set("recs", 2, "two")
+    second.set("auth", 1, "user")
+    first.invalidate("recs")
+    bus.poll()
+    assert second.get("recs", 1) is None and second.get("recs", 2) is None
+    assert second.get("auth", 1) == "user"
+
+def test_own_messages_are_ignored():
+    bus = LocalBus()
+    cache = SharedCache(bus)
+    received = []
+    bus.subscribe("cache-invalidate", received.append)
+    cache.set("recs", 1, "one")
+    cache.invalidate("recs", 1)
+    cache.set("recs", 1, "fresh")
+    # Echoing our own message back must not drop the value set since
+    cache._on_message(received[0])
+    assert cache.get("recs", 1) == "fresh"
+
+def test_entries_expire(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: clock[0])
+    cache = SharedCache(LocalBus(), ttl=10)
+    cache.set("recs", 1, "one")
+    cache.set("recs", 2, "two", ttl=60)
+    clock[0] += 11
+    assert cache.get("recs", 1) is None
+    assert cache.get("recs", 2) == "two"
+    assert cache._keys == {"recs": {"2": {2}}}
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SharedCache(LocalBus(), max_entries=2)
+    cache.set("recs", 1, "one")
+    cache.set("recs", 2, "two")
+    cache.get("recs", 1)
+    cache.set("recs", 3, "three")
+    assert cache.get("recs", 2) is None
+    assert cache.get("recs", 1) == "one" and cache.get("recs", 3) == "three"
+    # The key index follows evictions, so it can't grow without bound
+    assert cache._keys == {"recs": {"1": {1}, "3": {3}}}
+
+def test_bus_only_delivers_messages_published_after_start(tmp_path):
+    path = str(tmp_path / "bus.db")
+    early = SQLiteBus(path)
+    early.publish("channel", "before")
+    late = SQLiteBus(path)
+    received = []
+    late.subscribe("channel", received.append)
+    early.publish("channel", "after")
+    late.poll()
+    assert received == ["after"]
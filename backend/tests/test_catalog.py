@@ -0,0 +1,51 @@
+import gzip
+import pytest
+from routers.topics import DEFAULT_TOPICS, TopicList
+from services.catalog import CatalogPayload, _accepts, _etag_matches, brotli
+
+@pytest.mark.parametrize("header", [
+    '"abc123"',
+    'W/"abc123"',
+    '"abc123-br"',
+    '"other", "abc123-gzip"',
+    "*",
+])
+def test_if_none_match_revalidates_any_encoding(header):
+    assert _etag_matches(header, "abc123")
+
+@pytest.mark.parametrize("header", ['"abc12"', '"xabc123"', '"other"', ""])
+def test_if_none_match_other_tags(header):
+    assert not _etag_matches(header, "abc123")
+
+def test_accept_encoding_honours_q_zero():
+    assert _accepts("gzip, br", "br")
+    assert _accepts("br;q=0.5", "br")
+    assert not _accepts("br;q=0, gzip", "br")
+    assert not _accepts("gzip", "br")
+
+def test_payload_precompresses_large_bodies_only():
+    small = CatalogPayload(b"{}")
+    assert small.gzip is None and small.br is None
+    large = CatalogPayload.from_content({"items": list(range(500))})
+    assert gzip.decompress(large.gzip) == large.body
+    if brotli is not None:
+        assert brotli.decompress(large.br) == large.body
+
+def test_topics_revalidate_with_any_encodings_etag(client):
+    first = client.get("/api/topics", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["Vary"]
+    etag = first.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    again = client.get("/api/topics", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+def test_topics_payload_matches_the_documented_model(client):
+    body = client.get("/api/topics", headers={"Accept-Encoding": "identity"}).json()
+    assert TopicList.validate_python(body)
+    assert [t["id"] for t in body] == sorted(t["id"] for t in DEFAULT_TOPICS)
+    schema = client.get("/openapi.json").json()["paths"]["/api/topics"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"]["items"]["$ref"].endswith("/TopicResponse")
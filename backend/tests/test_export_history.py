@@ -0,0 +1,71 @@
+import os
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, func, insert, select
+import models
+from export_history import GAP_RETENTION_SECONDS, IdWatermark, drop_unrecorded_parts, export
+
+def exported(mark, ids):
+    for row_id in ids:
+        mark.observe(row_id)
+
+def test_gaps_stay_pending_until_their_rows_appear():
+    mark = IdWatermark()
+    exported(mark, [1, 2, 5, 6, 9])
+    mark.advance(now=1000)
+    assert mark.to_state() == {"last_id": 9, "gaps": [[3, 4, 1000], [7, 8, 1000]]}
+
+    exported(mark, [4, 10])  # 4 committed late; 3, 7 and 8 are still in flight
+    mark.advance(now=2000)
+    assert mark.to_state() == {"last_id": 10, "gaps": [[3, 3, 1000], [7, 8, 1000]]}
+
+    mark.advance(now=1000 + GAP_RETENTION_SECONDS)  # rolled back, presumably
+    assert mark.to_state() == {"last_id": 10, "gaps": []}
+
+def test_state_round_trips_and_reads_the_old_format():
+    mark = IdWatermark.from_state({"last_id": 9, "gaps": [[3, 4, 1000]]})
+    assert IdWatermark.from_state(mark.to_state()).to_state() == mark.to_state()
+    assert IdWatermark.from_state(42).to_state() == {"last_id": 42, "gaps": []}
+
+def test_pending_selects_new_rows_and_gaps():
+    engine = create_engine("sqlite://")
+    table = Table("t", MetaData(), Column("id", Integer, primary_key=True))
+    table.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(table), [{"id": i} for i in range(1, 13)])
+        mark = IdWatermark.from_state({"last_id": 9, "gaps": [[3, 4, 0], [7, 7, 0]]})
+        ids = conn.execute(select(table.c.id).where(mark.pending(table.c.id)).order_by(table.c.id)).scalars().all()
+    assert ids == [3, 4, 7, 10, 11, 12]
+
+def test_only_parts_of_later_runs_are_dropped(tmp_path):
+    directory = tmp_path / "quiz_attempts"
+    directory.mkdir()
+    for name in ("part-000001.parquet", "part-000002.parquet", "part-000003.parquet", "_current.parquet", "notes.txt"):
+        (directory / name).write_text("")
+    drop_unrecorded_parts(str(tmp_path), "quiz_attempts", 1)
+    assert sorted(os.listdir(directory)) == ["_current.parquet", "notes.txt", "part-000001.parquet"]
+
+def test_late_commits_are_exported_by_the_next_run(tmp_path, db, make_user):
+    pq = pytest.importorskip("pyarrow.parquet")
+    user = make_user()
+    out = str(tmp_path)
+    top = (db.query(func.max(models.QuizAttempt.id)).scalar() or 0) + 100
+
+    def add(attempt_id):
+        db.add(models.QuizAttempt(id=attempt_id, user_id=user.id, topic_mastery=[], detailed_report=[]))
+        db.commit()
+
+    def exported_ids():
+        table = pq.read_table(os.path.join(out, "quiz_attempts"))
+        return table.column("id").to_pylist()
+
+    add(top)
+    first = export(out)
+    assert first["quiz_attempts"]["last_id"] == top
+    add(top - 1)  # its transaction took the id earlier but committed after the export read
+    add(top + 1)
+    export(out)
+    ids = exported_ids()
+    assert len(ids) == len(set(ids))
+    assert {top - 1, top, top + 1} <= set(ids)
+    export(out)
+    assert sorted(exported_ids()) == sorted(ids)  # nothing new, nothing written twice
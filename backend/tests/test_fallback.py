@@ -0,0 +1,42 @@
+from routers.chat import ChatRequest, offline_reply
+from services.fallback import DEFAULT_ANSWER, FAQ, answer_offline, match_faq
+
+def faq_answer(topic_id):
+    return next(answer for _, faq_topic, answer in FAQ if faq_topic == topic_id)
+
+def test_match_faq_picks_the_matching_entry():
+    assert match_faq("How does a linked list detect a cycle?") == FAQ[2][2]
+
+def test_match_faq_prefers_multi_word_keywords():
+    # "two pointers" outweighs the single word "array"
+    assert match_faq("When should I use two pointers on an array?") == FAQ[1][2]
+
+def test_match_faq_breaks_ties_toward_the_current_topic():
+    assert match_faq("tree or graph?", topic_id=6) == faq_answer(6)
+    assert match_faq("tree or graph?", topic_id=5) == faq_answer(5)
+
+def test_match_faq_ignores_case_and_punctuation():
+    assert match_faq("BFS?!") == faq_answer(6)
+
+def test_match_faq_needs_whole_words():
+    assert match_faq("the arrayed sortie") is None
+
+def test_answer_offline_cites_the_notes_it_used():
+    text, chunks = answer_offline("Explain binary search tree traversal", topic_id=5)
+    assert text.startswith("*The AI tutor is unavailable right now")
+    assert faq_answer(5) in text
+    assert chunks
+    for chunk in chunks:
+        assert f"**{chunk['title']}**" in text
+
+def test_answer_offline_falls_back_to_the_default_answer():
+    text, chunks = answer_offline("zzqx", topic_id=None)
+    assert chunks == []
+    assert DEFAULT_ANSWER in text
+
+def test_offline_reply_is_flagged_degraded():
+    reply = offline_reply(ChatRequest(message="What is dynamic programming memoization?", topic_id=8), "timeout")
+    assert reply.degraded is True
+    assert reply.source_ids
+    assert len(reply.source_ids) == len(set(reply.source_ids))
+    assert len(reply.sources) == len(reply.source_ids)
@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from models import UserNote
+from routers.notes import TextEdit, apply_edits, note_etag, parse_if_match
+from services.rendering import render_markdown
+
+def add_notes(db, user, count, topic_id=1, updated_at=None):
+    """Notes whose updated_at steps back a minute each, unless one timestamp is given for all"""
+    now = datetime.utcnow()
+    notes = [
+        UserNote(user_id=user.id, topic_id=topic_id, content=f"note {i}", content_html="",
+                 updated_at=updated_at or now - timedelta(minutes=i))
+        for i in range(count)
+    ]
+    db.add_all(notes)
+    db.commit()
+    return notes
+
+def list_all(client, headers, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/notes/mine", params=query, headers=headers).json()
+        ids.extend(n["id"] for n in body["notes"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+def test_pages_walk_every_note_once_newest_first(client, db, make_user, auth_headers):
+    user = make_user()
+    notes = add_notes(db, user, 7)
+    ids, pages = list_all(client, auth_headers(user), limit=3)
+    assert ids == [n.id for n in notes]
+    assert pages == 3
+
+def test_ties_on_updated_at_are_broken_by_id(client, db, make_user, auth_headers):
+    user = make_user()
+    notes = add_notes(db, user, 5, updated_at=datetime(2026, 1, 1))
+    ids, _ = list_all(client, auth_headers(user), limit=2)
+    assert ids == sorted((n.id for n in notes), reverse=True)
+
+def test_inserts_between_pages_do_not_shift_the_cursor(client, db, make_user, auth_headers):
+    user = make_user()
+    notes = add_notes(db, user, 4)
+    headers = auth_headers(user)
+    first = client.get("/api/notes/mine", params={"limit": 2}, headers=headers).json()
+    add_notes(db, user, 1)  # newer than everything listed so far
+    second = client.get("/api/notes/mine", params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert [n["id"] for n in first["notes"] + second["notes"]] == [n.id for n in notes]
+
+def test_listing_filters_by_owner_and_topic(client, db, make_user, auth_headers):
+    user, other = make_user(), make_user()
+    wanted = add_notes(db, user, 2, topic_id=1)
+    add_notes(db, user, 2, topic_id=6)
+    add_notes(db, other, 2, topic_id=1)
+    ids, _ = list_all(client, auth_headers(user), limit=10, topic_id=1)
+    assert sorted(ids) == sorted(n.id for n in wanted)
+
+def test_bad_cursor_is_rejected(client, make_user, auth_headers):
+    response = client.get("/api/notes/mine", params={"cursor": "not-a-cursor"}, headers=auth_headers(make_user()))
+    assert response.status_code == 400
+
+def test_notes_are_rendered_on_write(client, make_user, auth_headers):
+    headers = auth_headers(make_user())
+    created = client.post("/api/notes", json={"topic_id": 1, "content": "# Heaps\n\n**min** first"}, headers=headers).json()
+    assert "<h1>Heaps</h1>" in created["content_html"]
+    assert "<strong>min</strong>" in created["content_html"]
+    updated = client.put(f"/api/notes/{created['id']}", json={"content": "plain"}, headers=headers).json()
+    assert updated["content_html"] == "<p>plain</p>\n"
+
+@pytest.mark.parametrize("markdown, forbidden", [
+    ("<script>alert(1)</script>", "<script>"),
+    ("[x](javascript:alert(1))", "href"),
+    ("[x](vbscript:msgbox)", "href"),
+])
+def test_rendering_drops_script_capable_markup(markdown, forbidden):
+    assert forbidden not in render_markdown(markdown)
+
+def edit(start, end, text=""):
+    return TextEdit(start=start, end=end, text=text)
+
+def test_apply_edits_replaces_ranges_against_the_base():
+    # Both offsets refer to the original text, whatever order the edits arrive in
+    assert apply_edits("hello world", [edit(6, 11, "there"), edit(0, 5, "hi")]) == "hi there"
+
+def test_apply_edits_inserts_and_deletes():
+    assert apply_edits("abc", [edit(1, 1, "X")]) == "aXbc"
+    assert apply_edits("abc", [edit(1, 2)]) == "ac"
+    assert apply_edits("abc", [edit(3, 3, "!")]) == "abc!"
+
+def test_apply_edits_counts_utf16_code_units():
+    # The emoji is one code point but two UTF-16 units, as in a JavaScript string
+    content = "a😀b"
+    assert apply_edits(content, [edit(3, 4, "c")]) == "a😀c"
+    assert apply_edits(content, [edit(1, 3, "x")]) == "axb"
+    assert apply_edits("नमस्ते", [edit(1, 6, "मो")]) == "नमो"
+
+@pytest.mark.parametrize("edits", [
+    [edit(0, 5)],                   # past the end
+    [edit(2, 1)],                   # end before start
+    [edit(0, 2), edit(1, 3)],       # overlapping
+])
+def test_apply_edits_rejects_bad_ranges(edits):
+    with pytest.raises(HTTPException) as error:
+        apply_edits("abc", edits)
+    assert error.value.status_code == 422
+
+def test_apply_edits_rejects_splitting_a_surrogate_pair():
+    with pytest.raises(HTTPException) as error:
+        apply_edits("a😀b", [edit(2, 2, "x")])
+    assert error.value.status_code == 422
+
+def test_etag_round_trips_through_if_match():
+    etag = note_etag(UserNote(id=7, version=3))
+    assert etag == '"7.3"'
+    assert parse_if_match(etag) == 3
+    assert parse_if_match(f"W/{etag}") == 3
+    assert parse_if_match(f" {etag} ") == 3
+
+@pytest.mark.parametrize("header", [None, "*", " * "])
+def test_if_match_without_a_version(header):
+    assert parse_if_match(header) is None
+
+@pytest.mark.parametrize("header", ['"7"', '"7.x"', "garbage"])
+def test_if_match_rejects_unknown_tags(header):
+    with pytest.raises(HTTPException) as error:
+        parse_if_match(header)
+    assert error.value.status_code == 412
+
+@pytest.fixture
+def note(client, make_user, auth_headers):
+    headers = auth_headers(make_user())
+    created = client.post("/api/notes", json={"topic_id": 1, "content": "hello world"}, headers=headers)
+    return created.json(), created.headers["ETag"], headers
+
+def test_patch_applies_edits_and_bumps_the_version(client, note):
+    created, etag, headers = note
+    response = client.patch(f"/api/notes/{created['id']}", json={"edits": [{"start": 0, "end": 5, "text": "hi"}]},
+                            headers={**headers, "If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["content"] == "hi world"
+    assert response.json()["version"] == created["version"] + 1
+    assert response.headers["ETag"] != etag
+
+def test_patch_against_a_stale_version_returns_the_current_note(client, note):
+    created, etag, headers = note
+    client.put(f"/api/notes/{created['id']}", json={"content": "changed elsewhere"}, headers=headers)
+    response = client.patch(f"/api/notes/{created['id']}",
+                            json={"base_version": created["version"], "edits": [{"start": 0, "end": 0, "text": "x"}]},
+                            headers=headers)
+    assert response.status_code == 412
+    current = response.json()["detail"]["current"]
+    assert current["content"] == "changed elsewhere"
+    assert response.headers["ETag"] == note_etag(UserNote(id=created["id"], version=current["version"]))
+
+def test_patch_without_a_base_version_is_refused(client, note):
+    created, _, headers = note
+    response = client.patch(f"/api/notes/{created['id']}", json={"edits": []}, headers=headers)
+    assert response.status_code == 428
+
+def test_put_and_delete_honour_if_match(client, note):
+    created, etag, headers = note
+    updated = client.put(f"/api/notes/{created['id']}", json={"content": "v2"}, headers={**headers, "If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["version"] == created["version"] + 1
+    stale = client.put(f"/api/notes/{created['id']}", json={"content": "v3"}, headers={**headers, "If-Match": etag})
+    assert stale.status_code == 412
+    assert client.delete(f"/api/notes/{created['id']}", headers={**headers, "If-Match": etag}).status_code == 412
+    fresh = updated.headers["ETag"]
+    assert client.delete(f"/api/notes/{created['id']}", headers={**headers, "If-Match": fresh}).status_code == 200
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import models
+from config import get_settings
+from services.ranking import RECENT_ATTEMPTS, UserState, get_pool, load_user_state, load_user_states, rank
+
+NOW = datetime(2026, 6, 1)
+
+def add_attempt(db, user, days_ago, mastery, correct_ids=()):
+    db.add(models.QuizAttempt(
+        user_id=user.id, created_at=NOW - timedelta(days=days_ago),
+        topic_mastery=[{"topic": topic, "mastery": value, "correct": 1, "total": 2} for topic, value in mastery.items()],
+        detailed_report=[{"id": qid, "is_correct": True} for qid in correct_ids],
+    ))
+
+def add_progress(db, user, subtopic_id, days_ago):
+    db.add(models.SubtopicProgress(user_id=user.id, subtopic_id=subtopic_id, completed=True,
+                                   completed_at=NOW - timedelta(days=days_ago)))
+
+def test_batch_load_matches_single_user_loads(db, make_user):
+    first, second, idle = make_user(), make_user(), make_user()
+    add_attempt(db, first, 3, {"Arrays & Strings": 0.2}, correct_ids=[1])
+    add_attempt(db, first, 1, {"Arrays & Strings": 0.9, "Linked Lists": 0.4}, correct_ids=[2])
+    add_progress(db, first, 1, 0)
+    add_attempt(db, second, 2, {"Sorting": 0.7})
+    db.commit()
+
+    states = load_user_states(db, [first.id, second.id, idle.id])
+    for user in (first, second, idle):
+        single = load_user_state(db, user.id)
+        assert vars(states[user.id]) == vars(single)
+
+    state = states[first.id]
+    assert state.mastery == {1: 0.9, 2: 0.4}  # the newest attempt wins
+    assert states[second.id].mastery == {7: 0.7}  # question bank topic names map to roadmap ids
+    assert state.completed_subtopics == {1}
+    assert state.correct_questions == {1, 2}
+    assert state.last_active[1] == NOW  # the subtopic completion is newer than either attempt
+    assert vars(states[idle.id]) == vars(UserState(idle.id))
+
+def test_only_recent_attempts_are_read(db, make_user):
+    user = make_user()
+    add_attempt(db, user, 100, {"Graphs": 0.1}, correct_ids=[99])
+    for day in range(RECENT_ATTEMPTS):
+        add_attempt(db, user, day, {"Arrays & Strings": 0.5})
+    db.commit()
+    state = load_user_state(db, user.id)
+    assert 6 not in state.mastery
+    assert 99 not in state.correct_questions
+
+def test_rank_skips_finished_work_and_diversifies():
+    pool = get_pool()
+    completed = {sid for sid, row in pool.subtopic_row.items() if pool.topic_ids[pool.subtopic_topic[row]] == 1}
+    correct = {item["content_id"] for item in pool.items if item["type"] == "question" and item["topic_id"] == 1}
+    state = UserState(1, mastery={1: 1.0}, completed_subtopics=completed, correct_questions=correct)
+
+    ranked = rank(state, 6, now=NOW)
+    assert len(ranked) == 6
+    assert [r["priority"] for r in ranked] == [5, 4, 3, 2, 1, 1]
+    seen = [(r["type"], r["topic_id"]) for r in ranked]
+    assert len(seen) == len(set(seen))
+    for r in ranked:
+        assert not (r["type"] == "topic_focus" and r["content_id"] in completed)
+        assert not (r["type"] == "question" and r["content_id"] in correct)
+    max_per_type = get_settings().recommendation_max_per_type
+    assert all(sum(1 for r in ranked if r["type"] == kind) <= max_per_type for kind in {r["type"] for r in ranked})
+
+def test_weak_topics_rank_first_with_a_reason():
+    ranked = rank(UserState(1, mastery={1: 0.2, 2: 0.95}), 6, now=NOW)
+    top = ranked[0]
+    assert top["topic_id"] == 1
+    practice = [r for r in ranked if r["topic_id"] == 1 and r["type"] in ("question", "problem")]
+    assert practice and practice[0]["description"].startswith("You scored 20% on Arrays & Strings")
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+import ratelimit
+from ratelimit import InMemoryBucketStore, RateLimit, SingleFlight, SQLiteBucketStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / "buckets.db"))
+
+def test_bucket_allows_a_burst_then_waits(store):
+    assert [store.take("k", 3, 1.0, now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("k", 3, 1.0, now=100.0) == 1.0
+
+def test_bucket_refills_over_time(store):
+    for _ in range(2):
+        store.take("k", 2, 0.5, now=0.0)
+    assert store.take("k", 2, 0.5, now=1.0) == 1.0  # half a token back, half still missing at 0.5/s
+    assert store.take("k", 2, 0.5, now=3.0) == 0.0
+
+def test_bucket_never_exceeds_capacity(store):
+    store.take("k", 2, 1.0, now=0.0)
+    assert store.take("k", 2, 1.0, now=1000.0) == 0.0
+    assert store.take("k", 2, 1.0, now=1000.0) == 0.0
+    assert store.take("k", 2, 1.0, now=1000.0) > 0
+
+def test_buckets_are_per_key(store):
+    store.take(("chat", "user:1"), 1, 1.0, now=0.0)
+    assert store.take(("chat", "user:1"), 1, 1.0, now=0.0) > 0
+    assert store.take(("chat", "user:2"), 1, 1.0, now=0.0) == 0.0
+
+def test_prune_drops_only_full_buckets():
+    store = InMemoryBucketStore(max_keys=2)
+    store.take("old", 1, 1.0, now=0.0)
+    store.take("recent", 1, 1.0, now=9.5)
+    store.take("new", 1, 1.0, now=10.0)
+    assert set(store._buckets) == {"recent", "new"}
+
+def test_sqlite_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    assert first.take("k", 1, 1.0, now=0.0) == 0.0
+    assert second.take("k", 1, 1.0, now=0.0) == 1.0
+
+def test_rate_limit_rejects_with_retry_after(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_bucket_store", InMemoryBucketStore())
+    app = FastAPI()
+
+    @app.get("/limited", dependencies=[Depends(RateLimit("test", capacity=2, per_minute=6))])
+    def limited():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert [client.get("/limited").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/limited")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 10
+
+def test_single_flight_shares_one_computation():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+        return results, flight.inflight()
+
+    results, inflight = asyncio.run(main())
+    assert results == [1] * 5
+    assert calls == 1
+    assert inflight == 0
+
+def test_single_flight_shares_errors_and_forgets_them():
+    flight = SingleFlight("test")
+    attempts = 0
+
+    async def fail():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # A later call starts a fresh computation
+        with pytest.raises(RuntimeError):
+            await flight.do("key", fail)
+
+    asyncio.run(main())
+    assert attempts == 2
+
+def test_cancelled_waiter_does_not_cancel_the_shared_work():
+    flight = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+import pytest
+import models
+from cache import cache
+from services.recommendation import CACHE_NAMESPACE, RECOMMENDATION_LIMIT, RecommendationService
+
+def add_recommendation(db, user, **fields):
+    defaults = {"type": "question", "title": "Practice", "description": "", "source": "rule_based", "priority": 1}
+    rec = models.Recommendation(user_id=user.id, **{**defaults, **fields})
+    db.add(rec)
+    db.commit()
+    return rec
+
+def test_reads_are_cached_until_invalidated(db, make_user):
+    user = make_user()
+    service = RecommendationService(db, user.id)
+    first = add_recommendation(db, user)
+    assert [r["id"] for r in service.get_user_recommendations()] == [first.id]
+
+    add_recommendation(db, user)  # written behind the cache's back
+    assert [r["id"] for r in service.get_user_recommendations()] == [first.id]
+    cache.invalidate(CACHE_NAMESPACE, user.id)
+    assert len(service.get_user_recommendations()) == 2
+
+def test_completing_invalidates(db, make_user):
+    user = make_user()
+    service = RecommendationService(db, user.id)
+    rec = add_recommendation(db, user)
+    assert service.get_user_recommendations()
+    assert service.complete_recommendation(rec.id)
+    assert service.get_user_recommendations() == []
+    assert not service.complete_recommendation(rec.id + 10_000)
+
+def test_expired_entries_are_dropped_from_a_cached_read(db, make_user):
+    user = make_user()
+    service = RecommendationService(db, user.id)
+    now = datetime.utcnow()
+    cache.set(CACHE_NAMESPACE, user.id, (
+        {"id": 1, "expires_at": now - timedelta(seconds=1)},
+        {"id": 2, "expires_at": now + timedelta(hours=1)},
+        {"id": 3, "expires_at": None},
+    ))
+    assert [r["id"] for r in service.get_user_recommendations()] == [2, 3]
+
+def test_regeneration_caches_what_a_read_would_return(db, make_user):
+    user = make_user()
+    add_recommendation(db, user, title="stale")
+    service = RecommendationService(db, user.id)
+    service.generate_daily_recommendations()
+    cached = cache.get(CACHE_NAMESPACE, user.id)
+    assert cached is not None and len(cached) == RECOMMENDATION_LIMIT
+    assert "stale" not in [r["title"] for r in cached]
+
+    cache.invalidate(CACHE_NAMESPACE, user.id)
+    assert RecommendationService(db, user.id).get_user_recommendations() == list(cached)
+
+def test_regeneration_broadcasts_before_caching(db, make_user, monkeypatch):
+    # Other workers hold the replaced rows, so the invalidation must go out even though this worker re-caches
+    user = make_user()
+    calls = []
+    monkeypatch.setattr(cache, "invalidate", lambda namespace, key: calls.append(("invalidate", key)))
+    original_set = cache.set
+    monkeypatch.setattr(cache, "set", lambda namespace, key, value: (calls.append(("set", key)), original_set(namespace, key, value)))
+    RecommendationService(db, user.id).generate_daily_recommendations()
+    assert calls == [("invalidate", user.id), ("set", user.id)]
+
+def test_failed_generation_leaves_nothing_cached(db, make_user, monkeypatch):
+    user = make_user()
+    service = RecommendationService(db, user.id)
+    cache.set(CACHE_NAMESPACE, user.id, ())
+
+    def fail(state):
+        raise RuntimeError("ranking failed")
+    monkeypatch.setattr(service, "_recommend_ranked", fail)
+    with pytest.raises(RuntimeError):
+        service.generate_daily_recommendations()
+    assert cache.get(CACHE_NAMESPACE, user.id) is None
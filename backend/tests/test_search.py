@@ -0,0 +1,97 @@
+import pytest
+from models import UserNote
+from services import search as search_service
+from services.search import _CLOSE, _OPEN, _like_snippet, build_match_expression, normalise_scores, render_snippet
+
+def add_note(db, user, content, topic_id=1):
+    note = UserNote(user_id=user.id, topic_id=topic_id, content=content)
+    db.add(note)
+    db.commit()
+    return note
+
+def note_ids(db, user, query, **kwargs):
+    return [hit["id"] for hit in search_service.search_notes(db, user.id, query, **kwargs)]
+
+def test_match_expression_quotes_every_term():
+    assert build_match_expression('binary OR "tree" NOT x') == '"binary" "OR" "tree" "NOT" "x"*'
+    assert build_match_expression("hash* map") == '"hash"* "map"*'
+    assert build_match_expression("  ?! ") is None
+
+def test_triggers_index_inserts_updates_and_deletes(db, make_user):
+    user = make_user()
+    note = add_note(db, user, "Floyd cycle detection uses two pointers")
+    assert note_ids(db, user, "floyd") == [note.id]
+
+    note.content = "Kadane finds the maximum subarray"
+    db.commit()
+    assert note_ids(db, user, "floyd") == []
+    assert note_ids(db, user, "kadane") == [note.id]
+
+    db.delete(note)
+    db.commit()
+    assert note_ids(db, user, "kadane") == []
+
+def test_notes_are_private_and_filter_by_topic(db, make_user):
+    owner, other = make_user(), make_user()
+    arrays = add_note(db, owner, "sliding window practice", topic_id=1)
+    graphs = add_note(db, owner, "sliding window over BFS layers", topic_id=6)
+    add_note(db, other, "sliding window from someone else")
+    assert sorted(note_ids(db, owner, "sliding window")) == sorted([arrays.id, graphs.id])
+    assert note_ids(db, owner, "sliding", topic_id=6) == [graphs.id]
+
+def test_last_term_is_a_prefix_match(db, make_user):
+    user = make_user()
+    note = add_note(db, user, "memoization avoids recomputing subproblems")
+    assert note_ids(db, user, "memo") == [note.id]
+    assert note_ids(db, user, "memoization avoid") == [note.id]
+    assert note_ids(db, user, "memo avoids") == []  # only the last term is a prefix
+    assert note_ids(db, user, "memo* avoids") == [note.id]
+
+def test_hindi_words_are_indexed_whole(db, make_user):
+    user = make_user()
+    note = add_note(db, user, "स्टैक में पुश और पॉप होते हैं")
+    assert note_ids(db, user, "स्टैक") == [note.id]
+
+def test_snippets_escape_note_html(db, make_user):
+    user = make_user()
+    add_note(db, user, "<script>alert(1)</script> heap sort notes")
+    snippet = search_service.search_notes(db, user.id, "heap")[0]["snippet"]
+    assert "<script>" not in snippet
+    assert "&lt;script&gt;" in snippet
+    assert "<mark>heap</mark>" in snippet
+
+def test_catalog_search_finds_topic_content(db):
+    hits = search_service.search_catalog(db, "binary search tree")
+    assert hits
+    assert {"summary", "question", "resource_note", "video"} >= {h["kind"] for h in hits}
+    assert any("<mark>" in h["snippet"] for h in hits)
+
+def test_search_normalises_each_source(db, make_user):
+    user = make_user()
+    add_note(db, user, "recursion needs a base case")
+    result = search_service.search(db, "recursion", user_id=user.id)
+    by_kind = {}
+    for hit in result["hits"]:
+        by_kind.setdefault(hit["kind"] == "note", []).append(hit["score"])
+    assert max(by_kind[True]) == 1.0
+    assert max(by_kind[False]) == 1.0
+
+def test_anonymous_search_skips_notes(db, make_user):
+    user = make_user()
+    add_note(db, user, "recursion secrets")
+    hits = search_service.search(db, "recursion", user_id=None)["hits"]
+    assert hits and all(h["kind"] != "note" for h in hits)
+
+def test_render_snippet_marks_after_escaping():
+    assert render_snippet(f"a < b and {_OPEN}x{_CLOSE} & y") == "a &lt; b and <mark>x</mark> &amp; y"
+
+def test_like_fallback_marks_every_term_like_fts():
+    snippet = _like_snippet("Use a <b>stack</b> or a queue", ["stack", "queue"])
+    assert snippet == "Use a &lt;b&gt;<mark>stack</mark>&lt;/b&gt; or a <mark>queue</mark>"
+
+@pytest.mark.parametrize("scores, expected", [
+    ([4.0, 2.0, 1.0], [1.0, 0.5, 0.25]),
+    ([0.0, 0.0], [0.0, 0.0]),
+])
+def test_normalise_scores(scores, expected):
+    assert [h["score"] for h in normalise_scores([{"score": s} for s in scores])] == expected
@@ -0,0 +1,83 @@
+import pytest
+from config import get_settings
+from services import tokens
+from services.tokens import TokenError, create_token_pair, decode_token, revocations, rotate_refresh_token
+
+settings = get_settings()
+
+def claims(token):
+    return tokens.jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+
+def age_revocation(token):
+    # Pretend the token was rotated before the grace window
+    jti = claims(token)["jti"]
+    revocations._revoked_at[jti] -= settings.refresh_reuse_grace_seconds + 1
+
+def test_rotation_issues_a_new_pair_in_the_same_family():
+    pair = create_token_pair("rotate@example.com")
+    email, rotated = rotate_refresh_token(pair["refresh_token"])
+    assert email == "rotate@example.com"
+    assert claims(rotated["refresh_token"])["fam"] == claims(pair["refresh_token"])["fam"]
+    assert claims(rotated["refresh_token"])["jti"] != claims(pair["refresh_token"])["jti"]
+    assert decode_token(rotated["token"], "access")["sub"] == email
+
+def test_access_token_is_not_a_refresh_token():
+    pair = create_token_pair("types@example.com")
+    with pytest.raises(TokenError):
+        rotate_refresh_token(pair["token"])
+    with pytest.raises(TokenError):
+        decode_token(pair["refresh_token"], "access")
+
+def test_reuse_within_the_grace_window_returns_the_same_successor():
+    pair = create_token_pair("tabs@example.com")
+    _, first = rotate_refresh_token(pair["refresh_token"])
+    _, second = rotate_refresh_token(pair["refresh_token"])
+    assert claims(first["refresh_token"])["jti"] == claims(second["refresh_token"])["jti"]
+    # The twins are one token: only one of them can be rotated
+    rotate_refresh_token(second["refresh_token"])
+    age_revocation(first["refresh_token"])
+    with pytest.raises(TokenError, match="reused"):
+        rotate_refresh_token(first["refresh_token"])
+
+def test_reuse_after_the_grace_window_revokes_the_family():
+    pair = create_token_pair("stolen@example.com")
+    _, rotated = rotate_refresh_token(pair["refresh_token"])
+    age_revocation(pair["refresh_token"])
+    with pytest.raises(TokenError, match="reused"):
+        rotate_refresh_token(pair["refresh_token"])
+    with pytest.raises(TokenError, match="revoked"):
+        decode_token(rotated["token"], "access")
+    with pytest.raises(TokenError, match="revoked"):
+        rotate_refresh_token(rotated["refresh_token"])
+
+def test_lost_race_on_another_worker_still_gets_the_successor():
+    pair = create_token_pair("race@example.com")
+    _, first = rotate_refresh_token(pair["refresh_token"])
+    # This worker hasn't heard about the rotation yet; the database claim tells it
+    jti = claims(pair["refresh_token"])["jti"]
+    revocations._revoked.pop(jti)
+    revocations._revoked_at.pop(jti)
+    _, second = rotate_refresh_token(pair["refresh_token"])
+    assert claims(first["refresh_token"])["jti"] == claims(second["refresh_token"])["jti"]
+
+def test_old_bus_messages_are_understood():
+    revocations._on_message("legacy-id|9999999999")
+    assert revocations.is_revoked("legacy-id")
+    assert revocations.revoked_at("legacy-id") is None
+
+def test_subtopics_use_the_optional_user(client, db, make_user, auth_headers):
+    import models
+    user = make_user()
+    db.add(models.SubtopicProgress(user_id=user.id, subtopic_id=1, completed=True))
+    db.commit()
+
+    def completed(headers):
+        response = client.get("/api/subtopics/1", headers=headers)
+        assert response.status_code == 200
+        return [st["id"] for st in response.json()["subtopics"] if st["completed"]]
+
+    assert completed(auth_headers(user)) == [1]
+    assert completed({}) == []
+    # A refresh token, or any token that isn't a valid access token, reads as anonymous rather than 401
+    refresh = create_token_pair(user.email)["refresh_token"]
+    assert completed({"Authorization": f"Bearer {refresh}"}) == []
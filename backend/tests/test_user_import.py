@@ -0,0 +1,91 @@
+import io
+import uuid
+import bcrypt
+import pytest
+from models import User
+from services.user_import import TooManyRows, import_users, read_csv
+
+def csv_rows(*lines, header="email,name,password,role"):
+    return read_csv(io.StringIO("\n".join([header, *lines]) + "\n"))
+
+def unique(name):
+    return f"{name}-{uuid.uuid4().hex[:8]}@example.com"
+
+def test_duplicates_are_reported_not_fatal(db, make_user):
+    taken = make_user().email
+    fresh, repeated = unique("fresh"), unique("repeated")
+    report = import_users(db, csv_rows(
+        f"{fresh},Fresh,secret123,",
+        f"{repeated},First,secret123,",
+        f"{repeated},Second,secret123,",
+        f"{taken},Taken,secret123,",
+    ), rounds=4, batch_size=2)
+
+    assert report.created == 2
+    assert report.duplicates == [
+        {"line": 4, "email": repeated, "reason": "repeats line 3"},
+        {"line": 5, "email": taken, "reason": "already registered"},
+    ]
+    user = db.query(User).filter(User.email == fresh).one()
+    assert (user.name, user.role) == ("Fresh", "student")
+    assert bcrypt.checkpw(b"secret123", user.hashed_password.encode())
+
+def test_invalid_rows_are_reported_by_line(db):
+    report = import_users(db, csv_rows(
+        "not-an-email,Nobody,secret123,",
+        f"{unique('nopass')},No Password,,",
+        f"{unique('ok')},Fine,secret123,",
+    ), rounds=4)
+    assert report.created == 1
+    assert [e["line"] for e in report.errors] == [2, 3]
+    assert report.errors[0]["error"].startswith("email:")
+    assert report.errors[1]["error"] == "password: missing"
+
+def test_roles_need_the_trusted_path(db):
+    instructor, admin = unique("instructor"), unique("admin")
+    lines = (f"{instructor},Teacher,secret123,instructor", f"{admin},Admin,secret123,admin")
+    report = import_users(db, csv_rows(*lines), rounds=4)
+    assert report.created == 0
+    assert [e["error"] for e in report.errors] == [
+        "role: only students can be imported here; use import_users.py",
+        "role: must be one of student, instructor",
+    ]
+
+    report = import_users(db, csv_rows(*lines), rounds=4, allow_roles=True)
+    assert report.created == 1
+    assert db.query(User.role).filter(User.email == instructor).scalar() == "instructor"
+
+def test_generated_passwords_are_returned(db):
+    email = unique("generated")
+    # The trailing comma is a field with no header, which is ignored
+    report = import_users(db, csv_rows(f"{email},Generated,,", header="email,name,password"), rounds=4, generate_passwords=True)
+    assert report.created == 1
+    [generated] = report.generated_passwords
+    assert generated["email"] == email
+    hashed = db.query(User.hashed_password).filter(User.email == email).scalar()
+    assert bcrypt.checkpw(generated["password"].encode(), hashed.encode())
+
+def test_too_many_rows_imports_nobody(db):
+    emails = [unique(f"row{i}") for i in range(3)]
+    with pytest.raises(TooManyRows):
+        import_users(db, csv_rows(*(f"{e},Row,secret123," for e in emails)), rounds=4, max_rows=2)
+    assert db.query(User).filter(User.email.in_(emails)).count() == 0
+
+def test_missing_columns_are_rejected():
+    with pytest.raises(ValueError, match="missing column"):
+        list(read_csv(io.StringIO("email,password\na@example.com,x\n")))
+
+def test_upload_imports_students_only(client, db, make_user, auth_headers, monkeypatch):
+    from routers import auth
+    monkeypatch.setattr(auth.settings, "bcrypt_rounds", 4)
+    student, teacher = unique("student"), unique("teacher")
+    upload = f"email,name,password,role\n{student},Student,secret123,\n{teacher},Teacher,secret123,instructor\n"
+
+    headers = auth_headers(make_user(role="instructor"))
+    response = client.post("/api/auth/import", files={"file": ("class.csv", upload)}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert response.json()["errors"] == [{"line": 3, "error": "role: only students can be imported here; use import_users.py"}]
+
+    response = client.post("/api/auth/import", files={"file": ("class.csv", upload)}, headers=auth_headers(make_user()))
+    assert response.status_code == 403
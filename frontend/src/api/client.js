@@ -26,15 +26,82 @@ api.interceptors.request.use(
     (error) => Promise.reject(error)
 );
 
-// Response interceptor for error handling
+const readStoredUser = () => {
+    try {
+        return JSON.parse(localStorage.getItem('user')) || null;
+    } catch (e) {
+        return null;
+    }
+};
+
+// One refresh at a time: concurrent 401s all wait for the same new token pair
+let refreshing = null;
+
+const postRefresh = (refreshToken) => {
+    // Another tab may have rotated the shared token while this one waited for the lock
+    const stored = readStoredUser();
+    if (stored?.refresh_token && stored.refresh_token !== refreshToken) {
+        return Promise.resolve({ data: stored });
+    }
+    return axios.post('/api/auth/refresh', { refresh_token: refreshToken });
+};
+
+const refreshTokens = (refreshToken) => {
+    if (!refreshing) {
+        // Tabs share the stored pair, so refresh one tab at a time where the browser allows it
+        const request = navigator.locks
+            ? navigator.locks.request('zerotoone-token-refresh', () => postRefresh(refreshToken))
+            : postRefresh(refreshToken);
+        refreshing = request
+            .then(({ data }) => {
+                const stored = readStoredUser() || {};
+                localStorage.setItem('user', JSON.stringify({
+                    ...stored,
+                    token: data.token,
+                    refresh_token: data.refresh_token,
+                    expires_in: data.expires_in,
+                }));
+                return data.token;
+            })
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+};
+
+const endSession = () => {
+    localStorage.removeItem('user');
+    window.location.href = '/login';
+};
+
+// Response interceptor: renew an expired access token once, then retry the request
 api.interceptors.response.use(
     (response) => response,
-    (error) => {
-        if (error.response?.status === 401) {
-            localStorage.removeItem('user');
-            window.location.href = '/login';
+    async (error) => {
+        const original = error.config;
+        if (error.response?.status !== 401 || !original || original._retried) {
+            if (error.response?.status === 401) endSession();
+            return Promise.reject(error);
+        }
+        const stored = readStoredUser();
+        if (!stored?.refresh_token) {
+            endSession();
+            return Promise.reject(error);
+        }
+        original._retried = true;
+        const sentToken = original.headers?.Authorization?.replace('Bearer ', '');
+        try {
+            // Another tab may already have rotated the tokens; use theirs instead of refreshing again
+            const token = stored.token && stored.token !== sentToken
+                ? stored.token
+                : await refreshTokens(stored.refresh_token);
+            original.headers.Authorization = `Bearer ${token}`;
+            return api(original);
+        } catch (refreshError) {
+            endSession();
+            return Promise.reject(error);
         }
-        return Promise.reject(error);
     }
 );
 
@@ -44,6 +111,7 @@ export const authAPI = {
     register: (name, email, password, language_preference = 'en') =>
         api.post('/auth/register', { name, email, password, language_preference }),
     getProfile: () => api.get('/auth/profile'),
+    logout: (refreshToken) => axios.post('/api/auth/logout', { refresh_token: refreshToken }),
 };
 
 // Topics API
@@ -87,11 +155,28 @@ export const subtopicsAPI = {
     completeAll: () => api.post('/subtopics/complete-all'),
 };
 
+// Smallest single splice turning `before` into `after` (offsets are JS string indices)
+export const diffToEdit = (before, after) => {
+    let start = 0;
+    while (start < before.length && start < after.length && before[start] === after[start]) start++;
+    let endBefore = before.length;
+    let endAfter = after.length;
+    while (endBefore > start && endAfter > start && before[endBefore - 1] === after[endAfter - 1]) {
+        endBefore--;
+        endAfter--;
+    }
+    return { start, end: endBefore, text: after.slice(start, endAfter) };
+};
+
 // Notes API
 export const notesAPI = {
     getByTopic: (topicId) => api.get(`/notes/topic/${topicId}`),
+    listMine: (topicId, cursor) => api.get('/notes/mine', { params: { topic_id: topicId, cursor } }),
     create: (topicId, content) => api.post('/notes', { topic_id: topicId, content }),
     update: (noteId, content) => api.put(`/notes/${noteId}`, { content }),
+    // Send only the changed range, addressed against the version the editor started from
+    patch: (noteId, baseVersion, before, after) =>
+        api.patch(`/notes/${noteId}`, { base_version: baseVersion, edits: [diffToEdit(before, after)] }),
     delete: (noteId) => api.delete(`/notes/${noteId}`),
 };
 
@@ -103,6 +188,7 @@ export const chatAPI = {
 export const recommendationsAPI = {
     get: () => api.get('/recommendations'),
     generate: () => api.post('/recommendations/generate'),
+    complete: (recommendationId) => api.post(`/recommendations/${recommendationId}/complete`),
 };
 
 export default api;
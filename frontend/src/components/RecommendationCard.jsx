@@ -1,15 +1,16 @@
 import React from 'react';
 import { motion } from 'framer-motion';
-import { Play, Code, Lightbulb, ArrowRight, ExternalLink } from 'lucide-react';
+import { Play, Code, Lightbulb, ArrowRight, ExternalLink, Check } from 'lucide-react';
 import { Link } from 'react-router-dom';
 
-const RecommendationCard = ({ recommendation }) => {
+const RecommendationCard = ({ recommendation, onComplete }) => {
     const { type, title, description, action_url, source, priority } = recommendation;
 
     const getIcon = () => {
         switch (type) {
             case 'video': return <Play size={20} className="text-secondary" />;
-            case 'question': return <Code size={20} className="text-primary" />;
+            case 'question':
+            case 'problem': return <Code size={20} className="text-primary" />;
             case 'tip': return <Lightbulb size={20} className="text-warning" />;
             default: return <ArrowRight size={20} />;
         }
@@ -60,6 +61,15 @@ const RecommendationCard = ({ recommendation }) => {
                         </span>
                     </div>
                 </div>
+                {onComplete && (
+                    <button
+                        onClick={() => onComplete(recommendation.id)}
+                        title="Mark as done"
+                        style={{ background: 'transparent', border: 'none', color: 'var(--text-dim)', cursor: 'pointer', padding: '0.25rem' }}
+                    >
+                        <Check size={16} />
+                    </button>
+                )}
             </div>
 
             <p style={{ fontSize: '0.875rem', color: 'var(--text-dim)', lineHeight: 1.5 }}>
@@ -76,7 +86,7 @@ const RecommendationCard = ({ recommendation }) => {
                             className="btn-secondary btn-small"
                             style={{ width: '100%', justifyContent: 'center' }}
                         >
-                             Watch Video <ExternalLink size={14} />
+                             {type === 'problem' ? 'Solve Problem' : 'Watch Video'} <ExternalLink size={14} />
                         </a>
                     ) : (
                         <Link 
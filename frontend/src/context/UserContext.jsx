@@ -1,4 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
+import { authAPI } from '../api/client';
 
 const UserContext = createContext();
 
@@ -33,14 +34,23 @@ export const UserProvider = ({ children }) => {
     };
 
     const logout = () => {
+        const stored = JSON.parse(localStorage.getItem('user') || 'null');
+        if (stored?.refresh_token) {
+            // Best effort: the session is revoked server-side, but logging out locally never waits on it
+            authAPI.logout(stored.refresh_token).catch(() => {});
+        }
         setUser(null);
         localStorage.removeItem('user');
     };
 
     const updateProgress = (topicId, mastery) => {
         if (user) {
+            // Tokens may have been rotated since this state was loaded; keep the stored ones
+            const stored = JSON.parse(localStorage.getItem('user') || 'null');
             const updatedUser = {
                 ...user,
+                token: stored?.token ?? user.token,
+                refresh_token: stored?.refresh_token ?? user.refresh_token,
                 progress: {
                     ...user.progress,
                     [topicId]: mastery
@@ -140,6 +140,15 @@ const Dashboard = () => {
         );
     }
 
+    const handleCompleteRecommendation = async (recommendationId) => {
+        setRecommendations(prev => prev.filter(r => r.id !== recommendationId));
+        try {
+            await recommendationsAPI.complete(recommendationId);
+        } catch (err) {
+            console.error('Failed to complete recommendation:', err);
+        }
+    };
+
     // Find the current topic to continue (first in-progress or first unlocked)
     const currentTopic = topicsProgress.find(t => t.status === 'in-progress')
         || topicsProgress.find(t => t.status === 'unlocked');
@@ -343,7 +352,7 @@ const Dashboard = () => {
                         <div style={{ display: 'flex', flexDirection: 'column', gap: '1rem' }}>
                             {recommendations.length > 0 ? (
                                 recommendations.map(rec => (
-                                    <RecommendationCard key={rec.id} recommendation={rec} />
+                                    <RecommendationCard key={rec.id} recommendation={rec} onComplete={handleCompleteRecommendation} />
                                 ))
                             ) : (
                                 <p style={{ color: 'var(--text-dim)', fontSize: '0.875rem' }}>
@@ -17,6 +17,7 @@ const Resources = () => {
     const [activeTab, setActiveTab] = useState('videos');
     const [leetcodeProblems, setLeetcodeProblems] = useState([]);
     const [notesData, setNotesData] = useState({ summary: '', user_notes: [] });
+    const [notesCursor, setNotesCursor] = useState(null);
     const [newNote, setNewNote] = useState('');
     const [editingNoteId, setEditingNoteId] = useState(null);
     const [editingContent, setEditingContent] = useState('');
@@ -43,12 +44,19 @@ const Resources = () => {
                 const { data: leetcodeData } = await topicsAPI.getLeetcode(topicId);
                 setLeetcodeProblems(leetcodeData.problems || []);
 
-                // Fetch notes from API
+                // Fetch topic summary and the user's own notes from API
                 const { data: notesResult } = await notesAPI.getByTopic(topicId);
+                let userNotes = [];
+                let cursor = null;
+                try {
+                    const { data: mine } = await notesAPI.listMine(topicId);
+                    userNotes = mine.notes;
+                    cursor = mine.next_cursor;
+                } catch (e) { }
+                setNotesCursor(cursor);
 
                 // Load user notes from localStorage as backup
                 const savedNotes = localStorage.getItem(`user_notes_topic_${topicId}`);
-                let userNotes = notesResult.user_notes || [];
 
                 // If API returned no user notes, try localStorage backup
                 if (userNotes.length === 0 && savedNotes) {
@@ -95,6 +103,17 @@ const Resources = () => {
 
     const [isAddingNote, setIsAddingNote] = useState(false);
 
+    const handleLoadMoreNotes = async () => {
+        if (!notesCursor) return;
+        try {
+            const { data } = await notesAPI.listMine(topicId, notesCursor);
+            setNotesData(prev => ({ ...prev, user_notes: [...prev.user_notes, ...data.notes] }));
+            setNotesCursor(data.next_cursor);
+        } catch (err) {
+            console.error('Failed to load more notes:', err);
+        }
+    };
+
     const handleAddNote = async () => {
         if (!newNote.trim() || isAddingNote) return;
 
@@ -125,19 +144,36 @@ const Resources = () => {
         if (!editingContent.trim()) return;
 
         const originalNotes = [...notesData.user_notes];
+        const original = originalNotes.find(n => n.id === noteId);
 
         // Optimistic update for edit
         setNotesData(prev => ({
             ...prev,
             user_notes: prev.user_notes.map(n =>
-                n.id === noteId ? { ...n, content: editingContent } : n
+                n.id === noteId ? { ...n, content: editingContent, content_html: null } : n
             )
         }));
         setEditingNoteId(null);
 
         try {
-            await notesAPI.update(noteId, editingContent);
+            const { data } = original?.version
+                ? await notesAPI.patch(noteId, original.version, original.content, editingContent)
+                : await notesAPI.update(noteId, editingContent);
+            setNotesData(prev => ({
+                ...prev,
+                user_notes: prev.user_notes.map(n => n.id === noteId ? data : n)
+            }));
         } catch (err) {
+            if (err.response?.status === 412) {
+                // Edited in another tab: show the latest version instead of overwriting it
+                const current = err.response.data.detail.current;
+                setNotesData(prev => ({
+                    ...prev,
+                    user_notes: prev.user_notes.map(n => n.id === noteId ? current : n)
+                }));
+                alert('This note was changed elsewhere. The latest version has been loaded.');
+                return;
+            }
             console.error('Failed to update note:', err);
             // Rollback on error
             setNotesData(prev => ({ ...prev, user_notes: originalNotes }));
@@ -392,7 +428,12 @@ const Resources = () => {
                                         </>
                                     ) : (
                                         <>
-                                            <p style={{ whiteSpace: 'pre-wrap' }}>{note.content}</p>
+                                            {note.content_html ? (
+                                                // Rendered and sanitized by the server when the note was saved
+                                                <div className="markdown-content" dangerouslySetInnerHTML={{ __html: note.content_html }} />
+                                            ) : (
+                                                <p style={{ whiteSpace: 'pre-wrap' }}>{note.content}</p>
+                                            )}
                                             <div style={{ display: 'flex', gap: '0.5rem', marginTop: '0.75rem' }}>
                                                 <button
                                                     onClick={() => {
@@ -426,6 +467,11 @@ const Resources = () => {
                                     )}
                                 </div>
                             ))}
+                            {notesCursor && (
+                                <button onClick={handleLoadMoreNotes} className="btn-secondary btn-small">
+                                    Load more notes
+                                </button>
+                            )}
                             {(!notesData.user_notes || notesData.user_notes.length === 0) && (
                                 <p style={{ color: 'var(--text-dim)', textAlign: 'center', padding: '1rem' }}>
                                     No notes yet. Add your first note above!